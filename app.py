@@ -1,13 +1,17 @@
-import zipfile
-
 import yaml
 import gradio as gr
 import os
 import json
 import dgl
 from utils import *
+from desc_store import load_or_build_desc_store
+from graph_store import open_graph_store
+from search_index import load_or_build_search_index
+from csr_graph import load_or_build_combined_adjacency
+import tracing
 from os.path import join
 import base64
+from urllib.parse import quote
 
 desc_path_dict = {
     "compound": "database/unibiomap/compound_desc.json",
@@ -34,41 +38,70 @@ font_size = 10
 font_color = "black"
 results_root = "results/"
 os.makedirs(results_root, exist_ok=True)
-
-def load_or_process_graph():
-    link_root = "database/unibiomap"
-    data_root = "database/processed"
-    os.makedirs(data_root, exist_ok=True)
-    node_map_path = join(data_root, "node_map.json")
-    graph_path = join(data_root, "unibiomap_simp.dgl")
-    link_path = join(link_root, "unibiomap.links.tsv")
-
-    def nodemap2idmap(node_map):
-        return {k: {vv: kk for kk, vv in v.items()} for k, v in node_map.items()}
-
-    if os.path.exists(node_map_path) and os.path.exists(graph_path):
-        with open(node_map_path, "r") as f:
-            node_map = json.load(f)
-        graph = dgl.load_graphs(graph_path)[0][0]
-    else:
-        if not os.path.exists(link_root):
-            download_raw_kg(link_root)
-        graph, node_map = process_knowledge_graph(link_path, simplify_edge=True)
-        dgl.save_graphs(graph_path, [graph])
-        with open(node_map_path, "w") as f:
-            json.dump(node_map, f)
-
-    id_map = nodemap2idmap(node_map)
-    return graph, node_map, id_map
-
-graph, node_map, id_map = load_or_process_graph()
-desc_dict, idname_dict = load_desc(desc_path_dict)
+# "route": 图数据写为可缓存的 JSON 文件，由本地 ECharts 页面通过 Gradio 文件路由加载
+# "inline": 旧方式，整页 HTML 以 base64 data URI 内嵌
+render_mode = os.environ.get("RENDER_MODE", "route")
+render_root = join(results_root, "render")
+# 每个下载请求使用独立的临时目录，超过 SCRATCH_TTL_SECONDS 未修改的目录会被清理
+scratch_root = join(results_root, "sessions")
+scratch_ttl = int(os.environ.get("SCRATCH_TTL_SECONDS", 3600))
+file_route = os.environ.get("GRADIO_FILE_ROUTE", "/gradio_api/file=")
+# "compact": 列式数据 + 字符串表，由浏览器展开；"verbose": 逐节点/逐边的 ECharts JSON
+render_payload = os.environ.get("RENDER_PAYLOAD", "compact")
+render_gzip = os.environ.get("RENDER_GZIP", "1") == "1"
+if render_mode == "route":
+    gr.set_static_paths(paths=["static", render_root])
+
+# "mmap": 不载入 DGL 图，各进程只读共享内存映射的 CSR 数组和名称表（见 graph_store.py）
+graph_storage = os.environ.get("GRAPH_STORAGE", "dgl")
+if graph_storage == "mmap":
+    graph, csr_graph, node_map, id_map, id_names = open_graph_store()
+else:
+    graph, csr_graph, node_map, id_map, id_names = load_or_process_graph()
+# 处理后图文件对应的来源哈希；由图派生的检索索引和 PageRank 邻接矩阵据此判断是否过期
+graph_version = processed_version()
+# 描述信息存放在磁盘上的 SQLite 索引中，按需批量查询，不再整体载入内存
+desc_dict = load_or_build_desc_store(desc_path_dict, "database/processed/desc.sqlite")
+# ID / 名称检索索引：输入框候选提示，并在查询前校验 ID
+search_index = load_or_build_search_index(node_map, desc_dict, "database/processed/search.sqlite",
+                                          version=graph_version)
+# 每个请求的分阶段耗时/内存记录追加到 TRACE_LOG（JSON lines）；设置 METRICS_PORT 时在本机提供延迟分位数
+trace_log = os.environ.get("TRACE_LOG", join(results_root, "trace.jsonl"))
+if os.environ.get("METRICS_PORT"):
+    tracing.start_metrics_server(int(os.environ["METRICS_PORT"]))
+# 个性化 PageRank 使用的合并邻接矩阵（所有边类型、无向），首次启动时构建并保存，之后内存映射载入
+ppr_adjacency = load_or_build_combined_adjacency(csr_graph, "database/processed/unibiomap_simp_ppr",
+                                                 version=graph_version)
+query_cache = QueryCache(max_entries=int(os.environ.get("QUERY_CACHE_ENTRIES", 64)),
+                         max_bytes=int(os.environ.get("QUERY_CACHE_MB", 1024)) << 20)
 
 def fetch_input_id(input_string):
     if not input_string:
         return []
     return [item.strip() for item in input_string.split(",")]
 
+def suggest_ids(input_string, ntype, limit=10):
+    # 对输入框中最后一个（正在输入的）ID 给出候选
+    ids = fetch_input_id(input_string)
+    if not ids or len(ids[-1]) < 2:
+        return gr.update(choices=[], value=None, visible=False)
+    choices = search_index.suggest(ids[-1], ntype=ntype, limit=limit)
+    return gr.update(choices=choices, value=None, visible=bool(choices))
+
+def apply_suggestion(input_string, choice):
+    if not choice:
+        return gr.update(), gr.update()
+    ids = fetch_input_id(input_string)[:-1] + [choice]
+    return ", ".join(ids), gr.update(choices=[], value=None, visible=False)
+
+def format_unknown_ids(unknown):
+    lines = []
+    for ntype, names in unknown.items():
+        for name, suggestions in names.items():
+            hint = f" Did you mean: {', '.join(suggestions)}?" if suggestions else ""
+            lines.append(f"{ntype} ID {name} does not exist.{hint}")
+    return "\n".join(lines)
+
 def get_limit(mode, limit_val):
     return -1 if mode == "No Limit" else limit_val
 
@@ -84,10 +117,62 @@ def save_subgraph_and_metadata(sub_g, id_map_sub, must_show, save_dir="static"):
         json.dump(must_show, f)
 
 # 新增：公共函数，用于根据子图和限制条件生成 iframe HTML 以及生成的 html_code
-def generate_iframe(sub_g, id_map_sub, must_show, display_limits):
+selection_modes = {
+    "Seed Connectivity": "hop",
+    "Edges to Seeds": "seed_edges",
+    "Lowest ID": "first",
+}
+
+# "ppr": 以种子为重启点的随机游走得分最高的节点（见 subgraph_by_ppr）
+# "paths": 不取各种子的 k-hop 邻域并集，而是取种子组之间的连接路径（见 subgraph_between）
+query_modes = {
+    "Neighbourhood (k-hop)": "neighbourhood",
+    "Connecting paths": "paths",
+    "Personalized PageRank": "ppr",
+}
+
+# 采样过滤：取消勾选的边类型 / 节点类型在遍历时即被跳过
+etype_choices = {f"{src} -[{rel}]-> {dst}": (src, rel, dst) for src, rel, dst in graph.canonical_etypes}
+
+def sampling_filters(etype_filter, ntype_filter):
+    # 全部勾选时不做过滤；全部取消时为空列表，只返回种子节点
+    allow_etypes = None
+    if etype_filter is not None and len(etype_filter) < len(etype_choices):
+        allow_etypes = [etype_choices[label] for label in etype_filter]
+    allow_ntypes = None
+    if ntype_filter is not None and len(ntype_filter) < len(graph.ntypes):
+        allow_ntypes = list(ntype_filter)
+    return {"allow_etypes": allow_etypes, "allow_ntypes": allow_ntypes}
+
+# "auto": 可见节点超过 LAYOUT_AUTO_NODES 时在服务端计算布局，浏览器不再运行力导向模拟
+layout_modes = {
+    "Auto": "auto",
+    "Server (fixed)": "fixed",
+    "Browser (force)": "force",
+}
+auto_layout_nodes = int(os.environ.get("LAYOUT_AUTO_NODES", 1000))
+
+def build_renderer(sub_g, id_map_sub, must_show):
     remove_self_loop = True
-    G = convert_subgraph_to_networkx(sub_g, id_map_sub, display_limits, must_show, remove_self_loop)
-    echarts_data = nx_to_echarts_json(G, color_map, desc_dict)
+    return SubgraphRenderer(sub_g, id_map_sub, must_show, desc_dict, remove_self_loop)
+
+def generate_iframe(renderer, display_limits, selection="first", layout="auto"):
+    # 直接由子图张量生成 ECharts 数据，节点/边的 JSON 片段在 renderer 中按查询缓存；
+    # 数据只序列化这一次
+    with tracing.span("serialize", payload=render_payload) as span:
+        if render_payload == "compact":
+            echarts_data = renderer.to_compact_json(display_limits, color_map, selection,
+                                                    layout=layout, auto_layout_nodes=auto_layout_nodes)
+        else:
+            echarts_data = renderer.to_echarts_json(display_limits, color_map, selection,
+                                                    layout=layout, auto_layout_nodes=auto_layout_nodes)
+        span.set(bytes=len(echarts_data))
+    if render_mode == "route":
+        with tracing.span("write_payload"):
+            data_path = write_render_payload(echarts_data, render_root, compress=render_gzip)
+        viewer_src = f"{file_route}static/graph_viewer.html?data={quote(file_route + data_path)}"
+        iframe_html = f"<iframe src='{viewer_src}' width='100%' height='850px' style='border:none;'></iframe>"
+        return iframe_html, None
     html_code = generate_echarts_html(echarts_data)
     html_base64 = base64.b64encode(html_code.encode('utf-8')).decode('utf-8')
     data_uri = f"data:text/html;base64,{html_base64}"
@@ -95,7 +180,8 @@ def generate_iframe(sub_g, id_map_sub, must_show, display_limits):
     return iframe_html, html_code
 
 def run_query(protein, compound, disease, pathway, go, phenotype,
-              depth,
+              depth, query_mode, max_length, slack, top_n, max_nodes, etype_filter, ntype_filter,
+              selection_mode, layout_mode, profile,
             #   complex_mode, complex_limit,
               compound_mode, compound_limit,
               disease_mode, disease_limit,
@@ -125,26 +211,88 @@ def run_query(protein, compound, disease, pathway, go, phenotype,
     }
 
     must_show = sample_dict.copy()
-    try:
-        print('start sampling')
-        sub_g, new2orig, node_map_sub, statistics = subgraph_by_node(graph, sample_dict, node_map, depth=depth)
-        id_map_sub = {k: {vv: kk for kk, vv in v.items()} for k, v in node_map_sub.items()}
-        # save statistics as json
-        with open(join(results_root, "statistics.yaml"), "w") as f:
-            yaml.dump(statistics, f)
-
-        statistics_text = "\n".join([f"{k}: {v}" for k, v in statistics.items()])
-        
-        # 储存subgraph
-        # save_subgraph_and_metadata(sub_g, id_map_sub, must_show)
-        # 调用公共函数生成展示 HTML
-        iframe_html, html_code = generate_iframe(sub_g, id_map_sub, must_show, display_limits)
-
-        return iframe_html, 'success', statistics_text, sub_g, id_map_sub, must_show
-    except Exception as e:
-        return f"Error: {str(e)}", f"Error: {str(e)}", sample_dict, None, None, None
-
-def refresh_display(sub_g, id_map_sub, must_show,
+    # 勾选 profile 时本次请求在 cProfile 下运行，.prof 文件写入该请求自己的临时目录
+    profile_dir = make_scratch_dir(scratch_root, ttl_seconds=scratch_ttl) if profile else None
+    with tracing.trace("run_query", log_path=trace_log, profile_dir=profile_dir,
+                       seeds={k: v for k, v in sample_dict.items() if v}, depth=depth,
+                       max_nodes=max_nodes) as trace:
+        try:
+            # 先在检索索引中校验 ID，未知 ID 直接返回候选，不再运行注定失败的查询
+            with tracing.span("validate_ids"):
+                unknown = search_index.validate(sample_dict, node_map)
+            if unknown:
+                for ntype, names in unknown.items():
+                    for name in names:
+                        trace.event("unknown_seed", ntype=ntype, name=name)
+                raise ValueError(format_unknown_ids(unknown))
+            max_nodes = int(max_nodes) if max_nodes else None
+            query_mode = query_modes.get(query_mode, "neighbourhood")
+            trace.attrs["mode"] = query_mode
+            filters = sampling_filters(etype_filter, ntype_filter)
+            with tracing.span("cache_lookup"):
+                filter_key = {k: tuple(sorted(v)) for k, v in filters.items() if v is not None}
+                if query_mode == "paths":
+                    cache_key = QueryCache.make_key(sample_dict, None, max_nodes=max_nodes, mode=query_mode,
+                                                    max_length=int(max_length), slack=int(slack), **filter_key)
+                elif query_mode == "ppr":
+                    cache_key = QueryCache.make_key(sample_dict, None, mode=query_mode, top_n=int(top_n),
+                                                    **filter_key)
+                else:
+                    cache_key = QueryCache.make_key(sample_dict, depth, max_nodes=max_nodes, **filter_key)
+                cached = query_cache.get(cache_key)
+            trace.attrs["cached"] = cached is not None
+            if cached is None:
+                if query_mode == "paths":
+                    # 只保留种子组之间最短（及稍长）路径上的节点和边
+                    with tracing.span("subgraph_between"):
+                        sub_g, new2orig, node_map_sub, statistics = subgraph_between(
+                            graph, sample_dict, node_map, csr_graph, max_length=int(max_length),
+                            slack=int(slack), max_nodes=max_nodes, id_names=id_names, **filters)
+                elif query_mode == "ppr":
+                    # 按种子的个性化 PageRank 得分取每种类型的前 top_n 个节点
+                    with tracing.span("subgraph_by_ppr"):
+                        sub_g, new2orig, node_map_sub, statistics = subgraph_by_ppr(
+                            graph, sample_dict, node_map, ppr_adjacency, top_n=int(top_n),
+                            csr_graph=csr_graph, id_names=id_names, **filters)
+                else:
+                    with tracing.span("subgraph_by_node"):
+                        sub_g, new2orig, node_map_sub, statistics = subgraph_by_node(graph, sample_dict, node_map, depth=depth,
+                                                                                  csr_graph=csr_graph, id_names=id_names,
+                                                                                  max_nodes=max_nodes, **filters)
+                id_map_sub = {k: {vv: kk for kk, vv in v.items()} for k, v in node_map_sub.items()}
+                # renderer 随查询结果一起缓存，其中包含按可见节点缓存的服务端布局
+                with tracing.span("build_renderer"):
+                    renderer = build_renderer(sub_g, id_map_sub, must_show)
+                query_cache.put(cache_key, (sub_g, new2orig, node_map_sub, id_map_sub, statistics, renderer))
+            else:
+                sub_g, new2orig, node_map_sub, id_map_sub, statistics, renderer = cached
+            # 统计结果保存在会话状态中，下载时写入该请求自己的目录
+            statistics_text = "\n".join([f"{k}: {v}" for k, v in statistics.items()])
+
+            # 储存subgraph
+            # save_subgraph_and_metadata(sub_g, id_map_sub, must_show)
+            # 调用公共函数生成展示 HTML
+            with tracing.span("generate_iframe"):
+                iframe_html, html_code = generate_iframe(renderer, display_limits,
+                                                         selection_modes.get(selection_mode, "first"),
+                                                         layout_modes.get(layout_mode, "auto"))
+            trace.attrs.update(nodes=sub_g.num_nodes(), edges=sub_g.num_edges())
+
+            cache_stats = query_cache.stats()
+            budget = statistics.get(("sampling", "budget"), {})
+            truncated = (f" (truncated at {budget['sampled_nodes']} nodes, raise Max Sampled Nodes for more)"
+                         if budget.get("truncated") else "")
+            msg = (f"success{' (cached)' if cached is not None else ''}{truncated} | "
+                   f"cache hits: {cache_stats['hits']}, misses: {cache_stats['misses']}, entries: {cache_stats['entries']}")
+            outputs = [iframe_html, msg, statistics_text, sub_g, id_map_sub, must_show, renderer, statistics]
+        except Exception as e:
+            trace.event("error", error=f"{type(e).__name__}: {e}")
+            outputs = [f"Error: {str(e)}", f"Error: {str(e)}", str(sample_dict), None, None, None, None, None]
+    # debug 文本框末尾附上本次请求的分阶段耗时
+    outputs[2] = f"{outputs[2]}\n\n{trace.summary()}"
+    return tuple(outputs)
+
+def refresh_display(sub_g, id_map_sub, must_show, renderer, selection_mode, layout_mode,
                     # complex_mode, complex_limit,
                     compound_mode, compound_limit,
                     disease_mode, disease_limit,
@@ -155,7 +303,7 @@ def refresh_display(sub_g, id_map_sub, must_show,
                     protein_mode, protein_limit):
     # 检查状态数据
     if sub_g is None or id_map_sub is None or must_show is None:
-        return gr.update(value="<b>Please run query first.</b>")
+        return gr.update(value="<b>Please run query first.</b>"), renderer
 
     display_limits = {
         # 'complex': get_limit(complex_mode, complex_limit),
@@ -168,10 +316,17 @@ def refresh_display(sub_g, id_map_sub, must_show,
         'protein': get_limit(protein_mode, protein_limit),
     }
     try:
-        iframe_html, _ = generate_iframe(sub_g, id_map_sub, must_show, display_limits)
-        return iframe_html
+        # 子图未变时复用会话中的 renderer，只重新计算可见节点并序列化
+        with tracing.trace("refresh_display", log_path=trace_log):
+            if renderer is None:
+                with tracing.span("build_renderer"):
+                    renderer = build_renderer(sub_g, id_map_sub, must_show)
+            iframe_html, _ = generate_iframe(renderer, display_limits,
+                                             selection_modes.get(selection_mode, "first"),
+                                             layout_modes.get(layout_mode, "auto"))
+        return iframe_html, renderer
     except Exception as e:
-        return f"Error updating display: {str(e)}"
+        return f"Error updating display: {str(e)}", renderer
 
 # 删除 get_default_content 函数，不再需要
 def get_default_content(take_empty=True):
@@ -197,18 +352,19 @@ def get_text_content(file_path="static/gr_head.md"):
 #     except Exception as e:
 #         return gr.update(value=f"Error: {e}", visible=True)
 
-def download_entity(sub_g, id_map_sub):
+def download_entity(sub_g, id_map_sub, statistics, include_binary=False):
+    if sub_g is None or id_map_sub is None:
+        return gr.update(value=None, visible=False)
     try:
-        # 生成统计数据和三元组文件
-        report_subgraph(sub_g, id_map_sub, save_root=results_root)
-        triples_path = join(results_root, 'triples.txt')
-        statistics_path = join(results_root, 'statistics.yaml')
-
-        # 创建一个压缩文件
-        zip_path = join(results_root, 'results.zip')
-        with zipfile.ZipFile(zip_path, 'w') as zipf:
-            zipf.write(triples_path, arcname='triples.txt')
-            zipf.write(statistics_path, arcname='statistics.yaml')
+        # 三元组按块直接写入压缩包，写入本次请求独立的目录，避免并发请求互相覆盖
+        with tracing.trace("download_entity", log_path=trace_log, binary=include_binary,
+                           nodes=sub_g.num_nodes(), edges=sub_g.num_edges()):
+            save_dir = make_scratch_dir(scratch_root, ttl_seconds=scratch_ttl)
+            with tracing.span("export_zip") as span:
+                zip_path = export_subgraph_zip(sub_g, id_map_sub, join(save_dir, 'results.zip'),
+                                               extra_files={'statistics.yaml': yaml.dump(statistics or {})},
+                                               binary=include_binary)
+                span.set(bytes=os.path.getsize(zip_path))
 
         # 返回压缩文件路径
         return gr.update(value=zip_path, visible=True)
@@ -236,6 +392,8 @@ def get_default_content(get_empty=True):
         with open("static/gr_empty.html", "r", encoding="utf-8") as f:
             return f.read()
     
+    if render_mode == "route":
+        return f"<iframe src='{file_route}static/default.html' width='100%' height='850px' style='border:none;'></iframe>"
     with open("static/default.html", "r", encoding="utf-8") as f:
         default_html = f.read()
         html_base64 = base64.b64encode(default_html.encode('utf-8')).decode('utf-8')
@@ -249,8 +407,8 @@ sub_g_static, id_map_sub_static, must_show_static = load_static_files()
 empty_display = get_default_content()
 # 如果加载成功，则使用默认的 slider 默认值来生成初始展示内容
 if sub_g_static is not None:
-    initial_display = refresh_display(
-        sub_g_static, id_map_sub_static, must_show_static,
+    initial_display, _ = refresh_display(
+        sub_g_static, id_map_sub_static, must_show_static, None, "Seed Connectivity", "Auto",
         # "Set Limit", 10,  # complex
         "Set Limit", 10,  # compound
         "Set Limit", 10,  # disease
@@ -273,6 +431,9 @@ with gr.Blocks() as demo:
     subgraph_state = gr.State(value=sub_g_static)
     idmap_state = gr.State(value=id_map_sub_static)
     mustshow_state = gr.State(value=must_show_static)
+    # gr.State 会为每个会话深拷贝初始值；renderer 在首次 refresh_display 时再构建
+    renderer_state = gr.State(value=None)
+    statistics_state = gr.State(value=None)
 
     with gr.Row():
         with gr.Column():
@@ -280,6 +441,7 @@ with gr.Blocks() as demo:
         with gr.Row():
             with gr.Column():
                 down_btn = gr.Button("⬇️ Get All Queried Entities")
+                binary_input = gr.Checkbox(False, label="Include binary ID arrays and name tables")
             with gr.Column():
                 download_file = gr.File(label="Query triples file", interactive=False, visible=False)
 
@@ -288,18 +450,48 @@ with gr.Blocks() as demo:
             gr.Markdown("### Query Content")
             gr.Markdown("You can enter multiple entity IDs to query, separated by commas, for example: P50416, P05091.")
             
-            protein_input = gr.Textbox("P05091", label="Protein ID")
-            compound_input = gr.Textbox(label="Compound ID")
-            disease_input = gr.Textbox(label="Disease ID")
-            pathway_input = gr.Textbox(label="Pathway ID")
-            go_input = gr.Textbox(label="GO ID")
-            phenotype_input = gr.Textbox(label="Phenotype ID")
+            def id_box_with_suggestions(label, ntype, value=None):
+                # 输入时按 ID 前缀、子串或近似拼写给出候选，选中后替换正在输入的 ID
+                box = gr.Textbox(value, label=label)
+                suggestions = gr.Dropdown([], label=f"{label} suggestions", visible=False, interactive=True)
+                box.input(fn=lambda text: suggest_ids(text, ntype), inputs=box, outputs=suggestions,
+                          trigger_mode="always_last", show_progress="hidden")
+                suggestions.input(fn=apply_suggestion, inputs=[box, suggestions], outputs=[box, suggestions],
+                                  show_progress="hidden")
+                return box
+
+            protein_input = id_box_with_suggestions("Protein ID", "protein", "P05091")
+            compound_input = id_box_with_suggestions("Compound ID", "compound")
+            disease_input = id_box_with_suggestions("Disease ID", "disease")
+            pathway_input = id_box_with_suggestions("Pathway ID", "pathway")
+            go_input = id_box_with_suggestions("GO ID", "go")
+            phenotype_input = id_box_with_suggestions("Phenotype ID", "phenotype")
             inputs_1 = [protein_input, compound_input, disease_input, pathway_input, go_input, phenotype_input]
         with gr.Column():
             gr.Markdown("### Sample Limit")
             gr.Markdown("Setup the sampling restriction parameters below.")
+            query_mode_input = gr.Radio(list(query_modes), value="Neighbourhood (k-hop)", label="Query Mode",
+                                        info="Connecting paths: the paths between the entered node types "
+                                             "(or between the IDs, if all have one type). Personalized "
+                                             "PageRank: the highest ranked nodes of every type around the seeds.")
             depth_slider = gr.Slider(0, 4, step=1, label="Subgraph Sampling Depth", value=1)
+            with gr.Row():
+                path_length_slider = gr.Slider(1, 8, step=1, value=4, label="Max Path Length (connecting paths)")
+                path_slack_slider = gr.Slider(0, 2, step=1, value=0,
+                                              label="Extra Hops over Shortest Path (connecting paths)")
+            top_n_slider = gr.Slider(10, 500, step=10, value=50, label="Top Nodes per Type (PageRank)")
+            max_nodes_input = gr.Number(0, label="Max Sampled Nodes (0 = no limit)", precision=0)
+            with gr.Accordion("Sampling Filters", open=False):
+                etype_filter_input = gr.CheckboxGroup(list(etype_choices), value=list(etype_choices),
+                                                      label="Edge types to traverse", interactive=True)
+                ntype_filter_input = gr.CheckboxGroup(list(graph.ntypes), value=list(graph.ntypes),
+                                                      label="Node types to reach", interactive=True)
             with gr.Accordion("Display Limit", open=False):
+                selection_input = gr.Radio(list(selection_modes), value="Seed Connectivity",
+                                           label="Nodes shown under a limit", interactive=True)
+                layout_input = gr.Radio(list(layout_modes), value="Auto",
+                                        label="Graph layout", interactive=True)
+                profile_input = gr.Checkbox(False, label="Profile this request (cProfile dump, see debug)")
                 def slider_with_mode(label):
                     with gr.Row():
                         mode = gr.Radio(["Set Limit", "No Limit"], value="Set Limit", label=f"{label} Mode", interactive=True)
@@ -330,20 +522,26 @@ with gr.Blocks() as demo:
 
     run_btn.click(
         fn=run_query,
-        inputs=inputs_1 + [depth_slider] + limit_inputs,
-        outputs=[html_output, msg, debug, subgraph_state, idmap_state, mustshow_state]
+        inputs=inputs_1 + [depth_slider, query_mode_input, path_length_slider, path_slack_slider, top_n_slider,
+                           max_nodes_input, etype_filter_input, ntype_filter_input,
+                           selection_input, layout_input, profile_input] + limit_inputs,
+        outputs=[html_output, msg, debug, subgraph_state, idmap_state, mustshow_state, renderer_state,
+                 statistics_state]
     )
 
-    for inp in limit_inputs:
+    for inp in limit_inputs + [selection_input, layout_input]:
         inp.change(
             fn=refresh_display,
-            inputs=[subgraph_state, idmap_state, mustshow_state] + limit_inputs,
-            outputs=html_output
+            inputs=[subgraph_state, idmap_state, mustshow_state, renderer_state, selection_input, layout_input] + limit_inputs,
+            outputs=[html_output, renderer_state]
         )
 
     down_btn.click(
         fn=download_entity,
-        inputs=[subgraph_state, idmap_state],
+        inputs=[subgraph_state, idmap_state, statistics_state, binary_input],
         outputs=[download_file]
     )
+    # 查询处理函数不共享可变的全局状态，可并发执行；并发数默认等于 CPU 核数
+    demo.queue(default_concurrency_limit=int(os.environ.get("GRADIO_CONCURRENCY", os.cpu_count() or 1)),
+               max_size=int(os.environ["GRADIO_QUEUE_SIZE"]) if os.environ.get("GRADIO_QUEUE_SIZE") else None)
     demo.launch(share=True)
@@ -0,0 +1,183 @@
+"""
+Run many subgraph queries offline, without the WebUI.
+
+Seed sets are read from a file, one query per line:
+    - .jsonl: {"id": "q1", "protein": ["P05091"], "compound": [...], "depth": 2}
+      ("id" and "depth" are optional);
+    - any other file: comma-separated IDs of one node type (--ntype).
+
+Every query writes statistics.yaml (and optionally results.zip) to
+{out_dir}/{query_id}/; summary.json lists all queries with their status.
+
+Example:
+    python batch_query.py targets.txt --ntype protein --depth 2 --workers 8
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import time
+from os.path import join
+
+import torch
+import yaml
+
+from graph_store import open_graph_store
+from utils import export_subgraph_zip, load_or_process_graph, subgraph_by_node
+
+# 由父进程在创建进程池前载入；fork 出的子进程以写时复制方式共享，不会重复载入
+_graph_state = {}
+
+
+def _safe_query_id(query_id, used):
+    # 查询编号用作 out_dir 下的目录名：替换路径分隔符，"."、".." 等会指向 out_dir
+    # 本身或其上层的编号改写为 "query"，重复的编号加后缀
+    for sep in ("/", "\\", os.sep, "\0"):
+        query_id = query_id.replace(sep, "_")
+    if query_id in ("", ".", ".."):
+        query_id = "query"
+    candidate, n = query_id, 1
+    while candidate in used:
+        n += 1
+        candidate = f"{query_id}_{n}"
+    used.add(candidate)
+    return candidate
+
+
+def read_seed_sets(path, ntype="protein"):
+    """
+    Read the seed sets of a batch file. Returns a list of
+    (query_id, sample_dict, depth or None).
+    """
+    queries = []
+    used = {"summary.json"}
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if path.endswith(".jsonl"):
+                record = json.loads(line)
+                query_id = str(record.pop("id", line_no))
+                depth = record.pop("depth", None)
+                sample_dict = {k: [v] if isinstance(v, str) else list(v) for k, v in record.items()}
+            else:
+                ids = [item.strip() for item in line.split(",") if item.strip()]
+                query_id = "_".join(ids) if len(ids) <= 3 else f"{ids[0]}_{line_no}"
+                depth = None
+                sample_dict = {ntype: ids}
+            queries.append((_safe_query_id(query_id, used), sample_dict, depth))
+    return queries
+
+
+def _init_worker(num_threads):
+    torch.set_num_threads(num_threads)
+
+
+def run_one(task):
+    """
+    Run one query in a worker process and write its results.
+    Returns the summary record of the query.
+    """
+    query_id, sample_dict, depth, out_dir, max_nodes, export = task
+    start = time.time()
+    record = {"id": query_id, "seeds": sample_dict, "depth": depth}
+    try:
+        result = subgraph_by_node(_graph_state["graph"], sample_dict, _graph_state["node_map"], depth=depth,
+                                  csr_graph=_graph_state["csr_graph"], id_names=_graph_state["id_names"],
+                                  max_nodes=max_nodes)
+        if result is None:
+            raise KeyError("unknown seed ID")
+        sub_g, _, node_map_sub, statistics = result
+
+        query_dir = join(out_dir, query_id)
+        os.makedirs(query_dir, exist_ok=True)
+        with open(join(query_dir, "statistics.yaml"), "w") as f:
+            yaml.dump(statistics, f)
+        if export != "none":
+            id_map_sub = {k: {vv: kk for kk, vv in v.items()} for k, v in node_map_sub.items()}
+            export_subgraph_zip(sub_g, id_map_sub, join(query_dir, "results.zip"),
+                                binary=export == "binary")
+
+        record.update({
+            "status": "ok",
+            "num_nodes": {ntype: sub_g.num_nodes(ntype) for ntype in sub_g.ntypes},
+            "num_edges": sub_g.num_edges(),
+        })
+    except Exception as e:
+        record.update({"status": "error", "error": f"{type(e).__name__}: {e}"})
+    record["seconds"] = round(time.time() - start, 3)
+    return record
+
+
+def run_batch(queries, out_dir, depth=1, max_nodes=None, export="tsv", workers=None, threads_per_worker=1):
+    """
+    Run the queries on a pool of forked worker processes sharing the graph
+    loaded in _graph_state. Returns the summary records in input order.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    tasks = [(query_id, sample_dict, query_depth if query_depth is not None else depth,
+              out_dir, max_nodes, export)
+             for query_id, sample_dict, query_depth in queries]
+    workers = workers or os.cpu_count() or 1
+    records = []
+    if workers == 1:
+        results = map(run_one, tasks)
+    else:
+        pool = mp.get_context("fork").Pool(workers, initializer=_init_worker, initargs=(threads_per_worker,))
+        results = pool.imap_unordered(run_one, tasks)
+    for record in results:
+        print(f"[{record['status']}] {record['id']} ({record['seconds']}s)")
+        records.append(record)
+    if workers != 1:
+        pool.close()
+        pool.join()
+    order = {task[0]: i for i, task in enumerate(tasks)}
+    records.sort(key=lambda r: order[r["id"]])
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run UniBioMap subgraph queries in batch.")
+    parser.add_argument("input", help="Seed set file (.jsonl, or one comma-separated ID list per line).")
+    parser.add_argument("--ntype", default="protein", help="Node type of the IDs in plain text input.")
+    parser.add_argument("--out-dir", default="results/batch")
+    parser.add_argument("--depth", type=int, default=1)
+    parser.add_argument("--max-nodes", type=int, default=None)
+    parser.add_argument("--export", choices=["none", "tsv", "binary"], default="tsv",
+                        help="Write results.zip with the triples (tsv) and optionally the binary arrays.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    parser.add_argument("--storage", choices=["dgl", "mmap"], default="dgl",
+                        help="mmap: sample from the memory-mapped CSR arrays instead of loading the DGL graph.")
+    parser.add_argument("--link-root", default="database/unibiomap")
+    parser.add_argument("--data-root", default="database/processed")
+    args = parser.parse_args()
+
+    queries = read_seed_sets(args.input, args.ntype)
+    if args.storage == "mmap":
+        graph, csr_graph, node_map, _, id_names = open_graph_store(args.link_root, args.data_root)
+    else:
+        graph, csr_graph, node_map, _, id_names = load_or_process_graph(args.link_root, args.data_root)
+    _graph_state.update(graph=graph, csr_graph=csr_graph,
+                        node_map=node_map, id_names=id_names)
+
+    start = time.time()
+    records = run_batch(queries, args.out_dir, args.depth, args.max_nodes, args.export,
+                        args.workers, args.threads_per_worker)
+    elapsed = time.time() - start
+    summary = {
+        "queries": len(records),
+        "ok": sum(r["status"] == "ok" for r in records),
+        "errors": sum(r["status"] != "ok" for r in records),
+        "seconds": round(elapsed, 3),
+        "results": records,
+    }
+    with open(join(args.out_dir, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    print(f"{summary['ok']}/{summary['queries']} queries succeeded in {elapsed:.1f}s, "
+          f"summary written to {join(args.out_dir, 'summary.json')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Benchmark the UniBioMap pipeline on a synthetic dataset.
+
+Every stage is timed (wall clock, `--repeat` runs) and memory-profiled
+(resident set size before/after, peak RSS of the process and, with
+--tracemalloc, the peak of Python/NumPy allocations). Results are written
+as JSON so runs of different commits can be compared:
+
+    python benchmarks/run_benchmarks.py --scale 0.05 --out results/bench/a.json
+    python benchmarks/run_benchmarks.py --scale 0.05 --compare results/bench/a.json
+"""
+import argparse
+import base64
+import gc
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import dgl  # noqa: E402
+import torch  # noqa: E402
+
+from benchmarks.synthetic_graph import generate_synthetic_unibiomap  # noqa: E402
+from desc_store import load_or_build_desc_store  # noqa: E402
+from graph_store import open_graph_store  # noqa: E402
+from utils import (SubgraphRenderer, convert_subgraph_to_networkx, export_subgraph_zip,  # noqa: E402
+                   ECHARTS_BUNDLE_PATH, generate_echarts_html, load_or_process_graph, nx_to_echarts_json,
+                   process_knowledge_graph, process_knowledge_graph_chunked, report_subgraph,
+                   subgraph_by_node, write_render_payload)
+
+NTYPES = ["compound", "disease", "go", "pathway", "phenotype", "protein"]
+COLOR_MAP = {ntype: "#888888" for ntype in NTYPES}
+
+
+def _rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        return float("nan")
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+class Benchmark:
+    """Collects one record per (stage, params)."""
+
+    def __init__(self, repeat=3, trace_memory=False):
+        self.repeat = repeat
+        self.trace_memory = trace_memory
+        self.records = []
+
+    def run(self, stage, fn, repeat=None, counts=None, **params):
+        """
+        Time fn() `repeat` times and record the stage. counts(result) may
+        return sizes (nodes, edges, bytes) to store with the record.
+        Returns the result of the last run.
+        """
+        seconds = []
+        tracemalloc_peak = None
+        rss_before = _rss_mb()
+        for _ in range(repeat or self.repeat):
+            gc.collect()
+            if self.trace_memory:
+                tracemalloc.start()
+            start = time.perf_counter()
+            result = fn()
+            seconds.append(time.perf_counter() - start)
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+                tracemalloc.stop()
+                tracemalloc_peak = max(tracemalloc_peak or 0.0, peak)
+        record = {
+            "stage": stage,
+            "params": params,
+            "seconds": [round(s, 6) for s in seconds],
+            "best": round(min(seconds), 6),
+            "mean": round(float(np.mean(seconds)), 6),
+            "rss_before_mb": round(rss_before, 1),
+            "rss_after_mb": round(_rss_mb(), 1),
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+            "tracemalloc_peak_mb": None if tracemalloc_peak is None else round(tracemalloc_peak, 1),
+            "counts": counts(result) if counts else {},
+        }
+        self.records.append(record)
+        params_text = ", ".join(f"{k}={v}" for k, v in params.items())
+        print(f"{stage:<32} {params_text:<36} best {record['best']:.4f}s  mean {record['mean']:.4f}s  "
+              f"rss {record['rss_after_mb']:.0f}MB {record['counts']}")
+        return result
+
+
+def graph_counts(result):
+    g = result[0] if isinstance(result, tuple) else result
+    return {"nodes": int(g.num_nodes()), "edges": int(g.num_edges())}
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def pick_seeds(node_map, num_queries, rng):
+    proteins = node_map["protein"]
+    ids = rng.choice(len(proteins), size=min(num_queries, len(proteins)), replace=False)
+    return [{"protein": [proteins.ids[int(i)]]} for i in ids]
+
+
+def run_suite(args):
+    bench = Benchmark(args.repeat, args.tracemalloc)
+    work_dir = tempfile.mkdtemp(prefix="unibiomap-bench-")
+    raw_dir = args.data_dir or os.path.join(work_dir, "raw")
+    link_path = os.path.join(raw_dir, "unibiomap.links.tsv")
+    if not os.path.exists(link_path):
+        info = bench.run("generate_synthetic", lambda: generate_synthetic_unibiomap(raw_dir, args.scale, seed=args.seed),
+                         repeat=1, scale=args.scale)
+        print(f"synthetic dataset: {info}")
+
+    # === 图处理与加载 ===
+    bench.run("process_knowledge_graph", lambda: process_knowledge_graph(link_path, simplify_edge=True),
+              repeat=1, counts=graph_counts)
+    bench.run("process_knowledge_graph_chunked", lambda: process_knowledge_graph_chunked(link_path, simplify_edge=True),
+              repeat=1, counts=graph_counts)
+    data_root = os.path.join(work_dir, "processed")
+    bench.run("load_or_process_graph", lambda: load_or_process_graph(raw_dir, data_root),
+              repeat=1, counts=graph_counts, cache="cold")
+    graph, csr_graph, node_map, id_map, id_names = bench.run(
+        "load_or_process_graph", lambda: load_or_process_graph(raw_dir, data_root), counts=graph_counts, cache="warm")
+    mapped = bench.run("open_graph_store", lambda: open_graph_store(raw_dir, data_root), cache="warm")
+    desc_paths = {ntype: os.path.join(raw_dir, f"{ntype}_desc.json") for ntype in NTYPES}
+    desc_dict = bench.run("load_or_build_desc_store",
+                          lambda: load_or_build_desc_store(desc_paths, os.path.join(data_root, "desc.sqlite")),
+                          repeat=1)
+
+    # === 子图采样 ===
+    rng = np.random.default_rng(args.seed)
+    queries = pick_seeds(node_map, args.queries, rng)
+    subgraphs = {}
+    for depth in args.depths:
+        for qi, sample_dict in enumerate(queries):
+            seed_name = sample_dict["protein"][0]
+            result = bench.run("subgraph_by_node", lambda: subgraph_by_node(
+                graph, sample_dict, node_map, depth=depth,
+                csr_graph=csr_graph, id_names=id_names, max_nodes=args.max_nodes),
+                counts=graph_counts, depth=depth, seed=seed_name, storage="dgl")
+            bench.run("subgraph_by_node", lambda: subgraph_by_node(
+                mapped[0], sample_dict, mapped[2], depth=depth, csr_graph=mapped[1], id_names=mapped[4],
+                max_nodes=args.max_nodes),
+                counts=graph_counts, depth=depth, seed=seed_name, storage="mmap")
+            if qi == 0:
+                subgraphs[depth] = (sample_dict, result)
+
+    # === 渲染与导出（每个深度取第一个查询） ===
+    for depth, (sample_dict, (sub_g, _, node_map_sub, _)) in subgraphs.items():
+        if sub_g.num_nodes() > args.max_render_nodes:
+            print(f"skip rendering depth {depth}: {sub_g.num_nodes()} nodes > --max-render-nodes")
+            continue
+        id_map_sub = {k: {vv: kk for kk, vv in v.items()} for k, v in node_map_sub.items()}
+        for limit in (args.display_limit, -1):
+            display_limits = {ntype: limit for ntype in NTYPES}
+            params = {"depth": depth, "display_limit": limit}
+            nx_g = bench.run("convert_subgraph_to_networkx", lambda: convert_subgraph_to_networkx(
+                sub_g, id_map_sub, display_limits, sample_dict, True, "hop"),
+                counts=lambda g: {"nodes": g.number_of_nodes(), "edges": g.number_of_edges()}, **params)
+            echarts_data = bench.run("nx_to_echarts_json", lambda: nx_to_echarts_json(nx_g, COLOR_MAP, desc_dict),
+                                     counts=lambda s: {"bytes": len(s)}, **params)
+            # app.generate_iframe 两种模式的主要开销：inline 页面的生成与 base64 编码，route 模式写压缩数据文件
+            bench.run("generate_echarts_html+base64", lambda: base64.b64encode(
+                generate_echarts_html(echarts_data, os.path.join(ROOT, "static", "echarts_graph.js"),
+                                      os.path.join(ROOT, ECHARTS_BUNDLE_PATH)).encode("utf-8")),
+                counts=lambda s: {"bytes": len(s)}, mode="inline", **params)
+            renderer = SubgraphRenderer(sub_g, id_map_sub, sample_dict, desc_dict)
+            bench.run("SubgraphRenderer.to_compact_json", lambda: renderer.to_compact_json(
+                display_limits, COLOR_MAP, "hop"), counts=lambda s: {"bytes": len(s)}, **params)
+            compact = bench.run("SubgraphRenderer.to_compact_json", lambda: renderer.to_compact_json(
+                display_limits, COLOR_MAP, "hop", layout="fixed"),
+                counts=lambda s: {"bytes": len(s)}, layout="fixed", **params)
+            bench.run("write_render_payload", lambda: write_render_payload(
+                compact, os.path.join(work_dir, "render"), compress=True),
+                counts=lambda p: {"bytes": os.path.getsize(p)}, mode="route", **params)
+
+        export_dir = os.path.join(work_dir, "export")
+        bench.run("report_subgraph", lambda: report_subgraph(sub_g, id_map_sub, save_root=export_dir),
+                  counts=lambda r: {"triples": len(r[1])}, depth=depth)
+        bench.run("export_subgraph_zip", lambda: export_subgraph_zip(
+            sub_g, id_map_sub, os.path.join(export_dir, "results.zip"), binary=True),
+            counts=lambda p: {"bytes": os.path.getsize(p)}, depth=depth)
+
+    if not args.keep:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return bench.records
+
+
+def compare(records, baseline_path):
+    """Print the best time of every stage relative to a baseline result file."""
+    with open(baseline_path, "r") as f:
+        baseline = json.load(f)
+
+    def key(record):
+        return record["stage"], json.dumps(record["params"], sort_keys=True)
+
+    old = {key(r): r for r in baseline["results"]}
+    print(f"\ncompared with {baseline_path} (commit {baseline['meta'].get('commit')}):")
+    for record in records:
+        ref = old.get(key(record))
+        if ref is None or ref["best"] == 0:
+            continue
+        ratio = record["best"] / ref["best"]
+        print(f"{record['stage']:<32} {key(record)[1]:<60} {ref['best']:.4f}s -> {record['best']:.4f}s  x{ratio:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the UniBioMap pipeline on synthetic data.")
+    parser.add_argument("--scale", type=float, default=0.05, help="Size of the synthetic graph (1 = ~1M edges).")
+    parser.add_argument("--data-dir", default=None, help="Existing or target folder of the synthetic raw files.")
+    parser.add_argument("--depths", type=int, nargs="+", default=[1, 2, 3, 4])
+    parser.add_argument("--queries", type=int, default=3, help="Seed proteins per depth.")
+    parser.add_argument("--max-nodes", type=int, default=None)
+    parser.add_argument("--display-limit", type=int, default=10)
+    parser.add_argument("--max-render-nodes", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tracemalloc", action="store_true", help="Also record peak Python/NumPy allocations.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="Result JSON path (default: results/bench/<commit>-<time>.json).")
+    parser.add_argument("--compare", default=None, help="Baseline result JSON to compare with.")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary work folder.")
+    args = parser.parse_args()
+
+    records = run_suite(args)
+    commit = _git_commit()
+    meta = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "torch": torch.__version__,
+        "dgl": dgl.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "args": vars(args),
+    }
+    out = args.out or os.path.join(ROOT, "results", "bench", f"{commit or 'nogit'}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({"meta": meta, "results": records}, f, indent=2)
+    print(f"\nresults written to {out}")
+    if args.compare:
+        compare(records, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Generate a synthetic UniBioMap-shaped dataset: unibiomap.links.tsv plus the
+six *_desc.json files, in the layout of database/unibiomap/.
+
+Node IDs follow the real formats (UniProt, UCI:, UMLS:, Reactome/SMPDB/KEGG,
+GO:, HP:), edges follow the UniBioMap edge-type mix, and the endpoints of
+every edge type are drawn from a power-law (Zipf-like) degree distribution.
+
+Example:
+    python benchmarks/synthetic_graph.py benchmarks/data --scale 0.1
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+# scale=1 时各类节点数
+NODE_COUNTS = {
+    "protein": 20000,
+    "compound": 60000,
+    "disease": 12000,
+    "pathway": 6000,
+    "go": 18000,
+    "phenotype": 9000,
+}
+
+# (头类型, 尾类型, 关系, 占全部边的比例)
+EDGE_MIX = [
+    ("protein", "protein", "INTERACTS_WITH", 0.30),
+    ("protein", "go", "ANNOTATED_WITH", 0.18),
+    ("compound", "protein", "TARGETS", 0.12),
+    ("protein", "compound", "HAS_METABOLITE", 0.08),
+    ("protein", "pathway", "PARTICIPATES_IN", 0.10),
+    ("compound", "pathway", "PARTICIPATES_IN", 0.04),
+    ("protein", "disease", "ASSOCIATED_WITH", 0.07),
+    ("protein", "phenotype", "ASSOCIATED_WITH", 0.04),
+    ("disease", "phenotype", "HAS_PHENOTYPE", 0.03),
+    ("compound", "disease", "TREATS", 0.02),
+    ("go", "go", "IS_A", 0.02),
+]
+
+NUM_EDGES = 1_000_000
+
+
+def make_node_ids(ntype, n):
+    """Node names in the ID formats of the real release."""
+    idx = np.arange(n)
+    if ntype == "protein":
+        return [f"P{i:05d}" if i < 100000 else f"Q{i:06d}" for i in idx.tolist()]
+    if ntype == "compound":
+        return [f"UCI:{i + 1}" for i in idx.tolist()]
+    if ntype == "disease":
+        return [f"UMLS:C{i:07d}" for i in idx.tolist()]
+    if ntype == "pathway":
+        # Reactome / SMPDB / KEGG 三种来源
+        return [f"R-HSA-{i}" if i % 3 == 0 else f"SMP{i:07d}" if i % 3 == 1 else f"hsa{i:05d}"
+                for i in idx.tolist()]
+    if ntype == "go":
+        return [f"GO:{i:07d}" for i in idx.tolist()]
+    if ntype == "phenotype":
+        return [f"HP:{i:07d}" for i in idx.tolist()]
+    return [f"{ntype}_{i}" for i in idx.tolist()]
+
+
+def power_law_sampler(n, alpha, rng):
+    """
+    Return a function drawing node indices in [0, n) with probability
+    proportional to rank^-alpha, ranks shuffled so hubs are spread over IDs.
+    """
+    weights = np.arange(1, n + 1, dtype=np.float64) ** -alpha
+    cdf = np.cumsum(weights)
+    cdf /= cdf[-1]
+    perm = rng.permutation(n)
+
+    def sample(size):
+        return perm[np.minimum(np.searchsorted(cdf, rng.random(size)), n - 1)]
+    return sample
+
+
+def make_desc(ntype, names, rng):
+    if ntype == "protein":
+        return {name: {"entry_name": f"{name}_HUMAN", "protein_name": f"Synthetic protein {name}"}
+                for name in names}
+    if ntype == "compound":
+        return {name: {"name": f"compound-{name.split(':')[-1]}", "inchikey": f"KEY{name.split(':')[-1]}",
+                       "smiles": "C" * int(rng.integers(1, 12))}
+                for name in names}
+    return {name: {"name": f"{ntype} {name}", "definition": f"Synthetic {ntype} entry {name}."}
+            for name in names}
+
+
+def generate_synthetic_unibiomap(out_dir, scale=1.0, alpha=1.1, seed=0, chunk_edges=1 << 20):
+    """
+    Write a synthetic dataset to out_dir.
+    Parameters:
+        - out_dir: Output folder (unibiomap.links.tsv and *_desc.json).
+        - scale: Multiplier of the node and edge counts (scale=1: ~125k
+          nodes, 1M edges).
+        - alpha: Exponent of the power-law endpoint distribution.
+        - seed: Random seed.
+        - chunk_edges: Number of edges generated and written at once.
+    Output:
+        - A dictionary with the node counts per type and the edge count.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    counts = {ntype: max(int(n * scale), 10) for ntype, n in NODE_COUNTS.items()}
+    names = {ntype: np.array(make_node_ids(ntype, n), dtype=object) for ntype, n in counts.items()}
+    samplers = {ntype: power_law_sampler(n, alpha, rng) for ntype, n in counts.items()}
+
+    num_edges = max(int(NUM_EDGES * scale), 100)
+    with open(os.path.join(out_dir, "unibiomap.links.tsv"), "w", encoding="utf-8") as f:
+        for h_type, t_type, rel, share in EDGE_MIX:
+            total = int(num_edges * share)
+            for start in range(0, total, chunk_edges):
+                size = min(chunk_edges, total - start)
+                heads = names[h_type][samplers[h_type](size)]
+                tails = names[t_type][samplers[t_type](size)]
+                f.write("".join((f"{h_type}\t{t_type}\t" + heads + f"\t{rel}\t" + tails + "\n").tolist()))
+
+    for ntype in counts:
+        with open(os.path.join(out_dir, f"{ntype}_desc.json"), "w", encoding="utf-8") as f:
+            json.dump(make_desc(ntype, names[ntype].tolist(), rng), f)
+    return {"num_nodes": counts, "num_edges": sum(int(num_edges * share) for *_, share in EDGE_MIX)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic UniBioMap-shaped dataset.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--alpha", type=float, default=1.1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    info = generate_synthetic_unibiomap(args.out_dir, args.scale, args.alpha, args.seed)
+    print(json.dumps(info, indent=2))
+
+
+if __name__ == "__main__":
+    main()
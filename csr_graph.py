@@ -0,0 +1,667 @@
+import json
+import os
+
+import numpy as np
+
+# 2: 保存出边的原始边 ID (eids)，用于按边 ID 顺序生成诱导子图
+CSR_FORMAT_VERSION = 2
+
+
+def _gather_positions(indptr, frontier):
+    """
+    Positions in the CSR indices array of the neighbour lists of all
+    frontier nodes, and the length of every list.
+    """
+    starts = indptr[frontier]
+    counts = indptr[frontier + 1] - starts
+    total = int(counts.sum())
+    offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+    return offsets + np.arange(total), counts
+
+
+def _gather_neighbors(indptr, indices, frontier):
+    """
+    Concatenate the neighbour lists of all frontier nodes in one vectorized
+    gather over a CSR (indptr, indices) pair.
+    """
+    positions, _ = _gather_positions(indptr, frontier)
+    if len(positions) == 0:
+        return np.empty(0, dtype=np.int64)
+    return np.asarray(indices[positions], dtype=np.int64)
+
+
+def _chunk_frontier(indptr, frontier, chunk_edges):
+    """
+    Split the frontier into pieces whose neighbour lists hold at most
+    chunk_edges entries (a single hub may exceed it on its own).
+    """
+    if chunk_edges is None or len(frontier) == 0:
+        yield frontier
+        return
+    counts = indptr[frontier + 1] - indptr[frontier]
+    bounds = np.cumsum(counts) // chunk_edges
+    cuts = np.flatnonzero(np.diff(bounds)) + 1
+    for piece in np.split(frontier, cuts):
+        yield piece
+
+
+def _has_unvisited(indptr, indices, frontier, visited, chunk_edges):
+    """
+    Whether any frontier node has a neighbour not marked in `visited`.
+    Stops at the first chunk that has one.
+    """
+    for piece in _chunk_frontier(indptr, frontier, chunk_edges):
+        if not visited[_gather_neighbors(indptr, indices, piece)].all():
+            return True
+    return False
+
+
+class CSRGraph:
+    """
+    Per-etype adjacency of a DGL heterograph held as NumPy CSR/CSC arrays.
+
+    For every canonical etype (src, rel, dst) two arcs are kept: the
+    out-going CSR (src -> dst) and the in-coming CSC (dst -> src), so a
+    traversal can reach neighbours on both sides without building a
+    reverse-augmented graph.
+    """
+
+    def __init__(self, num_nodes, canonical_etypes, adj, eids=None):
+        # num_nodes: {ntype: int}
+        # adj: {canonical_etype: {"out": (indptr, indices), "in": (indptr, indices)}}
+        # eids: {canonical_etype: 原始边 ID，与 "out" 的 indices 一一对应}
+        self.num_nodes = dict(num_nodes)
+        self.ntypes = list(self.num_nodes)
+        self.canonical_etypes = [tuple(et) for et in canonical_etypes]
+        self.adj = adj
+        self.eids = eids
+
+    @classmethod
+    def from_dgl(cls, graph):
+        num_nodes = {ntype: graph.num_nodes(ntype) for ntype in graph.ntypes}
+        adj = {}
+        eids = {}
+        for etype in graph.canonical_etypes:
+            out_indptr, out_indices, out_eids = graph.adj_tensors('csr', etype=etype)
+            in_indptr, in_indices, _ = graph.adj_tensors('csc', etype=etype)
+            adj[etype] = {
+                "out": (out_indptr.numpy(), out_indices.numpy()),
+                "in": (in_indptr.numpy(), in_indices.numpy()),
+            }
+            # 边 ID 为空表示按顺序编号
+            eids[etype] = out_eids.numpy() if out_eids.numel() else np.arange(len(out_indices), dtype=np.int64)
+        return cls(num_nodes, graph.canonical_etypes, adj, eids)
+
+    def arcs(self, etypes=None):
+        """
+        Yield (from_type, to_type, indptr, indices) for every traversal
+        direction of every edge type, or of the given canonical etypes only.
+        """
+        for etype in self.canonical_etypes:
+            if etypes is not None and etype not in etypes:
+                continue
+            src_type, _, dst_type = etype
+            yield (src_type, dst_type) + tuple(self.adj[etype]["out"])
+            yield (dst_type, src_type) + tuple(self.adj[etype]["in"])
+
+    def degrees(self, etype, direction, ids):
+        """
+        Degrees of the given nodes for one edge type, read off the indptr
+        array: direction "out" counts successors, "in" predecessors.
+        """
+        indptr = self.adj[tuple(etype)][direction][0]
+        ids = np.asarray(ids, dtype=np.int64)
+        return indptr[ids + 1] - indptr[ids]
+
+    def induced_edges(self, nodes, etypes=None):
+        """
+        Edges among the given nodes, like dgl.node_subgraph, read off the
+        out-going CSR arrays.
+        Parameters:
+            - nodes: A dictionary of sorted original node ID arrays per node type.
+            - etypes: If given, only edges of these canonical etypes are
+              collected; the others are left empty.
+        Output:
+            - A dictionary {canonical_etype: (src, dst, eid)}: endpoints as
+              positions in `nodes`, original edge IDs, in edge ID order.
+        """
+        edges = {}
+        empty = np.empty(0, dtype=np.int64)
+        for etype in self.canonical_etypes:
+            if etypes is not None and etype not in etypes:
+                edges[etype] = (empty, empty, empty)
+                continue
+            src_type, _, dst_type = etype
+            src_nodes = np.asarray(nodes.get(src_type, []), dtype=np.int64)
+            dst_nodes = np.asarray(nodes.get(dst_type, []), dtype=np.int64)
+            indptr, indices = self.adj[etype]["out"]
+            positions, counts = _gather_positions(indptr, src_nodes)
+            dst = np.asarray(indices[positions], dtype=np.int64)
+            # 目标节点在 dst_nodes 中的位置即为新编号
+            new_dst = np.minimum(np.searchsorted(dst_nodes, dst), max(len(dst_nodes) - 1, 0))
+            keep = dst_nodes[new_dst] == dst if len(dst_nodes) else np.zeros(len(dst), dtype=bool)
+            new_src = np.repeat(np.arange(len(src_nodes)), counts)[keep]
+            new_dst = new_dst[keep]
+            eid = (np.asarray(self.eids[etype][positions[keep]], dtype=np.int64) if self.eids is not None
+                   else positions[keep])
+            order = np.argsort(eid, kind='stable')
+            edges[etype] = (new_src[order], new_dst[order], eid[order])
+        return edges
+
+    def save(self, save_dir):
+        os.makedirs(save_dir, exist_ok=True)
+        meta = {"format_version": CSR_FORMAT_VERSION, "num_nodes": self.num_nodes,
+                "canonical_etypes": self.canonical_etypes}
+        for i, etype in enumerate(self.canonical_etypes):
+            for direction in ("out", "in"):
+                indptr, indices = self.adj[etype][direction]
+                np.save(os.path.join(save_dir, f"{i}_{direction}_indptr.npy"), indptr)
+                np.save(os.path.join(save_dir, f"{i}_{direction}_indices.npy"), indices)
+            if self.eids is not None:
+                np.save(os.path.join(save_dir, f"{i}_out_eids.npy"), self.eids[etype])
+        with open(os.path.join(save_dir, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, save_dir, mmap=True):
+        with open(os.path.join(save_dir, "meta.json"), "r") as f:
+            meta = json.load(f)
+        mmap_mode = 'r' if mmap else None
+        adj = {}
+        canonical_etypes = [tuple(et) for et in meta["canonical_etypes"]]
+        for i, etype in enumerate(canonical_etypes):
+            adj[etype] = {
+                direction: (
+                    np.load(os.path.join(save_dir, f"{i}_{direction}_indptr.npy"), mmap_mode=mmap_mode),
+                    np.load(os.path.join(save_dir, f"{i}_{direction}_indices.npy"), mmap_mode=mmap_mode),
+                )
+                for direction in ("out", "in")
+            }
+        eids = None
+        if meta.get("format_version", 1) >= 2:
+            eids = {etype: np.load(os.path.join(save_dir, f"{i}_out_eids.npy"), mmap_mode=mmap_mode)
+                    for i, etype in enumerate(canonical_etypes)}
+        return cls(meta["num_nodes"], canonical_etypes, adj, eids)
+
+
+def _matches_etype(etype, specs):
+    # 边类型可写作完整的 (src, rel, dst) 或仅关系名
+    return tuple(etype) in specs or etype[1] in specs
+
+
+def traversal_etypes(canonical_etypes, allow_etypes=None, deny_etypes=None,
+                     allow_ntypes=None, deny_ntypes=None):
+    """
+    The canonical etypes a traversal may follow under allow/deny lists.
+    Parameters:
+        - canonical_etypes: All canonical etypes of the graph.
+        - allow_etypes, deny_etypes: Edge types, as (src, rel, dst) tuples or
+          relation names, to follow only / never.
+        - allow_ntypes, deny_ntypes: Node types to reach only / never; edge
+          types with an endpoint type that is not allowed are not followed.
+        An allow list of None allows everything, an empty allow list allows
+        nothing (only the seeds are kept).
+    Output:
+        - A set of canonical etypes, or None when nothing is filtered out.
+    """
+    if allow_etypes is None and allow_ntypes is None and not deny_etypes and not deny_ntypes:
+        return None
+    if allow_etypes is not None:
+        allow_etypes = {tuple(e) if isinstance(e, (list, tuple)) else e for e in allow_etypes}
+    deny_etypes = {tuple(e) if isinstance(e, (list, tuple)) else e for e in deny_etypes or []}
+    selected = set()
+    for etype in canonical_etypes:
+        etype = tuple(etype)
+        if allow_etypes is not None and not _matches_etype(etype, allow_etypes):
+            continue
+        if _matches_etype(etype, deny_etypes):
+            continue
+        if allow_ntypes is not None and not (etype[0] in allow_ntypes and etype[2] in allow_ntypes):
+            continue
+        if deny_ntypes and (etype[0] in deny_ntypes or etype[2] in deny_ntypes):
+            continue
+        selected.add(etype)
+    return selected
+
+
+def khop_nodes(csr_graph, seeds, depth=1, node_budgets=None, max_nodes=None,
+               chunk_edges=1 << 22, etypes=None):
+    """
+    Collect the k-hop neighbourhood of the seed nodes, treating every edge as
+    undirected, with optional budgets on the number of collected nodes.
+    Parameters:
+        - csr_graph: The CSRGraph to traverse.
+        - seeds: A dictionary of seed node IDs. The keys are node types.
+        - depth: The number of hops to expand.
+        - node_budgets: Maximum number of nodes to collect per node type.
+          Types that are not listed are unbounded.
+        - max_nodes: Maximum number of nodes to collect in total.
+        - chunk_edges: Maximum number of neighbour entries gathered at once.
+        - etypes: If given, only edges of these canonical etypes are
+          followed (see traversal_etypes).
+    Output:
+        - nodes: A dictionary of sorted node ID arrays for every node type.
+        - truncated: Whether a budget stopped the expansion early.
+    Seed nodes are always kept. When a budget cannot take all new nodes of a
+    hop, the ones with the most edges into the current frontier are kept.
+    """
+    node_budgets = node_budgets or {}
+    visited = {ntype: np.zeros(n, dtype=bool) for ntype, n in csr_graph.num_nodes.items()}
+    frontier = {}
+    total = 0
+    for ntype, ids in seeds.items():
+        ids = np.unique(np.asarray(ids, dtype=np.int64))
+        if len(ids) == 0:
+            continue
+        visited[ntype][ids] = True
+        frontier[ntype] = ids
+        total += len(ids)
+    counts = {ntype: int(mask.sum()) for ntype, mask in visited.items()}
+
+    def remaining(ntype):
+        left = node_budgets.get(ntype, -1)
+        left = np.inf if left is None or left < 0 else left - counts[ntype]
+        if max_nodes is not None and max_nodes >= 0:
+            left = min(left, max_nodes - total)
+        return max(left, 0)
+
+    truncated = False
+    for _ in range(depth):
+        if not frontier:
+            break
+        candidates = {}
+        for from_type, to_type, indptr, indices in csr_graph.arcs(etypes):
+            if from_type not in frontier:
+                continue
+            if remaining(to_type) == 0:
+                # 预算已用完的类型不再收集候选；尚未截断时只确认是否还有未访问的邻居被舍弃
+                if not truncated:
+                    truncated = _has_unvisited(indptr, indices, frontier[from_type], visited[to_type], chunk_edges)
+                continue
+            for piece in _chunk_frontier(indptr, frontier[from_type], chunk_edges):
+                nbrs = _gather_neighbors(indptr, indices, piece)
+                nbrs = nbrs[~visited[to_type][nbrs]]
+                if len(nbrs) == 0:
+                    continue
+                uniq, hits = np.unique(nbrs, return_counts=True)
+                candidates.setdefault(to_type, []).append((uniq, hits))
+
+        next_frontier = {}
+        for ntype, parts in candidates.items():
+            uniq, inverse = np.unique(np.concatenate([u for u, _ in parts]), return_inverse=True)
+            hits = np.bincount(inverse, weights=np.concatenate([h for _, h in parts]))
+            left = remaining(ntype)
+            if len(uniq) > left:
+                truncated = True
+                keep = np.argsort(-hits, kind='stable')[:int(left)]
+                uniq = np.sort(uniq[keep])
+            if len(uniq) == 0:
+                continue
+            visited[ntype][uniq] = True
+            counts[ntype] += len(uniq)
+            total += len(uniq)
+            next_frontier[ntype] = uniq
+        frontier = next_frontier
+
+    nodes = {ntype: np.flatnonzero(mask) for ntype, mask in visited.items()}
+    return nodes, truncated
+
+
+def _expand_level(csr_graph, frontier, dist, level, allowed=None, chunk_edges=1 << 22, etypes=None):
+    """
+    One undirected BFS level: the unvisited (dist == -1) neighbours of the
+    frontier get distance `level`. With `allowed` ({ntype: bool mask}) only
+    the allowed nodes are entered. Returns the new frontier.
+    """
+    found = {}
+    for from_type, to_type, indptr, indices in csr_graph.arcs(etypes):
+        if from_type not in frontier:
+            continue
+        for piece in _chunk_frontier(indptr, frontier[from_type], chunk_edges):
+            nbrs = _gather_neighbors(indptr, indices, piece)
+            mask = dist[to_type][nbrs] < 0
+            if allowed is not None:
+                mask &= allowed[to_type][nbrs]
+            nbrs = nbrs[mask]
+            if len(nbrs):
+                found.setdefault(to_type, []).append(np.unique(nbrs))
+    next_frontier = {}
+    for ntype, parts in found.items():
+        ids = np.unique(np.concatenate(parts))
+        dist[ntype][ids] = level
+        next_frontier[ntype] = ids
+    return next_frontier
+
+
+def _frontier_volume(csr_graph, frontier, etypes=None):
+    # 扩展一层需要读取的邻接表项数，双向搜索每次扩展代价较小的一侧
+    volume = 0
+    for from_type, _, indptr, _ in csr_graph.arcs(etypes):
+        if from_type in frontier:
+            ids = frontier[from_type]
+            volume += int((indptr[ids + 1] - indptr[ids]).sum())
+    return volume
+
+
+def connecting_paths(csr_graph, sources, targets, max_length=4, slack=0, max_nodes=None,
+                     chunk_edges=1 << 22, etypes=None):
+    """
+    Nodes and edges on the paths between two seed groups, treating every
+    edge as undirected, found with a bidirectional BFS.
+    Parameters:
+        - csr_graph: The CSRGraph to traverse.
+        - sources, targets: Dictionaries of seed node IDs per node type.
+        - max_length: Longest shortest-path length searched for.
+        - slack: Also keep the paths up to `slack` hops longer than the
+          shortest one.
+        - max_nodes: Maximum number of path nodes; the nodes on the shortest
+          paths are kept first.
+        - chunk_edges: Maximum number of neighbour entries gathered at once.
+        - etypes: If given, only paths over these canonical etypes are
+          searched (see traversal_etypes).
+    Output:
+        - nodes: A dictionary of sorted node ID arrays for every node type
+          (the seeds are always included).
+        - edges: A dictionary {canonical_etype: sorted original edge IDs} of
+          the edges on the paths.
+        - length: The shortest path length, or None if the groups are not
+          connected within max_length hops.
+    A node v is kept when dist(A, v) + dist(v, B) <= length + slack, an edge
+    (u, v) when dist(A, u) + 1 + dist(v, B) <= length + slack in either
+    direction; with slack=0 these are exactly the shortest paths.
+    """
+    dist = {}
+    frontier = {}
+    for side, seeds in (("a", sources), ("b", targets)):
+        dist[side] = {ntype: np.full(n, -1, dtype=np.int32) for ntype, n in csr_graph.num_nodes.items()}
+        frontier[side] = {}
+        for ntype, ids in seeds.items():
+            ids = np.unique(np.asarray(ids, dtype=np.int64))
+            if len(ids):
+                dist[side][ntype][ids] = 0
+                frontier[side][ntype] = ids
+    seeds_nodes = {ntype: np.flatnonzero((dist["a"][ntype] == 0) | (dist["b"][ntype] == 0))
+                   for ntype in csr_graph.ntypes}
+    levels = {"a": 0, "b": 0}
+
+    def meeting_length(side, ids_by_type):
+        # 新访问的节点若已被另一侧访问，即得到一条路径
+        other = "b" if side == "a" else "a"
+        best = None
+        for ntype, ids in ids_by_type.items():
+            d = dist[other][ntype][ids]
+            d = d[d >= 0]
+            if len(d):
+                length = int(d.min()) + levels[side]
+                best = length if best is None else min(best, length)
+        return best
+
+    length = meeting_length("a", frontier["a"])
+    while True:
+        limit = max_length if length is None else length + slack
+        if levels["a"] + levels["b"] >= limit:
+            break
+        sides = [side for side in ("a", "b") if frontier[side]]
+        if not sides:
+            break
+        side = min(sides, key=lambda s: _frontier_volume(csr_graph, frontier[s], etypes))
+        levels[side] += 1
+        frontier[side] = _expand_level(csr_graph, frontier[side], dist[side], levels[side],
+                                       chunk_edges=chunk_edges, etypes=etypes)
+        if length is None:
+            length = meeting_length(side, frontier[side])
+    if length is None:
+        return seeds_nodes, {}, None
+    limit = length + slack
+
+    # 一侧的距离只算到了该侧的搜索深度；路径上更远的节点必然落在另一侧已访问的范围内，
+    # 在该范围内继续 BFS 即可补全距离
+    for side, other in (("a", "b"), ("b", "a")):
+        boundary = {ntype: np.flatnonzero(d == levels[side]) for ntype, d in dist[side].items()}
+        boundary = {ntype: ids for ntype, ids in boundary.items() if len(ids)}
+        for level in range(levels[side] + 1, limit + 1):
+            if not boundary:
+                break
+            allowed = {ntype: (d >= 0) & (d <= limit - level) for ntype, d in dist[other].items()}
+            boundary = _expand_level(csr_graph, boundary, dist[side], level, allowed, chunk_edges, etypes)
+
+    total = {ntype: np.where((dist["a"][ntype] >= 0) & (dist["b"][ntype] >= 0),
+                             dist["a"][ntype].astype(np.int64) + dist["b"][ntype], limit + 1)
+             for ntype in csr_graph.ntypes}
+    keep = {ntype: t <= limit for ntype, t in total.items()}
+    if max_nodes is not None and max_nodes >= 0:
+        candidates = [(ntype, np.flatnonzero(mask)) for ntype, mask in keep.items()]
+        num_kept = sum(len(ids) for _, ids in candidates)
+        if num_kept > max_nodes:
+            # 优先保留最短路径上的节点
+            scores = np.concatenate([total[ntype][ids] for ntype, ids in candidates])
+            rank = np.empty(num_kept, dtype=np.int64)
+            rank[np.argsort(scores, kind='stable')] = np.arange(num_kept)
+            offset = 0
+            for ntype, ids in candidates:
+                keep[ntype][ids[rank[offset:offset + len(ids)] >= max_nodes]] = False
+                offset += len(ids)
+    for ntype, ids in seeds_nodes.items():
+        keep[ntype][ids] = True
+
+    edges = {}
+    for etype in csr_graph.canonical_etypes:
+        if etypes is not None and etype not in etypes:
+            continue
+        src_type, _, dst_type = etype
+        src = np.flatnonzero(keep[src_type])
+        indptr, indices = csr_graph.adj[etype]["out"]
+        positions, counts = _gather_positions(indptr, src)
+        dst = np.asarray(indices[positions], dtype=np.int64)
+        src = np.repeat(src, counts)
+        da_src, db_src = dist["a"][src_type][src].astype(np.int64), dist["b"][src_type][src].astype(np.int64)
+        da_dst, db_dst = dist["a"][dst_type][dst].astype(np.int64), dist["b"][dst_type][dst].astype(np.int64)
+        forward = (da_src >= 0) & (db_dst >= 0) & (da_src + 1 + db_dst <= limit)
+        backward = (db_src >= 0) & (da_dst >= 0) & (db_src + 1 + da_dst <= limit)
+        on_path = keep[dst_type][dst] & (forward | backward)
+        eid = (np.asarray(csr_graph.eids[etype][positions[on_path]], dtype=np.int64) if csr_graph.eids is not None
+               else positions[on_path])
+        if len(eid):
+            edges[etype] = np.sort(eid)
+    nodes = {ntype: np.flatnonzero(mask) for ntype, mask in keep.items()}
+    return nodes, edges, length
+
+
+class CombinedAdjacency:
+    """
+    The undirected adjacency of all edge types of a CSRGraph in one CSR
+    matrix over a global node numbering (node types laid out one after the
+    other, see offsets), for whole-graph iterations such as personalized
+    PageRank. etype_codes gives the etype index of every entry, so edge types
+    can still be filtered out.
+    """
+
+    def __init__(self, ntypes, num_nodes, canonical_etypes, indptr, indices, etype_codes):
+        self.ntypes = list(ntypes)
+        self.num_nodes = dict(num_nodes)
+        self.canonical_etypes = [tuple(et) for et in canonical_etypes]
+        self.offsets = {}
+        offset = 0
+        for ntype in self.ntypes:
+            self.offsets[ntype] = offset
+            offset += self.num_nodes[ntype]
+        self.total_nodes = offset
+        self.indptr = indptr
+        self.indices = indices
+        self.etype_codes = etype_codes
+        self.degrees = np.diff(indptr)
+        self.empty_rows = self.degrees == 0
+
+    @classmethod
+    def from_csr(cls, csr_graph):
+        ntypes = list(csr_graph.ntypes)
+        offsets = {}
+        offset = 0
+        for ntype in ntypes:
+            offsets[ntype] = offset
+            offset += csr_graph.num_nodes[ntype]
+        rows, cols, codes = [], [], []
+        for code, etype in enumerate(csr_graph.canonical_etypes):
+            src_type, _, dst_type = etype
+            # 出边与入边各记一次，即无向图
+            for from_type, to_type, direction in ((src_type, dst_type, "out"), (dst_type, src_type, "in")):
+                indptr, indices = csr_graph.adj[etype][direction]
+                rows.append(offsets[from_type] + np.repeat(np.arange(len(indptr) - 1, dtype=np.int64),
+                                                           np.diff(indptr)))
+                cols.append(offsets[to_type] + np.asarray(indices, dtype=np.int64))
+                codes.append(np.full(len(indices), code, dtype=np.int16))
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        order = np.argsort(rows, kind='stable')
+        index_dtype = np.int32 if offset < 2 ** 31 else np.int64
+        indices = (np.concatenate(cols)[order] if cols else np.empty(0)).astype(index_dtype)
+        etype_codes = np.concatenate(codes)[order] if codes else np.empty(0, dtype=np.int16)
+        indptr = np.zeros(offset + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=offset), out=indptr[1:])
+        return cls(ntypes, csr_graph.num_nodes, csr_graph.canonical_etypes, indptr, indices, etype_codes)
+
+    def save(self, save_dir, version=None):
+        os.makedirs(save_dir, exist_ok=True)
+        np.save(os.path.join(save_dir, "indptr.npy"), self.indptr)
+        np.save(os.path.join(save_dir, "indices.npy"), self.indices)
+        np.save(os.path.join(save_dir, "etype_codes.npy"), self.etype_codes)
+        meta = {"ntypes": self.ntypes, "num_nodes": self.num_nodes, "canonical_etypes": self.canonical_etypes,
+                "num_entries": int(len(self.indices)), "version": version}
+        with open(os.path.join(save_dir, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, save_dir, mmap=True):
+        with open(os.path.join(save_dir, "meta.json"), "r") as f:
+            meta = json.load(f)
+        mmap_mode = 'r' if mmap else None
+        arrays = [np.load(os.path.join(save_dir, f"{name}.npy"), mmap_mode=mmap_mode)
+                  for name in ("indptr", "indices", "etype_codes")]
+        return cls(meta["ntypes"], meta["num_nodes"], meta["canonical_etypes"], *arrays)
+
+    def global_ids(self, ntype, ids):
+        return self.offsets[ntype] + np.asarray(ids, dtype=np.int64)
+
+    def split(self, values):
+        """Split a vector over the global numbering into {ntype: array}."""
+        return {ntype: values[self.offsets[ntype]:self.offsets[ntype] + self.num_nodes[ntype]]
+                for ntype in self.ntypes}
+
+
+def load_or_build_combined_adjacency(csr_graph, save_dir, version=None):
+    """
+    Load the combined adjacency saved in save_dir, or build it from the
+    CSRGraph and save it there. `version` is the source hash the CSRGraph
+    was built from (see utils.processed_version); the adjacency is rebuilt
+    when it differs from the saved one, or when the node and edge counts
+    have changed.
+    """
+    meta_path = os.path.join(save_dir, "meta.json")
+    num_entries = 2 * sum(len(csr_graph.adj[etype]["out"][1]) for etype in csr_graph.canonical_etypes)
+    if os.path.exists(meta_path):
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        if (meta.get("version") == version
+                and meta["num_nodes"] == csr_graph.num_nodes and meta["num_entries"] == num_entries
+                and [tuple(et) for et in meta["canonical_etypes"]] == csr_graph.canonical_etypes):
+            return CombinedAdjacency.load(save_dir)
+    adjacency = CombinedAdjacency.from_csr(csr_graph)
+    adjacency.save(save_dir, version=version)
+    return adjacency
+
+
+def _row_sums(indptr, values, empty_rows):
+    """Sum of values over every CSR row, by np.add.reduceat over the non-empty rows."""
+    sums = np.zeros(len(indptr) - 1)
+    if len(values) == 0:
+        return sums
+    # 非空行的起点严格递增且都小于 len(values)，每段正好到下一个非空行的起点（或数组末尾）
+    nonempty = ~empty_rows
+    sums[nonempty] = np.add.reduceat(values, indptr[:-1][nonempty])
+    return sums
+
+
+def personalized_pagerank(adjacency, seeds, alpha=0.15, iterations=20, tol=1e-4, eps=1e-7,
+                          etypes=None):
+    """
+    Personalized PageRank (random walk with restart to the seeds) over the
+    undirected combined adjacency, by sparse matrix-vector iterations.
+    Parameters:
+        - adjacency: A CombinedAdjacency.
+        - seeds: A dictionary of seed node IDs per node type.
+        - alpha: Restart probability of every step.
+        - iterations: Maximum number of iterations, which bounds the cost
+          of a query at iterations passes over the adjacency.
+        - tol: Stop when the L1 change of the scores falls below tol.
+        - eps: Nodes with less probability mass than eps do not propagate
+          it (their mass restarts at the seeds). While few nodes carry
+          mass, only their neighbour lists are read.
+        - etypes: If given, the walk only follows these canonical etypes.
+    Output:
+        - A dictionary of score arrays (summing to 1 over all types) per node type.
+    """
+    total = adjacency.total_nodes
+    restart = np.zeros(total)
+    seed_ids = np.unique(np.concatenate(
+        [adjacency.global_ids(ntype, ids) for ntype, ids in seeds.items()] + [np.empty(0, dtype=np.int64)]))
+    if len(seed_ids) == 0:
+        return adjacency.split(restart)
+    restart[seed_ids] = 1.0 / len(seed_ids)
+    entry_mask = None
+    degrees = adjacency.degrees
+    if etypes is not None:
+        allowed = np.array([etype in etypes for etype in adjacency.canonical_etypes], dtype=bool)
+        entry_mask = allowed[adjacency.etype_codes]
+        degrees = _row_sums(adjacency.indptr, entry_mask.astype(np.float64), adjacency.empty_rows)
+    num_entries = len(adjacency.indices)
+
+    scores = restart.copy()
+    for _ in range(iterations):
+        active = np.flatnonzero(scores > eps)
+        active = active[degrees[active] > 0]
+        # 每个活跃节点把分数平均分给邻居；无邻居（或被过滤）节点的分数回到种子
+        share = np.zeros(total)
+        share[active] = scores[active] / degrees[active]
+        if 4 * int(adjacency.degrees[active].sum()) < num_entries:
+            # 分数仍集中在种子附近：只读取活跃节点的邻接表
+            positions, counts = _gather_positions(adjacency.indptr, active)
+            weights = np.repeat(share[active], counts)
+            if entry_mask is not None:
+                weights = weights * entry_mask[positions]
+            spread = np.bincount(np.asarray(adjacency.indices[positions], dtype=np.int64), weights=weights,
+                                 minlength=total)
+        else:
+            # 邻接矩阵对称：邻居分数之和即按行求和
+            weights = share[adjacency.indices]
+            if entry_mask is not None:
+                weights *= entry_mask
+            spread = _row_sums(adjacency.indptr, weights, adjacency.empty_rows)
+        new_scores = (1 - alpha) * spread
+        new_scores += (1 - new_scores.sum()) * restart
+        change = np.abs(new_scores - scores).sum()
+        scores = new_scores
+        if change < tol:
+            break
+    return adjacency.split(scores)
+
+
+def top_nodes_per_type(scores, top_n, seeds=None):
+    """
+    The top_n highest scoring nodes of every node type (only nodes with a
+    positive score), plus the seeds.
+    Parameters:
+        - scores: A dictionary of score arrays per node type.
+        - top_n: The number of nodes per type, an int or {ntype: int}.
+        - seeds: A dictionary of node IDs per node type that are always kept.
+    Output:
+        - A dictionary of sorted node ID arrays per node type.
+    """
+    seeds = seeds or {}
+    nodes = {}
+    for ntype, values in scores.items():
+        n = top_n.get(ntype, 0) if isinstance(top_n, dict) else top_n
+        candidates = np.flatnonzero(values > 0)
+        if len(candidates) > n:
+            candidates = candidates[np.argpartition(-values[candidates], n - 1)[:n]] if n > 0 else candidates[:0]
+        seed_ids = np.asarray(seeds.get(ntype, []), dtype=np.int64)
+        nodes[ntype] = np.union1d(candidates, seed_ids)
+    return nodes
@@ -0,0 +1,155 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from utils import repair_smpdb_name
+
+_MISSING = object()
+
+
+class DescView:
+    """
+    Read-only view of one entity type of a DescStore, with the dict-like
+    .get used by fetch_desc_info.
+    """
+
+    def __init__(self, store, ntype):
+        self._store = store
+        self._ntype = ntype
+
+    def get(self, nid, default=None):
+        return self._store.get_many(self._ntype, [nid]).get(nid, default)
+
+    def __getitem__(self, nid):
+        record = self.get(nid, _MISSING)
+        if record is _MISSING:
+            raise KeyError(nid)
+        return record
+
+    def __contains__(self, nid):
+        return self.get(nid, _MISSING) is not _MISSING
+
+
+class DescStore:
+    """
+    Entity descriptions kept in an on-disk SQLite index instead of in memory.
+    Lookups are batched (get_many) and go through a small in-process LRU hot
+    cache. The store can stand in for the desc_dict returned by load_desc:
+    store.get(ntype, {}) returns a DescView.
+    """
+
+    def __init__(self, db_path, cache_size=8192):
+        self.db_path = db_path
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # (ntype, id) -> record or None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.ntypes = [row[0] for row in self._conn().execute("SELECT ntype FROM ntypes")]
+
+    def __getstate__(self):
+        # 锁、线程连接和热缓存不随对象传递，在新进程中重新打开
+        return {"db_path": self.db_path, "cache_size": self.cache_size, "ntypes": self.ntypes}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _conn(self):
+        # 每个线程一个只读连接
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+
+    def get(self, ntype, default=None):
+        if ntype not in self.ntypes:
+            return default
+        return DescView(self, ntype)
+
+    def get_many(self, ntype, ids, batch_size=500):
+        """
+        Look up the records of many IDs of one type at once. IDs without a
+        record are left out of the returned dictionary.
+        """
+        found = {}
+        missing = []
+        with self._lock:
+            for nid in ids:
+                key = (ntype, nid)
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    if self._cache[key] is not None:
+                        found[nid] = self._cache[key]
+                else:
+                    missing.append(nid)
+        if not missing:
+            return found
+
+        missing = list(dict.fromkeys(missing))
+        fetched = {}
+        conn = self._conn()
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            rows = conn.execute(
+                f"SELECT id, record FROM desc WHERE ntype = ? AND id IN ({','.join('?' * len(batch))})",
+                [ntype] + batch)
+            for nid, record in rows:
+                fetched[nid] = json.loads(record)
+        found.update(fetched)
+
+        with self._lock:
+            for nid in missing[-self.cache_size:]:
+                self._cache[(ntype, nid)] = fetched.get(nid)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return found
+
+    def iter_records(self, ntype):
+        """Yield (id, record) for every entity of one type."""
+        rows = self._conn().execute("SELECT id, record FROM desc WHERE ntype = ?", (ntype,))
+        for nid, record in rows:
+            yield nid, json.loads(record)
+
+
+def build_desc_store(desc_path_dict, db_path):
+    """
+    Build the SQLite description store from the *_desc.json files, one file
+    at a time. SMPDB pathway names are repaired as in load_desc.
+    """
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    conn.execute("CREATE TABLE desc (ntype TEXT, id TEXT, record TEXT, PRIMARY KEY (ntype, id)) WITHOUT ROWID")
+    conn.execute("CREATE TABLE ntypes (ntype TEXT PRIMARY KEY)")
+    for ntype, path in desc_path_dict.items():
+        with open(path, 'r') as f:
+            cur_dict = json.load(f)
+        if ntype == 'pathway':
+            cur_dict = repair_smpdb_name(cur_dict)
+        conn.execute("INSERT INTO ntypes VALUES (?)", (ntype,))
+        conn.executemany("INSERT OR REPLACE INTO desc VALUES (?, ?, ?)",
+                         ((ntype, k, json.dumps(v, ensure_ascii=False)) for k, v in cur_dict.items()))
+        conn.commit()
+        del cur_dict
+    conn.close()
+    os.replace(tmp_path, db_path)
+
+
+def load_or_build_desc_store(desc_path_dict, db_path, cache_size=8192):
+    """
+    Open the description store at db_path, (re)building it first when it is
+    missing or older than any of the description files.
+    """
+    stale = not os.path.exists(db_path) or any(
+        os.path.getmtime(path) > os.path.getmtime(db_path)
+        for path in desc_path_dict.values() if os.path.exists(path))
+    if stale:
+        build_desc_store(desc_path_dict, db_path)
+    return DescStore(db_path, cache_size=cache_size)
+
@@ -0,0 +1,95 @@
+import os
+
+import dgl
+import numpy as np
+import torch
+
+from csr_graph import CSRGraph
+from name_table import load_name_tables
+from utils import load_or_process_graph, mapped_artifacts_fresh
+
+
+class MappedGraph:
+    """
+    Read-only stand-in for the full DGL heterograph, backed by the
+    memory-mapped arrays of a CSRGraph. The arrays live in the page cache, so
+    every process that opens the same files shares one copy of the graph.
+
+    It offers what the query path needs from the full graph (node types,
+    etypes, node counts, degrees) and node_subgraph, which builds the induced
+    DGL subgraph from the CSR arrays. subgraph_by_node accepts it in place of
+    the DGL graph when the CSRGraph is passed as well.
+    """
+
+    def __init__(self, csr_graph):
+        self.csr_graph = csr_graph
+        self.ntypes = list(csr_graph.ntypes)
+        self.canonical_etypes = list(csr_graph.canonical_etypes)
+        self.etypes = [etype[1] for etype in self.canonical_etypes]
+
+    def num_nodes(self, ntype=None):
+        if ntype is None:
+            return sum(self.csr_graph.num_nodes.values())
+        return self.csr_graph.num_nodes[ntype]
+
+    number_of_nodes = num_nodes
+
+    def num_edges(self, etype=None):
+        if etype is None:
+            return sum(len(self.csr_graph.adj[et]["out"][1]) for et in self.canonical_etypes)
+        return len(self.csr_graph.adj[self.to_canonical_etype(etype)]["out"][1])
+
+    def to_canonical_etype(self, etype):
+        if isinstance(etype, tuple):
+            return etype
+        return next(et for et in self.canonical_etypes if et[1] == etype)
+
+    def out_degrees(self, ids, etype=None):
+        return torch.as_tensor(self.csr_graph.degrees(self.to_canonical_etype(etype), "out", np.atleast_1d(ids)))
+
+    def in_degrees(self, ids, etype=None):
+        return torch.as_tensor(self.csr_graph.degrees(self.to_canonical_etype(etype), "in", np.atleast_1d(ids)))
+
+    def node_subgraph(self, nodes, relabel_nodes=True, store_ids=True, etypes=None):
+        """
+        Counterpart of dgl.node_subgraph(graph, nodes, ...): the subgraph
+        induced by `nodes` ({ntype: node ID tensor or array}). With store_ids
+        the original IDs are kept in ndata[dgl.NID] and edata[dgl.EID]. With
+        etypes, only edges of those canonical etypes are materialised.
+        """
+        nodes = {ntype: np.unique(np.asarray(nodes.get(ntype, []), dtype=np.int64)) for ntype in self.ntypes}
+        edges = self.csr_graph.induced_edges(nodes, etypes)
+        if relabel_nodes:
+            num_nodes = {ntype: len(ids) for ntype, ids in nodes.items()}
+            data = {etype: (torch.from_numpy(src), torch.from_numpy(dst)) for etype, (src, dst, _) in edges.items()}
+        else:
+            num_nodes = dict(self.csr_graph.num_nodes)
+            data = {etype: (torch.from_numpy(nodes[etype[0]][src]), torch.from_numpy(nodes[etype[2]][dst]))
+                    for etype, (src, dst, _) in edges.items()}
+        sub_g = dgl.heterograph(data, num_nodes_dict=num_nodes)
+        if store_ids:
+            if relabel_nodes:
+                for ntype, ids in nodes.items():
+                    sub_g.nodes[ntype].data[dgl.NID] = torch.from_numpy(ids)
+            for etype, (_, _, eid) in edges.items():
+                sub_g.edges[etype].data[dgl.EID] = torch.from_numpy(eid)
+        return sub_g
+
+
+def open_graph_store(link_root="database/unibiomap", data_root="database/processed", simplify_edge=True):
+    """
+    Attach to the memory-mapped graph storage in data_root: the CSR arrays
+    and the node name tables. If they are missing or stale, they are built
+    once through load_or_process_graph, and the DGL graph it loads is
+    released again.
+    Output:
+        - graph: A MappedGraph, usable as the `graph` of subgraph_by_node.
+        - csr_graph, node_map, id_map, id_names: As in load_or_process_graph,
+          all memory-mapped.
+    """
+    if not mapped_artifacts_fresh(link_root, data_root, simplify_edge):
+        load_or_process_graph(link_root, data_root, simplify_edge=simplify_edge)
+    csr_graph = CSRGraph.load(os.path.join(data_root, "unibiomap_simp_csr"), mmap=True)
+    node_map = load_name_tables(os.path.join(data_root, "node_names"))
+    id_map = {ntype: table.ids for ntype, table in node_map.items()}
+    return MappedGraph(csr_graph), csr_graph, node_map, id_map, id_map
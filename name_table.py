@@ -0,0 +1,132 @@
+import json
+import mmap
+import os
+from collections.abc import Mapping
+
+import numpy as np
+
+
+class NodeIdView(Mapping):
+    """
+    ID -> name view of a NameTable. Indexing with an integer array returns
+    an array of names, like the arrays built by utils.build_id_names.
+    """
+
+    def __init__(self, table):
+        self._table = table
+
+    def __getitem__(self, ids):
+        if isinstance(ids, (int, np.integer)):
+            if not 0 <= ids < len(self._table):
+                raise KeyError(ids)
+            return self._table.name(int(ids))
+        return self._table.take(ids)
+
+    def __iter__(self):
+        return iter(range(len(self._table)))
+
+    def __len__(self):
+        return len(self._table)
+
+
+class NameTable(Mapping):
+    """
+    Name -> ID mapping of one node type, backed by memory-mapped files:
+        - {prefix}.strings: the UTF-8 names of all nodes, concatenated in ID order.
+        - {prefix}.offsets.npy: int64 offsets of every name in the string table.
+        - {prefix}.order.npy: node IDs sorted by name, for binary search.
+    Nothing is parsed at load, so worker processes share the same pages.
+    """
+
+    def __init__(self, prefix):
+        with open(prefix + ".strings", "rb") as f:
+            # mmap 不支持空文件
+            self._strings = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+        self._offsets = np.load(prefix + ".offsets.npy", mmap_mode='r')
+        self._order = np.load(prefix + ".order.npy", mmap_mode='r')
+        self.ids = NodeIdView(self)
+
+    def _raw(self, node_id):
+        return self._strings[self._offsets[node_id]:self._offsets[node_id + 1]]
+
+    def name(self, node_id):
+        return self._raw(node_id).decode('utf-8')
+
+    def take(self, ids):
+        """Return the names of an array of node IDs as an object array."""
+        ids = np.asarray(ids, dtype=np.int64)
+        starts = self._offsets[ids].tolist()
+        ends = self._offsets[ids + 1].tolist()
+        names = np.empty(len(starts), dtype=object)
+        names[:] = [self._strings[a:b].decode('utf-8') for a, b in zip(starts, ends)]
+        return names
+
+    def get_id(self, name, default=None):
+        key = name.encode('utf-8')
+        lo, hi = 0, len(self._order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._raw(self._order[mid]) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self._order) and self._raw(self._order[lo]) == key:
+            return int(self._order[lo])
+        return default
+
+    def __getitem__(self, name):
+        node_id = self.get_id(name)
+        if node_id is None:
+            raise KeyError(name)
+        return node_id
+
+    def __contains__(self, name):
+        return isinstance(name, str) and self.get_id(name) is not None
+
+    def __iter__(self):
+        for node_id in range(len(self)):
+            yield self.name(node_id)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+
+def encode_names(names):
+    """
+    Encode names listed in ID order (str or UTF-8 bytes) as the string table
+    and int64 offsets of the NameTable format.
+    """
+    names = [name.encode('utf-8') if isinstance(name, str) else name for name in names]
+    offsets = np.zeros(len(names) + 1, dtype=np.int64)
+    np.cumsum([len(name) for name in names], out=offsets[1:])
+    return b"".join(names), offsets
+
+
+def write_name_tables(node_map, save_dir):
+    """
+    Write the node name to ID mapping as one binary NameTable per node type.
+    """
+    os.makedirs(save_dir, exist_ok=True)
+    for ntype, mapping in node_map.items():
+        names = [None] * len(mapping)
+        for name, node_id in mapping.items():
+            names[node_id] = name.encode('utf-8')
+        prefix = os.path.join(save_dir, ntype)
+        strings, offsets = encode_names(names)
+        with open(prefix + ".strings", "wb") as f:
+            f.write(strings)
+        np.save(prefix + ".offsets.npy", offsets)
+        order = np.array(sorted(range(len(names)), key=names.__getitem__), dtype=np.int64)
+        np.save(prefix + ".order.npy", order)
+    with open(os.path.join(save_dir, "meta.json"), "w") as f:
+        json.dump({"ntypes": list(node_map)}, f)
+
+
+def load_name_tables(save_dir):
+    """
+    Memory-map the NameTables in save_dir. Returns a dictionary of NameTable
+    objects, usable wherever a node_map dictionary is expected.
+    """
+    with open(os.path.join(save_dir, "meta.json"), "r") as f:
+        meta = json.load(f)
+    return {ntype: NameTable(os.path.join(save_dir, ntype)) for ntype in meta["ntypes"]}
@@ -0,0 +1,257 @@
+import difflib
+import json
+import os
+import sqlite3
+import threading
+
+# 参与检索的名称字段，与 load_desc 中 idname_dict 使用的字段一致，并补充常用名称
+SEARCH_FIELDS = {
+    "protein": ["entry_name", "protein_name"],
+    "compound": ["name", "inchikey"],
+}
+DEFAULT_SEARCH_FIELDS = ["name"]
+
+
+def entity_name(ntype, record):
+    """Searchable name of an entity: its name fields joined by ' | '."""
+    if not record:
+        return ""
+    fields = SEARCH_FIELDS.get(ntype, DEFAULT_SEARCH_FIELDS)
+    return " | ".join(str(record[field]) for field in fields if record.get(field))
+
+
+def _prefix_upper(prefix):
+    # 前缀范围查询的上界：key >= prefix AND key < prefix + U+10FFFF
+    return prefix + "\U0010ffff"
+
+
+def _fts_phrase(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    """
+    Search over the IDs and names of all graph entities, kept in an on-disk
+    SQLite index: B-tree indexes on the lower-cased ID and name answer prefix
+    lookups, an FTS5 trigram index answers substring lookups, and trigram
+    overlap re-ranked by edit similarity gives typo-tolerant matches.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        conn = self._conn()
+        # 每种类型的实体占一段连续的 rowid（见 build_search_index），全文查询按 rowid 范围限定类型
+        row = conn.execute("SELECT value FROM meta WHERE key = 'rowid_ranges'").fetchone()
+        if row is not None:
+            self.rowid_ranges = {ntype: tuple(bounds) for ntype, bounds in json.loads(row[0]).items()}
+        else:
+            self.rowid_ranges = {ntype: (lo, hi) for ntype, lo, hi in conn.execute(
+                "SELECT ntype, MIN(rowid), MAX(rowid) FROM entities GROUP BY ntype")}
+        self.ntypes = list(self.rowid_ranges)
+
+    def _conn(self):
+        # 每个线程一个只读连接
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            # trigram 的文档频率，容错匹配时用于挑选区分度高的 trigram
+            conn.execute("CREATE VIRTUAL TABLE temp.gram_vocab USING fts5vocab(main, grams, row)")
+            self._local.conn = conn
+        return conn
+
+    def _rare_trigrams(self, key, max_docs):
+        """
+        The trigrams of key, rarest first, as long as they match at most
+        max_docs entities together (but at least two of them).
+        """
+        grams = sorted(_trigrams(key))
+        counts = dict(self._rows(f"SELECT term, doc FROM temp.gram_vocab WHERE term IN "
+                                 f"({','.join('?' * len(grams))})", grams))
+        selected, total = [], 0
+        for gram in sorted(grams, key=lambda gram: counts.get(gram, 0)):
+            total += counts.get(gram, 0)
+            if total > max_docs and len(selected) >= 2:
+                break
+            selected.append(gram)
+        return selected
+
+    def _rows(self, sql, params):
+        return self._conn().execute(sql, params).fetchall()
+
+    def search(self, query, ntype=None, limit=10, fuzzy=True, min_similarity=0.6, max_fuzzy_docs=20000):
+        """
+        Find entities whose ID or name matches `query`.
+        Parameters:
+            - query: Search text (case-insensitive).
+            - ntype: Restrict the search to one node type.
+            - limit: Maximum number of results.
+            - fuzzy: Fall back to typo-tolerant matching when the exact
+              (prefix / substring) lookups find fewer than `limit` results.
+            - min_similarity: Minimum edit similarity of fuzzy matches.
+            - max_fuzzy_docs: Fuzzy candidates come from the rarest trigrams
+              of the query matching about this many entities in total.
+        Output:
+            - A list of dictionaries {"ntype", "id", "name", "match"}, best
+              first; match is one of "id", "id_prefix", "name_prefix",
+              "substring" and "fuzzy".
+        """
+        key = query.strip().lower()
+        if not key:
+            return []
+        type_sql, type_params = ("AND ntype = ?", [ntype]) if ntype else ("", [])
+        # 全文查询中的类型限定用 rowid 范围，而不是 ntype 列：trigram 分词无法匹配 "go" 这类短类型名
+        range_sql, range_params = "", []
+        if ntype:
+            if ntype not in self.rowid_ranges:
+                return []
+            range_sql, range_params = "AND rowid BETWEEN ? AND ?", list(self.rowid_ranges[ntype])
+        results = {}
+
+        def add(rows, match):
+            for rowid, row_ntype, nid, name in rows:
+                if rowid not in results and len(results) < limit:
+                    results[rowid] = {"ntype": row_ntype, "id": nid, "name": name, "match": match}
+
+        columns = "rowid, ntype, id, name"
+        add(self._rows(f"SELECT {columns} FROM entities WHERE id_key = ? {type_sql} LIMIT ?",
+                       [key] + type_params + [limit]), "id")
+        for field, match in (("id_key", "id_prefix"), ("name_key", "name_prefix")):
+            if len(results) >= limit:
+                break
+            add(self._rows(f"SELECT {columns} FROM entities WHERE {field} >= ? AND {field} < ? {type_sql} LIMIT ?",
+                           [key, _prefix_upper(key)] + type_params + [limit]), match)
+        if len(key) < 3 or len(results) >= limit:
+            return list(results.values())
+
+        # 子串匹配：trigram 全文索引中的短语查询
+        rows = self._rows(f"SELECT {columns} FROM entities WHERE rowid IN "
+                          f"(SELECT rowid FROM grams WHERE grams MATCH ? {range_sql} LIMIT ?) {type_sql}",
+                          [f"text : {_fts_phrase(key)}"] + range_params + [limit * 50] + type_params)
+        add(sorted(rows, key=lambda row: (len(row[2]) + len(row[3]), row[2])), "substring")
+        if not fuzzy or len(results) >= limit:
+            return list(results.values())
+
+        # 容错匹配：按共享的低频 trigram 取候选，再以编辑相似度重排
+        grams = " OR ".join(_fts_phrase(gram) for gram in self._rare_trigrams(key, max_fuzzy_docs))
+        rows = self._rows(f"SELECT {columns} FROM entities WHERE rowid IN "
+                          f"(SELECT rowid FROM grams WHERE grams MATCH ? {range_sql} ORDER BY rank LIMIT ?) "
+                          f"{type_sql}",
+                          [f"text : ({grams})"] + range_params + [limit * 100] + type_params)
+        matcher = difflib.SequenceMatcher(None, "", key)
+        scored = []
+        for row in rows:
+            if row[0] in results:
+                continue
+            texts = [row[2].lower()] + [part.strip().lower() for part in row[3].split("|") if part.strip()]
+            score = 0.0
+            for text in texts:
+                matcher.set_seq1(text)
+                # quick_ratio 是 ratio 的上界，先用它排除大部分候选
+                if matcher.real_quick_ratio() > score and matcher.quick_ratio() > score:
+                    score = max(score, matcher.ratio())
+            if score >= min_similarity:
+                scored.append((-score, row[2], row))
+        add([row for _, _, row in sorted(scored)], "fuzzy")
+        return list(results.values())
+
+    def suggest(self, query, ntype=None, limit=10):
+        """Suggestions for an ID textbox: a list of (label, ID) pairs."""
+        return [(f"{hit['id']} | {hit['name']}" if hit["name"] else hit["id"], hit["id"])
+                for hit in self.search(query, ntype=ntype, limit=limit)]
+
+    def validate(self, sample_dict, node_map, limit=3):
+        """
+        Check the seed IDs of a query before running it.
+        Output:
+            - A dictionary {ntype: {unknown ID: [suggested IDs]}}, empty when
+              every ID exists in node_map.
+        """
+        unknown = {}
+        for ntype, names in sample_dict.items():
+            for name in names:
+                if name not in node_map[ntype]:
+                    unknown.setdefault(ntype, {})[name] = [
+                        hit["id"] for hit in self.search(name, ntype=ntype, limit=limit)]
+        return unknown
+
+
+def build_search_index(node_map, desc_store, db_path, batch_size=50000, version=None):
+    """
+    Build the search index of every node in node_map, named through the
+    description store (desc_store.DescStore). Graph nodes without a
+    description are indexed by ID only. `version` is recorded in the index
+    for load_or_build_search_index.
+    """
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    conn.execute("CREATE TABLE entities (rowid INTEGER PRIMARY KEY, ntype TEXT, id TEXT, name TEXT, "
+                 "id_key TEXT, name_key TEXT)")
+    conn.execute("CREATE VIRTUAL TABLE grams USING fts5(ntype, text, tokenize='trigram', content='')")
+    conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+    rowid = 0
+    rowid_ranges = {}
+    for ntype, mapping in node_map.items():
+        if len(mapping):
+            rowid_ranges[ntype] = (rowid, rowid + len(mapping) - 1)
+        names = {}
+        if ntype in desc_store.ntypes:
+            for nid, record in desc_store.iter_records(ntype):
+                names[nid] = entity_name(ntype, record)
+        batch = []
+        for nid in mapping:
+            name = names.get(nid, "")
+            batch.append((rowid, ntype, nid, name, nid.lower(), name.lower()))
+            rowid += 1
+            if len(batch) >= batch_size:
+                _insert_entities(conn, batch)
+                batch = []
+        _insert_entities(conn, batch)
+        conn.commit()
+        del names
+    conn.execute("CREATE INDEX entities_id ON entities (id_key)")
+    conn.execute("CREATE INDEX entities_name ON entities (name_key)")
+    conn.execute("INSERT INTO grams (grams) VALUES ('optimize')")
+    conn.execute("INSERT INTO meta VALUES ('num_nodes', ?)",
+                 (json.dumps({ntype: len(mapping) for ntype, mapping in node_map.items()}, sort_keys=True),))
+    conn.execute("INSERT INTO meta VALUES ('rowid_ranges', ?)", (json.dumps(rowid_ranges),))
+    conn.execute("INSERT INTO meta VALUES ('version', ?)", (json.dumps(version),))
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, db_path)
+
+
+def _insert_entities(conn, batch):
+    conn.executemany("INSERT INTO entities VALUES (?, ?, ?, ?, ?, ?)", batch)
+    conn.executemany("INSERT INTO grams (rowid, ntype, text) VALUES (?, ?, ?)",
+                     ((row[0], row[1], f"{row[2]} {row[3]}") for row in batch))
+
+
+def load_or_build_search_index(node_map, desc_store, db_path, version=None):
+    """
+    Open the search index at db_path, (re)building it first when it is
+    missing, older than the description store, or built for another graph:
+    `version` is the source hash of the processed node map (see
+    utils.processed_version), compared with the one recorded in the index
+    together with the per-type node counts.
+    """
+    stale = not os.path.exists(db_path) or os.path.getmtime(desc_store.db_path) > os.path.getmtime(db_path)
+    if not stale:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            meta = dict(conn.execute("SELECT key, value FROM meta WHERE key IN ('num_nodes', 'version')"))
+        except sqlite3.DatabaseError:
+            meta = {}
+        finally:
+            conn.close()
+        counts = json.dumps({ntype: len(mapping) for ntype, mapping in node_map.items()}, sort_keys=True)
+        stale = meta.get("num_nodes") != counts or meta.get("version") != json.dumps(version)
+    if stale:
+        build_search_index(node_map, desc_store, db_path, version=version)
+    return SearchIndex(db_path)
@@ -0,0 +1,145 @@
+// 将列式数据 (format: "columnar") 还原为 ECharts 的 nodes / links / categories
+function expandGraphPayload(payload) {
+    var strings = payload.strings;
+    var cols = payload.nodes;
+    var str = function (idx) { return idx < 0 ? null : strings[idx]; };
+    var nodes = new Array(cols.group.length);
+    for (var i = 0; i < nodes.length; i++) {
+        var group = strings[cols.group[i]];
+        var highlight = cols.highlight[i] === 1;
+        nodes[i] = {
+            value: str(cols.value[i]),
+            category: group,
+            url: str(cols.url[i]),
+            tooltip_name: str(cols.tooltip_name[i]),
+            tooltip_desc: str(cols.tooltip_desc[i]),
+            type: 'node',
+            name: group + '_' + cols.nid[i],
+            label: {
+                show: true,
+                position: 'right',
+                fontWeight: highlight ? 'bold' : 'normal',  // 高亮节点加粗
+                fontSize: highlight ? 14 : 12
+            },
+            symbolSize: cols.symbolSize[i]
+        };
+        if (cols.x) {
+            nodes[i].x = cols.x[i];
+            nodes[i].y = cols.y[i];
+        }
+    }
+    var sources = payload.links.source;
+    var targets = payload.links.target;
+    var links = new Array(sources.length);
+    for (var k = 0; k < links.length; k++) {
+        var u = sources[k], v = targets[k];
+        links[k] = {
+            type: 'edge',
+            source: nodes[u].name,
+            target: nodes[v].name,
+            source_show: strings[cols.show[u]],
+            target_show: strings[cols.show[v]],
+            source_group: nodes[u].category,
+            target_group: nodes[v].category
+        };
+    }
+    return { nodes: nodes, links: links, categories: payload.categories, layout: payload.layout };
+}
+
+// 根据 ECharts 数据 (nodes / links / categories) 绘制 UniBioMap 子图，
+// 也接受 expandGraphPayload 的列式数据。data.layout 为 'none' 时使用服务端计算的 x / y 坐标
+function renderUniBioMapGraph(chartDom, data) {
+    if (data.format === 'columnar') {
+        data = expandGraphPayload(data);
+    }
+    var myChart = echarts.init(chartDom);
+    var layout = data.layout || 'force';
+    var option = {
+        tooltip: {
+            formatter: function (params) {
+                if (params.data.type == "edge") {
+                    // 这是边
+                    var source_show = params.data?.source_show;
+                    var target_show = params.data?.target_show;
+                    var source_group = params.data?.source_group;
+                    var target_group = params.data?.target_group;
+                    return `<div style="max-width:400px;">
+                                <div style="font-weight:bold;">
+                                    <span style="color:#999; font-size:12px;">
+                                        ${source_group + ' -- ' + target_group}
+                                    </span>
+                                    <br>
+                                    ${source_show + ' -- ' + target_show}
+                                </div>
+                            </div>`;
+                }
+
+                var color = params.color || '#000';
+                var name = params.data.tooltip_name || params.data.name;
+                var desc = params.data.tooltip_desc || params.data.value;
+                return `<div>
+                            <div style="display:flex;align-items:center;">
+                                <span style="display:inline-block;width:10px;height:10px;
+                                            border-radius:5px;background:${color};margin-right:6px;"></span>
+                                <span style="font-weight:bold;
+                                    max-width: 350px;
+                                    white-space: nowrap;
+                                    overflow: hidden;
+                                    text-overflow: ellipsis;
+                                    display: inline-block;">
+                                    ${name}
+                                </span>
+                            </div>
+                            <div style="margin-left:16px; max-width:350px;
+                                white-space:normal; word-wrap:break-word;
+                                overflow:hidden; text-overflow:ellipsis;
+                                display:-webkit-box; -webkit-line-clamp:10; -webkit-box-orient:vertical;">
+                                ${desc}
+                            </div>
+                        </div>`;
+            }
+        },
+        legend: [{
+            data: data.categories.map(function (cat) { return cat.name; }),
+        }],
+        series: [{
+            type: 'graph',
+            layout: layout,
+            roam: true,
+            label: {
+                show: true,
+                position: 'right',
+                formatter: function (params) {
+                    return params.data.value || params.data.name; // 自定义显示字段
+                }
+            },
+            edgeSymbol: ['none', 'none'],
+            data: data.nodes,
+            links: data.links,
+            categories: data.categories,
+            force: {
+                repulsion: 800,
+                edgeLength: 120
+            },
+            emphasis: {
+                focus: 'adjacency',
+                label: { show: true }
+            }
+        }]
+    };
+    myChart.setOption(option);
+
+    myChart.on('click', function (params) {
+        if (params.data && params.data.url) {
+            window.open(params.data.url, '_blank');
+        }
+    });
+    // 响应式图表大小
+    window.addEventListener('resize', function () {
+        myChart.resize();
+        if (layout === 'force') {
+            myChart.setOption(option);  // 强制触发重新布局
+        }
+    });
+    return myChart;
+}
@@ -0,0 +1,64 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from csr_graph import CSRGraph  # noqa: E402
+
+
+def _csr(heads, tails, num_nodes):
+    order = np.argsort(heads, kind='stable')
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.add.at(indptr, heads + 1, 1)
+    return (np.cumsum(indptr), tails[order]), order
+
+
+def make_csr_graph(num_nodes, edges):
+    """A CSRGraph from {canonical etype: (heads, tails)} edge lists; edge IDs are list positions."""
+    adj, eids = {}, {}
+    for (src, rel, dst), (heads, tails) in edges.items():
+        heads = np.asarray(heads, dtype=np.int64)
+        tails = np.asarray(tails, dtype=np.int64)
+        out, eids[(src, rel, dst)] = _csr(heads, tails, num_nodes[src])
+        adj[(src, rel, dst)] = {"out": out, "in": _csr(tails, heads, num_nodes[dst])[0]}
+    return CSRGraph(num_nodes, list(edges), adj, eids)
+
+
+@pytest.fixture
+def random_graph():
+    """A small random two-type graph: (csr_graph, num_nodes, edges)."""
+    rng = np.random.default_rng(0)
+    num_nodes = {"a": 50, "b": 40}
+    edges = {}
+    for src, rel, dst in [("a", "a-b", "b"), ("a", "a-a", "a"), ("b", "b-b", "b")]:
+        edges[(src, rel, dst)] = (rng.integers(0, num_nodes[src], 120), rng.integers(0, num_nodes[dst], 120))
+    return make_csr_graph(num_nodes, edges), num_nodes, edges
+
+
+def naive_distances(num_nodes, edges, seeds, etypes=None):
+    """Undirected BFS distances from the seeds, -1 when unreachable."""
+    neighbours = {(ntype, i): set() for ntype, n in num_nodes.items() for i in range(n)}
+    for etype, (heads, tails) in edges.items():
+        if etypes is not None and etype not in etypes:
+            continue
+        for head, tail in zip(heads, tails):
+            neighbours[(etype[0], int(head))].add((etype[2], int(tail)))
+            neighbours[(etype[2], int(tail))].add((etype[0], int(head)))
+    dist = {ntype: np.full(n, -1) for ntype, n in num_nodes.items()}
+    frontier = [(ntype, int(i)) for ntype, ids in seeds.items() for i in ids]
+    for ntype, i in frontier:
+        dist[ntype][i] = 0
+    level = 0
+    while frontier:
+        level += 1
+        found = []
+        for node in frontier:
+            for ntype, i in neighbours[node]:
+                if dist[ntype][i] < 0:
+                    dist[ntype][i] = level
+                    found.append((ntype, i))
+        frontier = found
+    return dist
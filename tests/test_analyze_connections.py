@@ -0,0 +1,47 @@
+import pytest
+
+dgl = pytest.importorskip("dgl")
+torch = pytest.importorskip("torch")
+
+from csr_graph import CSRGraph  # noqa: E402
+from utils import analyze_connections  # noqa: E402
+
+
+def per_node_connections(graph, sample_dict, id_map):
+    # 批量计算之前的逐节点实现
+    connection_stats = {}
+    for node_type, node_ids in sample_dict.items():
+        for node_id in node_ids:
+            node_stats = {"connected_nodes": {}, "connected_edges": {}}
+            for etype in graph.canonical_etypes:
+                if etype[0] == node_type:
+                    neighbors = graph.successors(node_id, etype=etype).tolist()
+                    node_stats["connected_nodes"].setdefault(etype[2], 0)
+                    node_stats["connected_nodes"][etype[2]] += len(neighbors)
+                    node_stats["connected_edges"].setdefault(etype, 0)
+                    node_stats["connected_edges"][etype] += len(neighbors)
+                if etype[2] == node_type:
+                    neighbors = graph.predecessors(node_id, etype=etype).tolist()
+                    node_stats["connected_nodes"].setdefault(etype[0], 0)
+                    node_stats["connected_nodes"][etype[0]] += len(neighbors)
+                    node_stats["connected_edges"].setdefault(etype, 0)
+                    node_stats["connected_edges"][etype] += len(neighbors)
+            connection_stats[(node_type, id_map[node_type][node_id])] = node_stats
+    return connection_stats
+
+
+def test_matches_per_node_counts():
+    graph = dgl.heterograph({
+        # 自环与重复边
+        ("protein", "ppi", "protein"): (torch.tensor([0, 0, 1, 2, 2]), torch.tensor([0, 1, 2, 1, 1])),
+        ("protein", "protein-go", "go"): (torch.tensor([0, 1, 1, 3]), torch.tensor([0, 0, 1, 2])),
+        ("go", "go-go", "go"): (torch.tensor([0, 1]), torch.tensor([1, 2])),
+        ("disease", "disease-protein", "protein"): (torch.tensor([0, 0]), torch.tensor([1, 3])),
+    }, num_nodes_dict={"protein": 5, "go": 3, "disease": 2})
+    id_map = {"protein": {i: f"P{i}" for i in range(5)}, "go": {i: f"GO:{i}" for i in range(3)},
+              "disease": {i: f"D{i}" for i in range(2)}}
+    # P4 与 D1 没有任何边
+    sample_dict = {"protein": [0, 1, 4], "go": [1], "disease": [1], "phenotype": []}
+    expected = per_node_connections(graph, sample_dict, id_map)
+    assert analyze_connections(graph, sample_dict, id_map) == expected
+    assert analyze_connections(graph, sample_dict, id_map, csr_graph=CSRGraph.from_dgl(graph)) == expected
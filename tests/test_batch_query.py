@@ -0,0 +1,24 @@
+import os
+
+import pytest
+
+pytest.importorskip("dgl")
+pytest.importorskip("torch")
+
+from batch_query import _safe_query_id, read_seed_sets  # noqa: E402
+
+
+@pytest.mark.parametrize("query_id", [".", "..", "", "../x", "a/../../b", "..\\b", "summary.json"])
+def test_ids_stay_inside_out_dir(tmp_path, query_id):
+    used = {"summary.json"}
+    safe = _safe_query_id(query_id, used)
+    out_dir = str(tmp_path)
+    query_dir = os.path.normpath(os.path.join(out_dir, safe))
+    assert os.path.dirname(query_dir) == out_dir
+    assert safe != "summary.json"
+
+
+def test_duplicate_ids(tmp_path):
+    path = tmp_path / "seeds.jsonl"
+    path.write_text('{"id": "q", "protein": "P1"}\n{"id": "q", "protein": "P2"}\n{"id": "..", "protein": "P3"}\n')
+    assert [query_id for query_id, _, _ in read_seed_sets(str(path))] == ["q", "q_2", "query"]
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from conftest import make_csr_graph, naive_distances
+from csr_graph import connecting_paths
+
+
+def random_case(seed):
+    rng = np.random.default_rng(seed)
+    num_nodes = {"a": int(rng.integers(20, 60)), "b": int(rng.integers(20, 60))}
+    edges = {}
+    for src, rel, dst in [("a", "a-b", "b"), ("a", "a-a", "a"), ("b", "b-b", "b")]:
+        m = int(rng.integers(20, 70))
+        edges[(src, rel, dst)] = (rng.integers(0, num_nodes[src], m), rng.integers(0, num_nodes[dst], m))
+    sources = {"a": rng.choice(num_nodes["a"], int(rng.integers(1, 3)), replace=False).tolist()}
+    targets = {"b": rng.choice(num_nodes["b"], int(rng.integers(1, 3)), replace=False).tolist()}
+    return num_nodes, edges, sources, targets, int(rng.integers(1, 7)), int(rng.integers(0, 3)), rng
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_matches_brute_force(seed):
+    num_nodes, edges, sources, targets, max_length, slack, rng = random_case(seed)
+    csr_graph = make_csr_graph(num_nodes, edges)
+    nodes, path_edges, length = connecting_paths(csr_graph, sources, targets, max_length=max_length, slack=slack,
+                                                 chunk_edges=int(rng.integers(3, 50)))
+    dist_a = naive_distances(num_nodes, edges, sources)
+    dist_b = naive_distances(num_nodes, edges, targets)
+    totals = [dist_a[ntype][i] + dist_b[ntype][i] for ntype in num_nodes for i in range(num_nodes[ntype])
+              if dist_a[ntype][i] >= 0 and dist_b[ntype][i] >= 0]
+    expected_length = min(totals) if totals and min(totals) <= max_length else None
+    assert length == expected_length
+
+    for ntype in num_nodes:
+        is_seed = (dist_a[ntype] == 0) | (dist_b[ntype] == 0)
+        if length is None:
+            expected = np.flatnonzero(is_seed)
+        else:
+            on_path = (dist_a[ntype] >= 0) & (dist_b[ntype] >= 0) & (dist_a[ntype] + dist_b[ntype] <= length + slack)
+            expected = np.flatnonzero(on_path | is_seed)
+        np.testing.assert_array_equal(nodes[ntype], expected)
+
+    if length is None:
+        assert not any(len(ids) for ids in path_edges.values())
+        return
+    for etype, (heads, tails) in edges.items():
+        src, _, dst = etype
+        expected = []
+        for eid, (u, v) in enumerate(zip(heads, tails)):
+            for near, far in ((dist_a, dist_b), (dist_b, dist_a)):
+                if near[src][u] >= 0 and far[dst][v] >= 0 and near[src][u] + 1 + far[dst][v] <= length + slack:
+                    expected.append(eid)
+                    break
+        np.testing.assert_array_equal(path_edges.get(etype, np.empty(0, dtype=np.int64)), expected)
+
+
+def test_max_nodes_keeps_shortest_paths_first():
+    num_nodes = {"a": 6, "b": 1}
+    # 0 -> 1 -> 5 为最短路径，0 -> 2 -> 3 -> 5 长一跳
+    edges = {("a", "a-a", "a"): ([0, 1, 0, 2, 3], [1, 5, 2, 3, 5]), ("a", "a-b", "b"): ([4], [0])}
+    csr_graph = make_csr_graph(num_nodes, edges)
+    nodes, _, length = connecting_paths(csr_graph, {"a": [0]}, {"a": [5]}, slack=1)
+    assert length == 2
+    np.testing.assert_array_equal(nodes["a"], [0, 1, 2, 3, 5])
+    nodes, _, _ = connecting_paths(csr_graph, {"a": [0]}, {"a": [5]}, slack=1, max_nodes=3)
+    np.testing.assert_array_equal(nodes["a"], [0, 1, 5])
@@ -0,0 +1,75 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("dgl")
+
+from desc_store import DescStore, build_desc_store, load_or_build_desc_store  # noqa: E402
+
+RECORDS = {
+    "go": {"GO:1": {"name": "process one"}, "GO:2": {"name": "process two"}, "GO:3": {"name": "process three"}},
+    # 名称相同、ID 不同的 SMPDB 通路，构建时在名称后加上 ID
+    "pathway": {"SMP001": {"name": "Glycolysis"}, "SMP002": {"name": "Glycolysis"}, "R-1": {"name": "Other"}},
+}
+
+
+@pytest.fixture
+def desc_paths(tmp_path):
+    paths = {}
+    for ntype, records in RECORDS.items():
+        paths[ntype] = str(tmp_path / f"{ntype}_desc.json")
+        with open(paths[ntype], "w") as f:
+            json.dump(records, f)
+    return paths
+
+
+def test_build(desc_paths, tmp_path):
+    db_path = str(tmp_path / "desc.sqlite")
+    build_desc_store(desc_paths, db_path)
+    store = DescStore(db_path)
+    assert sorted(store.ntypes) == ["go", "pathway"]
+    assert dict(store.iter_records("go")) == RECORDS["go"]
+    pathways = dict(store.iter_records("pathway"))
+    assert pathways["SMP001"]["name"] == "Glycolysis (SMP001)"
+    assert pathways["SMP002"]["name"] == "Glycolysis (SMP002)"
+    assert pathways["R-1"] == {"name": "Other"}
+    assert not os.path.exists(db_path + ".tmp")
+
+
+def test_get_many(desc_paths, tmp_path):
+    store = load_or_build_desc_store(desc_paths, str(tmp_path / "desc.sqlite"))
+    assert store.get_many("go", ["GO:1", "GO:9", "GO:3", "GO:1"]) == {"GO:1": RECORDS["go"]["GO:1"],
+                                                                       "GO:3": RECORDS["go"]["GO:3"]}
+    # 第二次查询（含缓存的缺失项）结果不变
+    assert store.get_many("go", ["GO:9", "GO:3"], batch_size=1) == {"GO:3": RECORDS["go"]["GO:3"]}
+    assert store.get_many("pathway", ["GO:1"]) == {}
+
+    view = store.get("go", {})
+    assert view["GO:2"] == RECORDS["go"]["GO:2"]
+    assert view.get("GO:9") is None and "GO:9" not in view
+    with pytest.raises(KeyError):
+        view["GO:9"]
+    assert store.get("protein", {}) == {}
+
+
+def test_hot_cache_is_bounded(desc_paths, tmp_path):
+    store = load_or_build_desc_store(desc_paths, str(tmp_path / "desc.sqlite"), cache_size=2)
+    store.get_many("go", ["GO:1", "GO:2", "GO:3"])
+    assert list(store._cache) == [("go", "GO:2"), ("go", "GO:3")]
+    # 命中的条目移到末尾，最久未用的先淘汰
+    store.get_many("go", ["GO:2"])
+    store.get_many("go", ["GO:9"])
+    assert list(store._cache) == [("go", "GO:2"), ("go", "GO:9")]
+    assert store._cache[("go", "GO:9")] is None
+
+
+def test_rebuilt_when_source_changes(desc_paths, tmp_path):
+    db_path = str(tmp_path / "desc.sqlite")
+    load_or_build_desc_store(desc_paths, db_path)
+    with open(desc_paths["go"], "w") as f:
+        json.dump({"GO:4": {"name": "process four"}}, f)
+    mtime = os.path.getmtime(db_path)
+    os.utime(desc_paths["go"], (mtime + 10, mtime + 10))
+    store = load_or_build_desc_store(desc_paths, db_path)
+    assert dict(store.iter_records("go")) == {"GO:4": {"name": "process four"}}
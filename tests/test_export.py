@@ -0,0 +1,73 @@
+import json
+import os
+import zipfile
+
+import numpy as np
+import pytest
+
+dgl = pytest.importorskip("dgl")
+torch = pytest.importorskip("torch")
+
+from name_table import load_name_tables  # noqa: E402
+from utils import export_subgraph_zip, report_subgraph  # noqa: E402
+
+
+def make_subgraph():
+    sub_g = dgl.heterograph({
+        ("protein", "ppi", "protein"): (torch.tensor([0, 1, 2, 0]), torch.tensor([1, 2, 0, 0])),
+        ("protein", "protein-go", "go"): (torch.tensor([0, 0, 2]), torch.tensor([1, 0, 1])),
+        ("go", "go-go", "go"): (torch.tensor([], dtype=torch.int64), torch.tensor([], dtype=torch.int64)),
+    }, num_nodes_dict={"protein": 4, "go": 2})
+    # P3 没有边；名称含非 ASCII 字符
+    id_map = {"protein": {0: "P0", 1: "P1", 2: "P2", 3: "P3"}, "go": {0: "GO:0", 1: "GO:ß"}}
+    return sub_g, id_map
+
+
+def expected_triples(sub_g, id_map):
+    lines = []
+    for src_type, relation, dst_type in sub_g.canonical_etypes:
+        src, dst = sub_g.edges(etype=(src_type, relation, dst_type))
+        lines += [f"{id_map[src_type][u]}\t{relation}\t{id_map[dst_type][v]}"
+                  for u, v in zip(src.tolist(), dst.tolist())]
+    return lines
+
+
+def test_zip_triples(tmp_path):
+    sub_g, id_map = make_subgraph()
+    zip_path = export_subgraph_zip(sub_g, id_map, str(tmp_path / "out.zip"), extra_files={"query.json": "{}"},
+                                   binary=False, chunk_edges=2)
+    with zipfile.ZipFile(zip_path) as zipf:
+        assert sorted(zipf.namelist()) == ["entities.json", "query.json", "triples.txt"]
+        assert zipf.read("triples.txt").decode("utf-8").splitlines() == expected_triples(sub_g, id_map)
+        entities = json.loads(zipf.read("entities.json"))
+    assert entities == {"go": ["GO:0", "GO:ß"], "protein": ["P0", "P1", "P2", "P3"]}
+
+    # report_subgraph 写出相同的三元组文件
+    _, triplets = report_subgraph(sub_g, id_map, save_root=str(tmp_path / "report"))
+    with open(tmp_path / "report" / "triples.txt", encoding="utf-8") as f:
+        assert f.read().splitlines() == expected_triples(sub_g, id_map)
+    assert ["\t".join(triple) for triple in triplets] == expected_triples(sub_g, id_map)
+
+
+def test_binary_arrays(tmp_path):
+    sub_g, id_map = make_subgraph()
+    zip_path = export_subgraph_zip(sub_g, id_map, str(tmp_path / "out.zip"))
+    with zipfile.ZipFile(zip_path) as zipf:
+        zipf.extractall(tmp_path / "out")
+    binary_dir = tmp_path / "out" / "binary"
+    with open(binary_dir / "meta.json") as f:
+        meta = json.load(f)
+    assert meta["num_nodes"] == {"protein": 4, "go": 2}
+    assert [tuple(etype) for etype in meta["canonical_etypes"]] == sub_g.canonical_etypes
+    for i, etype in enumerate(sub_g.canonical_etypes):
+        src, dst = sub_g.edges(etype=etype)
+        for name, ids in (("src", src), ("dst", dst)):
+            array = np.load(os.path.join(binary_dir, f"{i}_{name}.npy"))
+            assert array.dtype == np.int32 and array.shape == (sub_g.num_edges(etype),)
+            np.testing.assert_array_equal(array, ids.numpy())
+
+    # 名称表与子图的 ID 一一对应
+    tables = load_name_tables(str(binary_dir))
+    for ntype, names in id_map.items():
+        assert tables[ntype].take(np.arange(sub_g.num_nodes(ntype))).tolist() == [names[nid] for nid in range(len(names))]
+        assert {name: tables[ntype][name] for name in names.values()} == {name: nid for nid, name in names.items()}
@@ -0,0 +1,55 @@
+import os
+import random
+
+import pytest
+
+pytest.importorskip("dgl")
+torch = pytest.importorskip("torch")
+
+from utils import append_links, process_knowledge_graph, process_knowledge_graph_chunked  # noqa: E402
+
+NTYPES = ["protein", "compound", "go", "disease"]
+
+
+@pytest.fixture
+def links(tmp_path):
+    rng = random.Random(1)
+    path = tmp_path / "unibiomap.links.tsv"
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(3000):
+            h_type, t_type = rng.choice(NTYPES), rng.choice(NTYPES)
+            rel = rng.choice(["HAS_METABOLITE", "X", "Y"])
+            f.write(f"{h_type}\t{t_type}\t{h_type[0]}{rng.randint(0, 400)}é\t{rel}\t{t_type[0]}{rng.randint(0, 400)}\n")
+    return str(path)
+
+
+def assert_same_graph(graph, node_map, expected, expected_map):
+    assert {ntype: dict(mapping) for ntype, mapping in node_map.items()} == dict(expected_map)
+    assert sorted(graph.canonical_etypes) == sorted(expected.canonical_etypes)
+    for etype in expected.canonical_etypes:
+        for got, want in zip(graph.edges(etype=etype, order='eid'), expected.edges(etype=etype, order='eid')):
+            assert torch.equal(got, want)
+
+
+@pytest.mark.parametrize("simplify_edge", [True, False])
+@pytest.mark.parametrize("num_workers", [1, 3])
+def test_chunked_matches_sequential(links, simplify_edge, num_workers):
+    expected, expected_map = process_knowledge_graph(links, simplify_edge=simplify_edge)
+    # 小块使每个 worker 处理多段，且块边界落在行中间
+    graph, node_map = process_knowledge_graph_chunked(links, simplify_edge=simplify_edge,
+                                                      num_workers=num_workers, chunk_bytes=5000)
+    assert_same_graph(graph, node_map, expected, expected_map)
+
+
+def test_append_matches_full_ingest(links, tmp_path):
+    expected, expected_map = process_knowledge_graph(links, simplify_edge=True)
+    with open(links, "rb") as f:
+        lines = f.readlines()
+    head = str(tmp_path / "head.tsv")
+    with open(head, "wb") as f:
+        f.writelines(lines[:1000])
+    graph, node_map = process_knowledge_graph(head, simplify_edge=True)
+    node_map = {ntype: dict(mapping) for ntype, mapping in node_map.items()}
+    graph, node_map, num_rows = append_links(graph, node_map, links, os.path.getsize(head), simplify_edge=True)
+    assert num_rows == len(lines) - 1000
+    assert_same_graph(graph, node_map, expected, expected_map)
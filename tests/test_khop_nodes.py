@@ -0,0 +1,59 @@
+import numpy as np
+
+from conftest import make_csr_graph, naive_distances
+from csr_graph import khop_nodes
+
+
+def test_matches_naive_bfs(random_graph):
+    csr_graph, num_nodes, edges = random_graph
+    dist = naive_distances(num_nodes, edges, {"a": [3]})
+    for depth in range(4):
+        # chunk_edges 较小时，每一跳被拆成多块处理
+        nodes, truncated = khop_nodes(csr_graph, {"a": [3]}, depth=depth, chunk_edges=7)
+        assert not truncated
+        for ntype in num_nodes:
+            expected = np.flatnonzero((dist[ntype] >= 0) & (dist[ntype] <= depth))
+            np.testing.assert_array_equal(nodes[ntype], expected)
+
+
+def test_budgets(random_graph):
+    csr_graph, num_nodes, edges = random_graph
+    full, _ = khop_nodes(csr_graph, {"a": [3]}, depth=3)
+    nodes, truncated = khop_nodes(csr_graph, {"a": [3]}, depth=3, node_budgets={"b": 5}, max_nodes=30)
+    assert truncated
+    assert len(nodes["b"]) <= 5
+    assert sum(len(ids) for ids in nodes.values()) <= 30
+    assert 3 in nodes["a"]
+    for ntype in num_nodes:
+        assert np.isin(nodes[ntype], full[ntype]).all()
+
+
+def test_seeds_kept_over_budget(random_graph):
+    csr_graph, _, _ = random_graph
+    nodes, truncated = khop_nodes(csr_graph, {"a": [1, 2, 3]}, depth=2, max_nodes=2)
+    np.testing.assert_array_equal(nodes["a"], [1, 2, 3])
+    assert len(nodes["b"]) == 0
+    assert truncated
+
+
+def test_exhausted_type_while_others_have_room():
+    # 种子 a0 连接 b0..b3 与 c0..c3；每个 c 再连接一个 d 和一个新的 b
+    num_nodes = {"a": 1, "b": 8, "c": 4, "d": 4}
+    edges = {
+        ("a", "a-b", "b"): (np.zeros(4, dtype=np.int64), np.arange(4)),
+        ("a", "a-c", "c"): (np.zeros(4, dtype=np.int64), np.arange(4)),
+        ("c", "c-d", "d"): (np.arange(4), np.arange(4)),
+        ("c", "c-b", "b"): (np.arange(4), np.arange(4, 8)),
+    }
+    # b 的预算在第一跳正好用完，c、d 仍继续扩展；第二跳被舍弃的 b4..b7 计为截断
+    nodes, truncated = khop_nodes(make_csr_graph(num_nodes, edges), {"a": [0]}, depth=3, node_budgets={"b": 4})
+    np.testing.assert_array_equal(nodes["b"], np.arange(4))
+    np.testing.assert_array_equal(nodes["c"], np.arange(4))
+    np.testing.assert_array_equal(nodes["d"], np.arange(4))
+    assert truncated
+
+    # c 只连接已收集的 b 时，用完的预算没有舍弃任何节点
+    edges[("c", "c-b", "b")] = (np.arange(4), np.arange(4))
+    nodes, truncated = khop_nodes(make_csr_graph(num_nodes, edges), {"a": [0]}, depth=3, node_budgets={"b": 4})
+    np.testing.assert_array_equal(nodes["d"], np.arange(4))
+    assert not truncated
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from name_table import load_name_tables, write_name_tables
+
+
+def test_round_trip(tmp_path):
+    node_map = {"protein": {"P2": 0, "P10": 1, "Ä1": 2}, "go": {}}
+    write_name_tables(node_map, str(tmp_path))
+    tables = load_name_tables(str(tmp_path))
+    assert dict(tables["protein"]) == node_map["protein"]
+    assert len(tables["go"]) == 0
+    assert "P3" not in tables["protein"]
+    assert tables["protein"].ids[1] == "P10"
+    np.testing.assert_array_equal(tables["protein"].ids[np.array([2, 0])], ["Ä1", "P2"])
+
+
+def test_rebuild_keeps_mapped_tables(tmp_path):
+    pytest.importorskip("dgl")
+    pytest.importorskip("torch")
+    from utils import replace_dir
+
+    save_dir = str(tmp_path / "node_names")
+    replace_dir(lambda tmp_dir: write_name_tables({"go": {"GO:1": 0, "GO:2": 1}}, tmp_dir), save_dir)
+    old = load_name_tables(save_dir)
+    replace_dir(lambda tmp_dir: write_name_tables({"go": {"GO:9": 0}}, tmp_dir), save_dir)
+    # 已映射的旧表不受重建影响
+    assert list(old["go"]) == ["GO:1", "GO:2"]
+    assert list(load_name_tables(save_dir)["go"]) == ["GO:9"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["node_names"]
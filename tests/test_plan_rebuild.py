@@ -0,0 +1,54 @@
+import os
+
+import pytest
+
+pytest.importorskip("dgl")
+pytest.importorskip("torch")
+
+from utils import MANIFEST_VERSION, _plan_rebuild, _source_state, file_sha256  # noqa: E402
+
+OPTIONS = {"simplify_edge": True}
+
+
+@pytest.fixture
+def links(tmp_path):
+    path = tmp_path / "unibiomap.links.tsv"
+    path.write_text("protein\tgo\tP1\tr\tGO:1\n")
+    return str(path)
+
+
+def manifest_of(path, options=OPTIONS):
+    source = _source_state(path)
+    source["sha256"] = file_sha256(path)
+    return {"format_version": MANIFEST_VERSION, "options": options, "source": source, "artifacts": {}}
+
+
+def test_fresh(links):
+    manifest = manifest_of(links)
+    assert _plan_rebuild(manifest, links, OPTIONS)[0] == "fresh"
+    # 只有 mtime 变化时按哈希判断
+    stat = os.stat(links)
+    os.utime(links, (stat.st_atime, stat.st_mtime + 10))
+    plan, source = _plan_rebuild(manifest, links, OPTIONS)
+    assert plan == "fresh" and source["mtime"] == stat.st_mtime + 10
+
+
+def test_append(links):
+    manifest = manifest_of(links)
+    with open(links, "a") as f:
+        f.write("protein\tgo\tP2\tr\tGO:1\n")
+    assert _plan_rebuild(manifest, links, OPTIONS)[0] == "append"
+
+
+def test_full(links):
+    manifest = manifest_of(links)
+    assert _plan_rebuild(None, links, OPTIONS)[0] == "full"
+    assert _plan_rebuild(manifest, links, {"simplify_edge": False})[0] == "full"
+    with open(links, "w") as f:
+        f.write("protein\tgo\tP3\tr\tGO:2\nprotein\tgo\tP4\tr\tGO:2\n")
+    assert _plan_rebuild(manifest, links, OPTIONS)[0] == "full"
+
+
+def test_processed_only_manifest(links):
+    manifest = dict(manifest_of(links), source=None)
+    assert _plan_rebuild(manifest, links, OPTIONS)[0] == "full"
@@ -0,0 +1,76 @@
+import numpy as np
+
+from conftest import make_csr_graph
+from csr_graph import (CombinedAdjacency, _row_sums, load_or_build_combined_adjacency, personalized_pagerank,
+                       top_nodes_per_type, traversal_etypes)
+
+
+def test_row_sums():
+    # 末尾的空行曾导致最后一个非空行被截短
+    np.testing.assert_array_equal(_row_sums(np.array([0, 2, 2]), np.array([1.0, 2.0]), np.array([False, True])),
+                                  [3, 0])
+    indptr = np.array([0, 0, 3, 3, 4, 4])
+    values = np.array([1.0, 2.0, 3.0, 4.0])
+    np.testing.assert_array_equal(_row_sums(indptr, values, np.diff(indptr) == 0), [0, 6, 0, 4, 0])
+    np.testing.assert_array_equal(_row_sums(np.zeros(3, dtype=np.int64), np.empty(0), np.ones(2, dtype=bool)),
+                                  [0, 0])
+
+
+def dense_ppr(adjacency, edges, seeds, alpha, etypes=None, iterations=2000):
+    n = adjacency.total_nodes
+    matrix = np.zeros((n, n))
+    for etype, (heads, tails) in edges.items():
+        if etypes is not None and etype not in etypes:
+            continue
+        for head, tail in zip(adjacency.global_ids(etype[0], heads), adjacency.global_ids(etype[2], tails)):
+            matrix[head, tail] += 1
+            matrix[tail, head] += 1
+    degrees = matrix.sum(axis=1)
+    restart = np.zeros(n)
+    seed_ids = np.concatenate([adjacency.global_ids(ntype, ids) for ntype, ids in seeds.items()])
+    restart[seed_ids] = 1 / len(seed_ids)
+    scores = restart.copy()
+    for _ in range(iterations):
+        share = np.divide(scores, degrees, out=np.zeros(n), where=degrees > 0)
+        scores = (1 - alpha) * (matrix.T @ share)
+        scores += (1 - scores.sum()) * restart
+    return scores
+
+
+def test_matches_dense_reference():
+    rng = np.random.default_rng(1)
+    # 两种类型末尾各有若干孤立节点
+    num_nodes = {"a": 40, "b": 30}
+    edges = {
+        ("a", "a-b", "b"): (rng.integers(0, 35, 150), rng.integers(0, 25, 150)),
+        ("a", "a-a", "a"): (rng.integers(0, 35, 60), rng.integers(0, 35, 60)),
+    }
+    adjacency = CombinedAdjacency.from_csr(make_csr_graph(num_nodes, edges))
+    for seeds, etypes in [({"a": [1]}, None), ({"a": [1, 2], "b": [5]}, None),
+                          ({"a": [1]}, traversal_etypes(list(edges), deny_etypes=["a-a"]))]:
+        scores = personalized_pagerank(adjacency, seeds, iterations=500, tol=1e-12, eps=0, etypes=etypes)
+        result = np.concatenate([scores["a"], scores["b"]])
+        np.testing.assert_allclose(result, dense_ppr(adjacency, edges, seeds, 0.15, etypes), atol=1e-10)
+        assert (scores["a"][35:] == 0).all() and (scores["b"][25:] == 0).all()
+
+
+def test_top_nodes_per_type():
+    scores = {"a": np.array([0.5, 0.0, 0.2, 0.3]), "b": np.array([0.0, 0.1])}
+    nodes = top_nodes_per_type(scores, 2, seeds={"b": [0]})
+    np.testing.assert_array_equal(nodes["a"], [0, 3])
+    np.testing.assert_array_equal(nodes["b"], [0, 1])
+
+
+def test_saved_adjacency_is_keyed_on_version(tmp_path):
+    num_nodes = {"a": 4}
+    old = make_csr_graph(num_nodes, {("a", "a-a", "a"): (np.array([0, 1]), np.array([1, 2]))})
+    # 重建后节点数与边数不变，但边不同
+    new = make_csr_graph(num_nodes, {("a", "a-a", "a"): (np.array([0, 2]), np.array([3, 3]))})
+    save_dir = str(tmp_path / "ppr")
+    load_or_build_combined_adjacency(old, save_dir, version="v1")
+    stale = load_or_build_combined_adjacency(new, save_dir, version="v1")
+    np.testing.assert_array_equal(stale.indices, CombinedAdjacency.from_csr(old).indices)
+    rebuilt = load_or_build_combined_adjacency(new, save_dir, version="v2")
+    np.testing.assert_array_equal(rebuilt.indices, CombinedAdjacency.from_csr(new).indices)
+    loaded = load_or_build_combined_adjacency(new, save_dir, version="v2")
+    np.testing.assert_array_equal(loaded.indices, rebuilt.indices)
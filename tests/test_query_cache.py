@@ -0,0 +1,77 @@
+import copy
+import pickle
+
+import pytest
+
+dgl = pytest.importorskip("dgl")
+torch = pytest.importorskip("torch")
+
+from utils import QueryCache, SubgraphRenderer  # noqa: E402
+
+
+def make_renderer(num_leaves=50):
+    sub_g = dgl.heterograph({
+        ("protein", "protein-go", "go"): (torch.zeros(num_leaves, dtype=torch.int64), torch.arange(num_leaves)),
+    })
+    id_map = {"protein": {0: "P0"}, "go": {i: f"GO:{i}" for i in range(num_leaves)}}
+    return SubgraphRenderer(sub_g, id_map, {"protein": ["P0"]}, {})
+
+
+def test_renderer_growth_is_accounted():
+    cache = QueryCache(max_entries=8, max_bytes=1 << 30)
+    renderer = make_renderer()
+    cache.put("a", ("result", renderer))
+    before = cache.stats()["bytes"]
+    renderer.to_echarts_json({"protein": -1, "go": -1}, {"protein": "#f00", "go": "#0f0"}, layout="fixed")
+    after = cache.stats()["bytes"]
+    assert after > before
+    assert after - before == renderer.nbytes() - make_renderer().nbytes()
+
+
+def test_growth_evicts_over_budget():
+    first, second = make_renderer(), make_renderer()
+    cache = QueryCache(max_entries=8, max_bytes=3 * first.nbytes())
+    cache.put("a", (first,))
+    cache.put("b", (second,))
+    second.to_compact_json({"protein": -1, "go": -1}, {}, layout="fixed")
+    # b 增长后超出字节上限，最久未用的 a 被淘汰
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+
+def test_replaced_entry_ignores_old_renderer():
+    cache = QueryCache()
+    old = make_renderer()
+    cache.put("a", (old,))
+    cache.put("a", (make_renderer(),))
+    size = cache.stats()["bytes"]
+    old.to_echarts_json({"protein": -1, "go": -1}, {})
+    assert cache.stats()["bytes"] == size
+
+
+def test_concurrent_display():
+    from concurrent.futures import ThreadPoolExecutor
+
+    limits = {"protein": -1, "go": 10}
+    expected = make_renderer().to_echarts_json(limits, {}, selection="seed_edges")
+    renderer = make_renderer()
+    with ThreadPoolExecutor(8) as pool:
+        outputs = list(pool.map(lambda _: renderer.to_echarts_json(limits, {}, selection="seed_edges"), range(32)))
+    assert all(output == expected for output in outputs)
+
+
+def test_renderer_deepcopy_shares_desc_store(tmp_path):
+    from desc_store import build_desc_store, DescStore
+
+    desc_path = tmp_path / "go_desc.json"
+    desc_path.write_text('{"GO:0": {"name": "zero"}}')
+    db_path = str(tmp_path / "desc.sqlite")
+    build_desc_store({"go": str(desc_path)}, db_path)
+    renderer = make_renderer()
+    renderer.desc_dict = DescStore(db_path)
+    assert copy.deepcopy(renderer) is renderer
+
+    restored = pickle.loads(pickle.dumps(renderer))
+    assert restored.desc_dict.get("go")["GO:0"] == {"name": "zero"}
+    assert restored.to_compact_json({"protein": -1, "go": -1}, {}, layout="fixed") == \
+        renderer.to_compact_json({"protein": -1, "go": -1}, {}, layout="fixed")
@@ -0,0 +1,91 @@
+import json
+import os
+import shutil
+import subprocess
+
+import numpy as np
+import pytest
+
+dgl = pytest.importorskip("dgl")
+torch = pytest.importorskip("torch")
+pytest.importorskip("networkx")
+
+from utils import (SubgraphRenderer, convert_subgraph_to_networkx, nx_to_echarts_json,  # noqa: E402
+                   rank_display_nodes)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COLOR_MAP = {"protein": "#FF6347", "go": "#87CEEB", "disease": "#FFD700"}
+
+
+def make_subgraph():
+    edges = {
+        # 自环、重复边与反向边
+        ("protein", "ppi", "protein"): ([0, 0, 1, 1, 2, 3], [0, 1, 0, 1, 3, 2]),
+        ("protein", "protein-go", "go"): ([0, 0, 1, 2, 3, 3], [0, 0, 1, 2, 3, 4]),
+        # 与 protein-go 连接同一对节点的另一种关系
+        ("go", "go-protein", "protein"): ([0, 4, 5], [0, 3, 1]),
+        ("disease", "disease-protein", "protein"): ([0, 1, 2], [2, 0, 3]),
+    }
+    sub_g = dgl.heterograph({etype: (torch.tensor(h), torch.tensor(t)) for etype, (h, t) in edges.items()},
+                            num_nodes_dict={"protein": 5, "go": 6, "disease": 3})
+    id_map = {"protein": {i: f"P{i}" for i in range(5)},
+              "go": {i: f"GO:{i}" for i in range(6)},
+              "disease": {i: f"MONDO:{i}" for i in range(3)}}
+    desc_dict = {"protein": {"P0": {"entry_name": "ZERO", "protein_name": "Protein zero"}},
+                 "go": {"GO:1": {"name": "process one"}}}
+    return sub_g, id_map, desc_dict
+
+
+@pytest.mark.parametrize("remove_self_loop", [True, False])
+@pytest.mark.parametrize("selection", ["first", "seed_edges", "hop"])
+@pytest.mark.parametrize("display_limits", [
+    {"protein": -1, "go": -1, "disease": -1},
+    {"protein": 2, "go": 3, "disease": -1},
+    {"protein": 1, "go": 0, "disease": 1},
+])
+def test_matches_networkx_path(remove_self_loop, selection, display_limits):
+    sub_g, id_map, desc_dict = make_subgraph()
+    must_show = {"protein": ["P3"], "go": ["GO:5"]}
+    renderer = SubgraphRenderer(sub_g, id_map, must_show, desc_dict, remove_self_loop)
+    nx_g = convert_subgraph_to_networkx(sub_g, id_map, display_limits, must_show, remove_self_loop, selection)
+    expected = json.loads(nx_to_echarts_json(nx_g, COLOR_MAP, desc_dict))
+    # 两次渲染：第二次走缓存的片段
+    for _ in range(2):
+        assert json.loads(renderer.to_echarts_json(display_limits, COLOR_MAP, selection)) == expected
+
+
+def test_rank_display_nodes():
+    # 种子 P0；P5、P7 孤立
+    heads, tails = [0, 0, 2, 1, 1, 3, 6, 6], [1, 2, 0, 3, 4, 4, 0, 3]
+    sub_g = dgl.heterograph({("protein", "ppi", "protein"): (torch.tensor(heads), torch.tensor(tails))},
+                            num_nodes_dict={"protein": 8})
+    highlight = {"protein": {0}}
+    assert rank_display_nodes(sub_g, highlight, "first") is None
+    # 按跳数、与种子的边数、度排序，最后按编号：P2 有两条到种子的边，P1 与 P6 按度区分
+    np.testing.assert_array_equal(rank_display_nodes(sub_g, highlight, "hop")["protein"], [0, 2, 1, 6, 3, 4, 5, 7])
+    # 不看跳数时种子本身（与种子无边）排在有种子边的节点之后
+    np.testing.assert_array_equal(rank_display_nodes(sub_g, highlight, "seed_edges")["protein"],
+                                  [2, 1, 6, 0, 3, 4, 5, 7])
+
+
+def expand_payload(payload):
+    # 用 static/echarts_graph.js 中的 expandGraphPayload 解码列式数据
+    script = ("const fs = require('fs');"
+              f"eval(fs.readFileSync({json.dumps(os.path.join(ROOT, 'static', 'echarts_graph.js'))}, 'utf8'));"
+              "process.stdout.write(JSON.stringify(expandGraphPayload(JSON.parse(fs.readFileSync(0, 'utf8')))));")
+    result = subprocess.run(["node", "-e", script], input=payload, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+@pytest.mark.parametrize("layout", ["force", "fixed"])
+@pytest.mark.parametrize("display_limits", [{"protein": -1, "go": -1, "disease": -1}, {"protein": 2, "go": 3}])
+def test_compact_payload_round_trip(layout, display_limits):
+    sub_g, id_map, desc_dict = make_subgraph()
+    renderer = SubgraphRenderer(sub_g, id_map, {"protein": ["P3"]}, desc_dict)
+    expected = json.loads(renderer.to_echarts_json(display_limits, COLOR_MAP, "hop", layout=layout))
+    decoded = expand_payload(renderer.to_compact_json(display_limits, COLOR_MAP, "hop", layout=layout))
+    # 列式数据中的节点大小保留三位小数
+    for node in expected["nodes"]:
+        node["symbolSize"] = round(node["symbolSize"], 3)
+    assert decoded == expected
@@ -0,0 +1,72 @@
+import pytest
+
+from search_index import SearchIndex, build_search_index, load_or_build_search_index
+
+
+class FakeDescStore:
+    def __init__(self, records, db_path):
+        self.records = records
+        self.ntypes = list(records)
+        self.db_path = db_path
+
+    def iter_records(self, ntype):
+        return iter(self.records[ntype].items())
+
+
+@pytest.fixture
+def index(tmp_path):
+    node_map = {
+        "protein": {f"P{i:05d}": i for i in range(200)},
+        "go": {"GO:0006915": 0, "GO:0008150": 1, "GO:0005634": 2},
+    }
+    records = {
+        "protein": {"P00001": {"entry_name": "APOPTOSIS_REGULATOR", "protein_name": "Apoptosis regulator"}},
+        "go": {"GO:0006915": {"name": "apoptotic process"},
+               "GO:0008150": {"name": "biological process"},
+               "GO:0005634": {"name": "nucleus"}},
+    }
+    db_path = str(tmp_path / "search.sqlite")
+    build_search_index(node_map, FakeDescStore(records, str(tmp_path / "desc.sqlite")), db_path)
+    return SearchIndex(db_path)
+
+
+def test_prefix(index):
+    hits = index.search("go:00069", fuzzy=False)
+    assert [(hit["id"], hit["match"]) for hit in hits] == [("GO:0006915", "id_prefix")]
+    assert index.search("p00001")[0]["match"] == "id"
+
+
+def test_substring_with_short_type(index):
+    hits = index.search("process", ntype="go")
+    assert {hit["id"] for hit in hits} == {"GO:0006915", "GO:0008150"}
+    assert all(hit["match"] == "substring" for hit in hits)
+    assert index.search("apopto", ntype="protein")[0]["id"] == "P00001"
+
+
+def test_fuzzy_with_short_type(index):
+    hits = index.search("apoptotik proces", ntype="go")
+    assert hits and hits[0]["id"] == "GO:0006915" and hits[0]["match"] == "fuzzy"
+    assert all(hit["ntype"] == "go" for hit in hits)
+
+
+def test_unknown_type(index):
+    assert index.search("process", ntype="pathway") == []
+
+
+def test_validate(index):
+    node_map = {"go": {"GO:0006915": 0}}
+    assert index.validate({"go": ["GO:0006915"]}, node_map) == {}
+    assert index.validate({"go": ["nucleos"]}, node_map) == {"go": {"nucleos": ["GO:0005634"]}}
+
+
+def test_rebuilt_for_new_version(tmp_path):
+    desc_store = FakeDescStore({}, str(tmp_path / "desc.sqlite"))
+    open(desc_store.db_path, "w").close()
+    db_path = str(tmp_path / "search.sqlite")
+    load_or_build_search_index({"go": {"GO:1": 0}}, desc_store, db_path, version="v1")
+    # 节点被替换但数量不变
+    node_map = {"go": {"GO:2": 0}}
+    assert load_or_build_search_index(node_map, desc_store, db_path, version="v1").search("GO:2", fuzzy=False) == []
+    index = load_or_build_search_index(node_map, desc_store, db_path, version="v2")
+    assert [hit["id"] for hit in index.search("GO:2", fuzzy=False)] == ["GO:2"]
+    assert index.search("GO:1", fuzzy=False) == []
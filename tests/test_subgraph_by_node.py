@@ -0,0 +1,52 @@
+import pytest
+
+dgl = pytest.importorskip("dgl")
+torch = pytest.importorskip("torch")
+
+from csr_graph import CSRGraph
+from utils import build_id_names, subgraph_by_node
+
+
+def star_graph(num_leaves=20):
+    # protein 0 与所有 go 节点相连
+    graph = dgl.heterograph({
+        ("protein", "protein-go", "go"): (torch.zeros(num_leaves, dtype=torch.int64), torch.arange(num_leaves)),
+    })
+    node_map = {"protein": {"P0": 0}, "go": {f"GO:{i}": i for i in range(num_leaves)}}
+    return graph, node_map
+
+
+def test_unbounded_by_default():
+    graph, node_map = star_graph()
+    sub_g, _, new_node_map, stats = subgraph_by_node(graph, {"protein": ["P0"]}, node_map, depth=1,
+                                                     csr_graph=CSRGraph.from_dgl(graph),
+                                                     id_names=build_id_names(node_map))
+    assert sub_g.num_nodes("go") == 20
+    assert ("sampling", "budget") not in stats
+
+
+def test_budget_is_reported():
+    graph, node_map = star_graph()
+    sub_g, _, _, stats = subgraph_by_node(graph, {"protein": ["P0"]}, node_map, depth=1,
+                                          csr_graph=CSRGraph.from_dgl(graph), max_nodes=6)
+    assert sub_g.num_nodes() == 6
+    budget = stats[("sampling", "budget")]
+    assert budget["truncated"] and budget["sampled_nodes"] == 6
+
+
+def test_follows_both_directions():
+    # P0 -> GO:0 <- P1：两跳内从 P0 应能到达 P1
+    graph = dgl.heterograph({
+        ("protein", "protein-go", "go"): (torch.tensor([0, 1]), torch.tensor([0, 0])),
+    })
+    node_map = {"protein": {"P0": 0, "P1": 1}, "go": {"GO:0": 0}}
+    sub_g, _, new_node_map, _ = subgraph_by_node(graph, {"protein": ["P0"]}, node_map, depth=2,
+                                                 csr_graph=CSRGraph.from_dgl(graph))
+    assert set(new_node_map["protein"]) == {"P0", "P1"}
+    assert sub_g.num_edges() == 2
+
+
+def test_requires_csr_graph():
+    graph, node_map = star_graph()
+    with pytest.raises(ValueError):
+        subgraph_by_node(graph, {"protein": ["P0"]}, node_map, depth=1)
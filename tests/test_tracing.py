@@ -0,0 +1,91 @@
+import json
+import os
+import pstats
+import threading
+import time
+
+import tracing
+
+
+def test_nested_spans():
+    with tracing.trace("query", depth=2) as t:
+        with tracing.span("outer", seeds=1) as outer:
+            time.sleep(0.02)
+            with tracing.span("inner") as inner:
+                time.sleep(0.01)
+                inner.set(nodes=5)
+        with tracing.span("after"):
+            pass
+        tracing.event("budget_reached", nodes=5)
+    assert tracing.current_trace() is None
+    assert t.attrs == {"depth": 2}
+    assert [(span.name, span.level) for span in t.spans] == [("outer", 0), ("inner", 1), ("after", 0)]
+    assert inner.seconds >= 0.01 and outer.seconds >= inner.seconds + 0.02
+    assert t.seconds >= outer.seconds + t.spans[2].seconds
+    assert outer.counts == {"seeds": 1} and inner.counts == {"nodes": 5}
+    assert [event["name"] for event in t.events] == ["budget_reached"]
+
+    lines = t.summary().splitlines()
+    assert lines[0].startswith("[trace] query: ")
+    assert lines[1].startswith("  outer: ") and lines[1].endswith("| seeds=1")
+    assert lines[2].startswith("    inner: ") and lines[2].endswith("| nodes=5")
+    assert lines[3].startswith("  after: ") and "|" not in lines[3]
+    assert lines[4] == "  ! budget_reached: nodes=5"
+
+
+def test_span_without_trace_is_a_no_op():
+    with tracing.span("orphan") as s:
+        s.set(nodes=1)
+    assert tracing.current_trace() is None
+
+
+def test_traces_are_per_thread():
+    barrier = threading.Barrier(2)
+    traces = {}
+
+    def run(name):
+        with tracing.trace(name) as t:
+            barrier.wait()
+            with tracing.span(f"{name}-stage"):
+                barrier.wait()
+        traces[name] = t
+
+    threads = [threading.Thread(target=run, args=(name,)) for name in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [span.name for span in traces["a"].spans] == ["a-stage"]
+    assert [span.name for span in traces["b"].spans] == ["b-stage"]
+
+
+def test_log_and_metrics(tmp_path):
+    log_path = str(tmp_path / "logs" / "trace.jsonl")
+    before = tracing.metrics.snapshot().get("logged-stage", {}).get("count", 0)
+    for _ in range(2):
+        with tracing.trace("logged", log_path=log_path, seeds=3):
+            with tracing.span("logged-stage"):
+                pass
+    with open(log_path) as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == 2
+    assert records[0]["attrs"] == {"seeds": 3}
+    assert [span["name"] for span in records[0]["spans"]] == ["logged-stage"]
+    assert tracing.metrics.snapshot()["logged-stage"]["count"] == before + 2
+
+
+def test_profile(tmp_path):
+    profile_dir = str(tmp_path / "prof")
+    with tracing.trace("profiled", profile_dir=profile_dir) as t:
+        # 同一时间只允许一个请求启用 cProfile
+        with tracing.trace("nested", profile_dir=profile_dir) as nested:
+            sum(range(1000))
+    assert nested.profile_path is None
+    assert [event["name"] for event in nested.events] == ["profile_skipped"]
+    assert os.path.exists(t.profile_path)
+    assert pstats.Stats(t.profile_path).total_calls > 0
+    assert t.summary().splitlines()[-1] == f"  profile: {t.profile_path}"
+
+    with tracing.trace("unprofiled") as t:
+        pass
+    assert t.profile_path is None
@@ -0,0 +1,26 @@
+import numpy as np
+
+from csr_graph import khop_nodes, traversal_etypes
+
+ETYPES = [("a", "a-b", "b"), ("a", "a-a", "a"), ("b", "b-b", "b")]
+
+
+def test_no_filter():
+    assert traversal_etypes(ETYPES) is None
+    assert traversal_etypes(ETYPES, deny_etypes=[], deny_ntypes=[]) is None
+
+
+def test_allow_and_deny():
+    assert traversal_etypes(ETYPES, allow_etypes=["a-a", ("b", "b-b", "b")]) == {ETYPES[1], ETYPES[2]}
+    assert traversal_etypes(ETYPES, deny_etypes=["a-a"]) == {ETYPES[0], ETYPES[2]}
+    assert traversal_etypes(ETYPES, allow_ntypes=["a"]) == {ETYPES[1]}
+    assert traversal_etypes(ETYPES, deny_ntypes=["a"]) == {ETYPES[2]}
+
+
+def test_empty_allow_list_allows_nothing(random_graph):
+    assert traversal_etypes(ETYPES, allow_etypes=[]) == set()
+    assert traversal_etypes(ETYPES, allow_ntypes=[]) == set()
+    csr_graph, _, _ = random_graph
+    nodes, _ = khop_nodes(csr_graph, {"a": [3]}, depth=2, etypes=traversal_etypes(ETYPES, allow_etypes=[]))
+    np.testing.assert_array_equal(nodes["a"], [3])
+    assert len(nodes["b"]) == 0
@@ -0,0 +1,266 @@
+"""
+Lightweight request tracing for the query pipeline.
+
+    with tracing.trace("run_query", depth=2) as t:
+        with tracing.span("khop") as s:
+            ...
+            s.set(nodes=1234)
+    print(t.summary())
+
+Spans record wall time, resident set size and optional counts. They attach
+to the trace active in the current thread and cost nothing without one, so
+library functions (utils.subgraph_by_node, ...) can be instrumented freely.
+Finished traces feed the latency metrics (see start_metrics_server) and can
+be appended to a JSON-lines log file.
+"""
+import cProfile
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_local = threading.local()
+
+
+def rss_mb():
+    """Current resident set size of the process in MB."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb():
+    """Peak resident set size of the process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+class Span:
+    def __init__(self, name, level, counts):
+        self.name = name
+        self.level = level
+        self.counts = dict(counts)
+        self.seconds = None
+        self.rss_mb = None
+        self.peak_rss_mb = None
+
+    def set(self, **counts):
+        """Attach counts (nodes, edges, bytes, ...) to the span."""
+        self.counts.update(counts)
+
+    def to_dict(self):
+        return {"name": self.name, "level": self.level, "seconds": round(self.seconds or 0.0, 6),
+                "rss_mb": self.rss_mb, "peak_rss_mb": self.peak_rss_mb, "counts": self.counts}
+
+
+class _NullSpan:
+    def set(self, **counts):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    """The spans of one request, in start order."""
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = dict(attrs)
+        self.spans = []
+        self.events = []
+        self.profile_path = None
+        self._level = 0
+        self.started = time.time()
+        self.seconds = None
+
+    def event(self, name, **fields):
+        self.events.append(dict(fields, name=name, at=round(time.time() - self.started, 6)))
+
+    def summary(self):
+        """Readable multi-line summary, one line per span."""
+        lines = [f"[trace] {self.name}: {self.seconds or 0.0:.3f}s, peak RSS {peak_rss_mb():.0f} MB"]
+        for span in self.spans:
+            counts = ", ".join(f"{k}={v}" for k, v in span.counts.items())
+            lines.append(f"{'  ' * (span.level + 1)}{span.name}: {span.seconds or 0.0:.3f}s, "
+                         f"RSS {span.rss_mb:.0f} MB{' | ' + counts if counts else ''}")
+        for event in self.events:
+            lines.append(f"  ! {event['name']}: " + ", ".join(f"{k}={v}" for k, v in event.items()
+                                                              if k not in ("name", "at")))
+        if self.profile_path:
+            lines.append(f"  profile: {self.profile_path}")
+        return "\n".join(lines)
+
+    def to_dict(self):
+        return {"name": self.name, "attrs": self.attrs,
+                "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+                "seconds": round(self.seconds or 0.0, 6), "peak_rss_mb": round(peak_rss_mb(), 1),
+                "spans": [span.to_dict() for span in self.spans], "events": self.events,
+                "profile": self.profile_path}
+
+
+class Metrics:
+    """
+    Latency of traces and spans by name over the last `window` samples, for
+    percentiles, plus running counts and totals. Thread-safe.
+    """
+
+    def __init__(self, window=1024):
+        self.window = window
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+        self._count = defaultdict(int)
+        self._sum = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds):
+        with self._lock:
+            self._samples[name].append(seconds)
+            self._count[name] += 1
+            self._sum[name] += seconds
+
+    def snapshot(self, quantiles=(0.5, 0.9, 0.99)):
+        with self._lock:
+            items = {name: (sorted(samples), self._count[name], self._sum[name])
+                     for name, samples in self._samples.items()}
+        result = {}
+        for name, (samples, count, total) in items.items():
+            result[name] = {"count": count, "sum": round(total, 6),
+                            "quantiles": {str(q): round(samples[min(int(q * len(samples)), len(samples) - 1)], 6)
+                                          for q in quantiles}}
+        return result
+
+    def to_prometheus(self, prefix="unibiomap"):
+        lines = [f"# TYPE {prefix}_stage_seconds summary"]
+        for name, stats in sorted(self.snapshot().items()):
+            for q, value in stats["quantiles"].items():
+                lines.append(f'{prefix}_stage_seconds{{stage="{name}",quantile="{q}"}} {value}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {stats["count"]}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {stats["sum"]}')
+        lines.append(f"# TYPE {prefix}_peak_rss_bytes gauge")
+        lines.append(f"{prefix}_peak_rss_bytes {int(peak_rss_mb() * 2 ** 20)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+_log_lock = threading.Lock()
+# 同一时间只能有一个 cProfile 处于启用状态
+_profile_lock = threading.Lock()
+
+
+def current_trace():
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def span(name, **counts):
+    """
+    Time a stage of the trace active in this thread. Yields the Span, whose
+    set() adds counts; a no-op without an active trace.
+    """
+    trace_ = current_trace()
+    if trace_ is None:
+        yield _NULL_SPAN
+        return
+    record = Span(name, trace_._level, counts)
+    trace_.spans.append(record)
+    trace_._level += 1
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record.seconds = time.perf_counter() - start
+        record.rss_mb = round(rss_mb(), 1)
+        record.peak_rss_mb = round(peak_rss_mb(), 1)
+        trace_._level -= 1
+        metrics.observe(name, record.seconds)
+
+
+def event(name, **fields):
+    """Record a notable event (e.g. an unknown seed ID) in the active trace."""
+    trace_ = current_trace()
+    if trace_ is not None:
+        trace_.event(name, **fields)
+
+
+@contextmanager
+def trace(name, log_path=None, profile_dir=None, **attrs):
+    """
+    Start a trace for one request in the current thread.
+    Parameters:
+        - name: Name of the request type, also the metric name of its total time.
+        - log_path: JSON-lines file to append the finished trace to.
+        - profile_dir: If given, run the request under cProfile and dump the
+          stats to a .prof file there (open with pstats or snakeviz).
+        - attrs: Request attributes stored with the trace.
+    """
+    parent = current_trace()
+    trace_ = Trace(name, attrs)
+    _local.trace = trace_
+    profiler = None
+    if profile_dir:
+        if _profile_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            trace_.event("profile_skipped", reason="another request is being profiled")
+    start = time.perf_counter()
+    try:
+        yield trace_
+    finally:
+        trace_.seconds = time.perf_counter() - start
+        if profiler is not None:
+            profiler.disable()
+            _profile_lock.release()
+            os.makedirs(profile_dir, exist_ok=True)
+            trace_.profile_path = os.path.join(
+                profile_dir, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{threading.get_ident()}.prof")
+            profiler.dump_stats(trace_.profile_path)
+        _local.trace = parent
+        metrics.observe(name, trace_.seconds)
+        if log_path:
+            write_trace_log(trace_, log_path)
+
+
+def write_trace_log(trace_, log_path):
+    line = json.dumps(trace_.to_dict(), ensure_ascii=False, default=str)
+    with _log_lock:
+        os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+        with open(log_path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body, content_type = json.dumps(metrics.snapshot()).encode("utf-8"), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, content_type = metrics.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """
+    Serve the metrics on http://host:port/metrics (Prometheus text format)
+    and /metrics.json from a daemon thread. Returns the server.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -1,14 +1,29 @@
+import gzip
+import hashlib
 import html
 import json
+import multiprocessing as mp
 import dgl
+import functools
+import numpy as np
 import torch
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
 import os
 import networkx as nx
 import gdown
+import shutil
 import sys
+import tempfile
+import threading
+import time
 import zipfile
+from csr_graph import (CSR_FORMAT_VERSION, CSRGraph, connecting_paths, khop_nodes,
+                       personalized_pagerank, top_nodes_per_type, traversal_etypes)
+from name_table import encode_names, write_name_tables, load_name_tables
+from graph_layout import force_layout
+import tracing
 # import matplotlib.pyplot as plt
 
 # file_id = "1tUe3YVyA2K2Xh_GORWYaOGEKyYE5vnAp"
@@ -46,6 +61,18 @@ def load_desc(desc_path_dict):
 def nodemap2idmap(node_map):
     return {k: {vv: kk for kk, vv in v.items()} for k, v in node_map.items()}
 
+def build_id_names(node_map):
+    """
+    Build a per-type array of node names indexed by global node ID, so that
+    names of many nodes can be gathered at once with an ID tensor.
+    """
+    id_names = {}
+    for ntype, mapping in node_map.items():
+        names = np.empty(len(mapping), dtype=object)
+        names[np.fromiter(mapping.values(), dtype=np.int64, count=len(mapping))] = list(mapping.keys())
+        id_names[ntype] = names
+    return id_names
+
 def process_knowledge_graph(file_path, simplify_edge=False):
     """
     Process the knowledge graph data and return a DGL graph object.
@@ -94,6 +121,405 @@ def process_knowledge_graph(file_path, simplify_edge=False):
     return g, node_map
 
 
+def _split_link_chunks(file_path, chunk_bytes, start=0):
+    """
+    Split the links file from byte `start` on into (start, end) byte ranges
+    that begin and end on line boundaries.
+    """
+    file_size = os.path.getsize(file_path)
+    bounds = [start]
+    with open(file_path, 'rb') as f:
+        while bounds[-1] < file_size:
+            f.seek(min(bounds[-1] + chunk_bytes, file_size))
+            f.readline()
+            bounds.append(min(f.tell(), file_size))
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _factorize_first_seen(values):
+    """
+    Factorize an object array, numbering the unique values in order of first
+    appearance. Returns (uniques, codes).
+    """
+    uniq, first, inverse = np.unique(values, return_index=True, return_inverse=True)
+    order = np.argsort(first, kind='stable')
+    rank = np.empty(len(uniq), dtype=np.int64)
+    rank[order] = np.arange(len(uniq))
+    return uniq[order], rank[inverse.reshape(-1)]
+
+
+def _parse_links_chunk(task):
+    """
+    Parse one byte range of the links file. Node names are factorized per
+    node type with chunk-local codes, numbered in order of first appearance
+    (head before tail, row by row) so that merging the chunks in file order
+    reproduces the IDs of the sequential reader.
+    """
+    file_path, start, end, simplify_edge = task
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode('utf-8')
+    rows = [line.strip().split('\t')[:5] for line in text.split('\n') if line.strip()]
+    if not rows:
+        return [], []
+    h_type, t_type, h_name, rel, t_name = (np.array(col, dtype=object) for col in zip(*rows))
+    if simplify_edge:
+        rel = np.where(rel == "HAS_METABOLITE", "protein_metabolite", h_type + "-" + t_type)
+
+    # 头尾实体交错排列，保证与逐行读取时的首次出现顺序一致
+    all_types = np.empty(2 * len(rows), dtype=object)
+    all_types[0::2], all_types[1::2] = h_type, t_type
+    all_names = np.empty(2 * len(rows), dtype=object)
+    all_names[0::2], all_names[1::2] = h_name, t_name
+
+    node_types, type_codes = _factorize_first_seen(all_types)
+    local_ids = np.empty(2 * len(rows), dtype=np.int64)
+    names_by_type = []
+    for i, ntype in enumerate(node_types):
+        positions = np.flatnonzero(type_codes == i)
+        names, codes = _factorize_first_seen(all_names[positions])
+        local_ids[positions] = codes
+        names_by_type.append((ntype, names))
+
+    edge_keys, edge_codes = _factorize_first_seen(h_type + "\t" + rel + "\t" + t_type)
+    row_order = np.argsort(edge_codes, kind='stable')
+    bounds = np.cumsum(np.bincount(edge_codes, minlength=len(edge_keys)))[:-1]
+    edges = []
+    for key, rows_of_type in zip(edge_keys, np.split(row_order, bounds)):
+        edges.append((tuple(key.split('\t')),
+                      local_ids[2 * rows_of_type], local_ids[2 * rows_of_type + 1]))
+    return names_by_type, edges
+
+
+def ingest_links_chunked(file_path, simplify_edge=False, num_workers=None,
+                         chunk_bytes=64 << 20, start=0, node_map=None):
+    """
+    Read the links file in chunks parsed across a process pool.
+    Returns the per-etype (heads, tails) ID arrays and the node map, with the
+    same IDs and ordering as the sequential reader in process_knowledge_graph.
+    To append rows to an existing graph, pass the byte offset of the first new
+    row as `start` and the existing node map, which is extended in place.
+    """
+    tasks = [(file_path, chunk_start, chunk_end, simplify_edge)
+             for chunk_start, chunk_end in _split_link_chunks(file_path, chunk_bytes, start)]
+    node_map = {} if node_map is None else node_map
+    edge_parts = {}
+    if num_workers is None:
+        num_workers = min(len(tasks), os.cpu_count() or 1)
+
+    def merge(results):
+        for names_by_type, edges in tqdm(results, total=len(tasks), desc='fetching data', unit=' chunks'):
+            local2global = {}
+            for ntype, names in names_by_type:
+                mapping = node_map.setdefault(ntype, {})
+                local2global[ntype] = np.array(
+                    [mapping.setdefault(name, len(mapping)) for name in names], dtype=np.int64)
+            for (h_type, rel, t_type), heads, tails in edges:
+                parts = edge_parts.setdefault((h_type, rel, t_type), ([], []))
+                parts[0].append(local2global[h_type][heads])
+                parts[1].append(local2global[t_type][tails])
+
+    # 用 fork 启动工作进程：app.py 在导入时就会走到这里，spawn 会在每个工作进程中重新导入 app.py；
+    # 不支持 fork 的平台上顺序解析
+    if num_workers > 1 and "fork" in mp.get_all_start_methods():
+        with ProcessPoolExecutor(max_workers=num_workers, mp_context=mp.get_context("fork")) as executor:
+            merge(executor.map(_parse_links_chunk, tasks))
+    else:
+        merge(map(_parse_links_chunk, tasks))
+
+    edges_dict = {}
+    for etype, (head_parts, tail_parts) in edge_parts.items():
+        num_edges = sum(len(part) for part in head_parts)
+        heads = np.empty(num_edges, dtype=np.int64)
+        tails = np.empty(num_edges, dtype=np.int64)
+        np.concatenate(head_parts, out=heads)
+        np.concatenate(tail_parts, out=tails)
+        edges_dict[etype] = (heads, tails)
+    return edges_dict, node_map
+
+
+def process_knowledge_graph_chunked(file_path, simplify_edge=False, num_workers=None,
+                                    chunk_bytes=64 << 20):
+    """
+    Process the knowledge graph data with the chunked parallel reader and
+    return a DGL graph object, identical to process_knowledge_graph.
+    """
+    edges_dict, node_map = ingest_links_chunked(file_path, simplify_edge=simplify_edge,
+                                                num_workers=num_workers, chunk_bytes=chunk_bytes)
+    hetero_data = {
+        et: (torch.from_numpy(heads), torch.from_numpy(tails))
+        for et, (heads, tails) in edges_dict.items()
+    }
+    g = dgl.heterograph(hetero_data)
+
+    print("Node type counts:")
+    for ntype in g.ntypes:
+        print(f"{ntype}: {g.num_nodes(ntype)}")
+
+    print("\nEdge type counts:")
+    for etype in g.canonical_etypes:
+        print(f"{etype}: {g.num_edges(etype)}")
+
+    return g, node_map
+
+
+MANIFEST_VERSION = 1
+
+
+def file_sha256(file_path, num_bytes=None):
+    """
+    SHA-256 of a file, or of its first num_bytes bytes.
+    """
+    digest = hashlib.sha256()
+    remaining = os.path.getsize(file_path) if num_bytes is None else num_bytes
+    with open(file_path, 'rb') as f:
+        while remaining > 0:
+            block = f.read(min(remaining, 8 << 20))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+
+def _source_state(link_path):
+    stat = os.stat(link_path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def _plan_rebuild(manifest, link_path, options):
+    """
+    Compare the manifest with the links file. Returns "fresh", "append" or
+    "full", and the current source record (hash filled in when computed).
+    """
+    source = _source_state(link_path)
+    if (manifest is None or manifest.get("format_version") != MANIFEST_VERSION
+            or manifest.get("options") != options):
+        return "full", source
+    old = manifest.get("source")
+    if old is None:
+        # 只发布处理后文件时没有来源记录，无法判断其由哪个链接文件构建
+        return "full", source
+    if source["size"] == old["size"] and source["mtime"] == old["mtime"]:
+        return "fresh", dict(old)
+    source["sha256"] = file_sha256(link_path)
+    if source["sha256"] == old["sha256"]:
+        return "fresh", dict(old, mtime=source["mtime"])
+    # 仅在旧文件是新文件的前缀（且以换行结尾）时做增量追加
+    if source["size"] > old["size"] and file_sha256(link_path, old["size"]) == old["sha256"]:
+        with open(link_path, 'rb') as f:
+            f.seek(old["size"] - 1)
+            if old["size"] == 0 or f.read(1) == b"\n":
+                return "append", source
+    return "full", source
+
+
+def append_links(graph, node_map, link_path, start, simplify_edge=True):
+    """
+    Append the rows of the links file from byte `start` on to an existing
+    graph and node map. Existing node and edge IDs are unchanged.
+    Returns the new graph, the extended node map and the number of new rows.
+    """
+    new_edges, node_map = ingest_links_chunked(link_path, simplify_edge=simplify_edge,
+                                               start=start, node_map=node_map)
+    hetero_data = {}
+    for etype in graph.canonical_etypes:
+        heads, tails = graph.edges(etype=etype, order='eid')
+        if etype in new_edges:
+            new_heads, new_tails = new_edges.pop(etype)
+            heads = torch.cat([heads, torch.from_numpy(new_heads)])
+            tails = torch.cat([tails, torch.from_numpy(new_tails)])
+        hetero_data[etype] = (heads, tails)
+    for etype, (heads, tails) in new_edges.items():
+        hetero_data[etype] = (torch.from_numpy(heads), torch.from_numpy(tails))
+    num_nodes_dict = {ntype: len(mapping) for ntype, mapping in node_map.items()}
+    num_rows = sum(len(heads) for heads, _ in hetero_data.values()) - graph.num_edges()
+    return dgl.heterograph(hetero_data, num_nodes_dict=num_nodes_dict), node_map, num_rows
+
+
+def processed_version(data_root="database/processed"):
+    """
+    The source hash the processed CSR arrays in data_root were built from,
+    as recorded in the manifest. None if it is not known. Artifacts derived
+    from the processed graph elsewhere are keyed on it.
+    """
+    manifest_path = os.path.join(data_root, "manifest.json")
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+    return manifest.get("artifacts", {}).get("csr")
+
+
+def _csr_format_version(csr_dir):
+    # 0 表示尚未构建
+    meta_path = os.path.join(csr_dir, "meta.json")
+    if not os.path.exists(meta_path):
+        return 0
+    with open(meta_path, "r") as f:
+        return json.load(f).get("format_version", 1)
+
+
+def replace_dir(build, save_dir):
+    """
+    Build a directory with build(tmp_dir) next to save_dir and swap it in
+    for save_dir. Files are never rewritten in place: processes that
+    memory-mapped the old files keep reading them until they unmap them.
+    Returns the result of build.
+    """
+    parent, name = os.path.split(os.path.abspath(save_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=name + ".tmp.", dir=parent)
+    os.chmod(tmp_dir, 0o755)  # mkdtemp 默认只有所有者可读
+    try:
+        result = build(tmp_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    if os.path.exists(save_dir):
+        # 目录不能直接替换非空目录：先把旧目录移开，再移入新目录
+        old_dir = tempfile.mkdtemp(prefix=name + ".old.", dir=parent)
+        os.replace(save_dir, old_dir)
+        os.replace(tmp_dir, save_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    else:
+        os.replace(tmp_dir, save_dir)
+    return result
+
+
+def mapped_artifacts_fresh(link_root="database/unibiomap", data_root="database/processed",
+                           simplify_edge=True):
+    """
+    Whether the memory-mappable artifacts in data_root (CSR arrays and node
+    name tables) are up to date with the links file, checked from the
+    manifest without loading the graph.
+    """
+    manifest_path = os.path.join(data_root, "manifest.json")
+    csr_meta_path = os.path.join(data_root, "unibiomap_simp_csr", "meta.json")
+    names_meta_path = os.path.join(data_root, "node_names", "meta.json")
+    if not all(os.path.exists(path) for path in (manifest_path, csr_meta_path, names_meta_path)):
+        return False
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+    if _csr_format_version(os.path.dirname(csr_meta_path)) < CSR_FORMAT_VERSION:
+        return False
+    version = (manifest.get("source") or {}).get("sha256")
+    artifacts = manifest.get("artifacts", {})
+    if artifacts.get("csr") != version or artifacts.get("node_names") != version:
+        return False
+    link_path = os.path.join(link_root, "unibiomap.links.tsv")
+    if not os.path.exists(link_path):
+        return True
+    plan, _ = _plan_rebuild(manifest, link_path, {"simplify_edge": simplify_edge})
+    return plan == "fresh"
+
+
+def load_or_process_graph(link_root="database/unibiomap", data_root="database/processed",
+                          simplify_edge=True, incremental=True):
+    """
+    Load the processed UniBioMap graph and its derived artifacts, rebuilding
+    whatever is stale.
+    A manifest next to the processed files records the hash, size and row
+    count of unibiomap.links.tsv, the processing options, and which source
+    hash each derived artifact was built from. A changed links file triggers
+    a rebuild; with `incremental`, rows appended to the end of the file are
+    added to the existing graph and node map instead.
+    Output:
+        - graph, csr_graph, node_map, id_map, id_names
+    """
+    os.makedirs(data_root, exist_ok=True)
+    manifest_path = os.path.join(data_root, "manifest.json")
+    node_map_path = os.path.join(data_root, "node_map.json")
+    graph_path = os.path.join(data_root, "unibiomap_simp.dgl")
+    undirected_path = os.path.join(data_root, "unibiomap_simp_undirected.dgl")
+    csr_dir = os.path.join(data_root, "unibiomap_simp_csr")
+    name_table_dir = os.path.join(data_root, "node_names")
+    link_path = os.path.join(link_root, "unibiomap.links.tsv")
+    options = {"simplify_edge": simplify_edge}
+
+    manifest = None
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    processed = os.path.exists(node_map_path) and os.path.exists(graph_path)
+
+    if processed and not os.path.exists(link_path):
+        # 只发布了处理后的文件，无法校验来源，直接加载
+        plan = "fresh"
+        manifest = manifest or {"format_version": MANIFEST_VERSION, "options": options,
+                                "source": None, "artifacts": {}}
+        source = manifest["source"]
+    else:
+        if not os.path.exists(link_path):
+            download_raw_kg(link_root)
+        plan, source = _plan_rebuild(manifest if processed else None, link_path, options)
+        if plan == "append" and not incremental:
+            plan = "full"
+
+    node_map = None
+    if plan == "full":
+        print("Processing the knowledge graph from raw links...")
+        graph, node_map = process_knowledge_graph_chunked(link_path, simplify_edge=simplify_edge)
+        # _plan_rebuild 可能已计算过哈希，避免再读一遍整个文件
+        if "sha256" not in source:
+            source["sha256"] = file_sha256(link_path)
+        source["rows"] = graph.num_edges()
+        manifest = {"format_version": MANIFEST_VERSION, "options": options, "artifacts": {}}
+    elif plan == "append":
+        print("Appending new links to the processed graph...")
+        graph = dgl.load_graphs(graph_path)[0][0]
+        with open(node_map_path, "r") as f:
+            node_map = json.load(f)
+        graph, node_map, num_rows = append_links(graph, node_map, link_path,
+                                                 manifest["source"]["size"], simplify_edge)
+        source["rows"] = manifest["source"]["rows"] + num_rows
+        print(f"Appended {num_rows} links.")
+    else:
+        graph = dgl.load_graphs(graph_path)[0][0]
+
+    if plan != "fresh":
+        dgl.save_graphs(graph_path, [graph])
+        with open(node_map_path, "w") as f:
+            json.dump(node_map, f)
+    manifest["source"] = source
+    version = (source or {}).get("sha256")
+    artifacts = manifest.setdefault("artifacts", {})
+
+    def is_fresh(name):
+        return plan == "fresh" and name in artifacts and artifacts[name] == version
+
+    # 采样已由 CSR 数组完成，不再预先构建双向图；清理旧版本留下的文件
+    if os.path.exists(undirected_path):
+        os.remove(undirected_path)
+    artifacts.pop("undirected", None)
+
+    # 逐边类型的 CSR/CSC 数组，供带预算的 k-hop 遍历使用
+    # 下面两类文件会被其他进程内存映射，重建时写入临时目录后整体替换，不覆盖原文件
+    if not is_fresh("csr") or _csr_format_version(csr_dir) < CSR_FORMAT_VERSION:
+        replace_dir(lambda tmp_dir: CSRGraph.from_dgl(graph).save(tmp_dir), csr_dir)
+    csr_graph = CSRGraph.load(csr_dir)
+    artifacts["csr"] = version
+
+    # 二进制名称表（字符串表 + 偏移 + 排序索引），以内存映射方式加载
+    if not is_fresh("node_names") or not os.path.exists(os.path.join(name_table_dir, "meta.json")):
+        if node_map is None:
+            with open(node_map_path, "r") as f:
+                node_map = json.load(f)
+        replace_dir(lambda tmp_dir: write_name_tables(node_map, tmp_dir), name_table_dir)
+    artifacts["node_names"] = version
+    node_map = load_name_tables(name_table_dir)
+
+    # 清单在所有文件就位后才更新
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+    # id_map 与 id_names 都是名称表的 ID -> 名称视图，无需再构建反向字典
+    id_map = {ntype: table.ids for ntype, table in node_map.items()}
+    id_names = id_map
+    return graph, csr_graph, node_map, id_map, id_names
+
+
 def degree_search(graph, node_type, node_name, node_map):
     """
     Print out-degree and in-degree statistics of a node.
@@ -131,125 +557,178 @@ def degree_search(graph, node_type, node_name, node_map):
                 print(f"  {etype}: {deg}")
 
 
-def analyze_connections(graph, sample_dict, id_map):
+def analyze_connections(graph, sample_dict, id_map, csr_graph=None):
+    """
+    Count the neighbours of every seed node per neighbour type and per edge
+    type. Degrees are computed for all seeds of a type at once, from the
+    CSRGraph indptr arrays when given, else with batched DGL degree calls.
+    """
     connection_stats = {}
     for node_type, node_ids in sample_dict.items():
-        for node_id in node_ids:
+        if len(node_ids) == 0:
+            continue
+        ids = torch.as_tensor(node_ids, dtype=torch.int64)
+        # 每列对应一个 (邻居类型, 边类型, 方向)，一次计算所有种子节点的度
+        columns = []
+        counts = []
+        for etype in graph.canonical_etypes:
+            # 统计出度
+            if etype[0] == node_type:
+                columns.append((etype[2], etype))
+                counts.append(torch.as_tensor(csr_graph.degrees(etype, "out", node_ids)) if csr_graph is not None
+                              else graph.out_degrees(ids, etype=etype))
+            # 统计入度
+            if etype[2] == node_type:
+                columns.append((etype[0], etype))
+                counts.append(torch.as_tensor(csr_graph.degrees(etype, "in", node_ids)) if csr_graph is not None
+                              else graph.in_degrees(ids, etype=etype))
+        counts = torch.stack(counts, dim=1).tolist() if counts else [[] for _ in node_ids]
+        for node_id, row in zip(node_ids, counts):
             node_stats = {"connected_nodes": {}, "connected_edges": {}}
-            for etype in graph.canonical_etypes:
-                # 统计出度
-                if etype[0] == node_type:
-                    neighbors = graph.successors(node_id, etype=etype).tolist()
-                    node_stats["connected_nodes"].setdefault(etype[2], 0)
-                    node_stats["connected_nodes"][etype[2]] += len(neighbors)
-                    node_stats["connected_edges"].setdefault(etype, 0)
-                    node_stats["connected_edges"][etype] += len(neighbors)
-                # 统计入度
-                if etype[2] == node_type:
-                    neighbors = graph.predecessors(node_id, etype=etype).tolist()
-                    node_stats["connected_nodes"].setdefault(etype[0], 0)
-                    node_stats["connected_nodes"][etype[0]] += len(neighbors)
-                    node_stats["connected_edges"].setdefault(etype, 0)
-                    node_stats["connected_edges"][etype] += len(neighbors)
+            for (neighbor_type, etype), count in zip(columns, row):
+                node_stats["connected_nodes"].setdefault(neighbor_type, 0)
+                node_stats["connected_nodes"][neighbor_type] += count
+                node_stats["connected_edges"].setdefault(etype, 0)
+                node_stats["connected_edges"][etype] += count
             connection_stats[(node_type, id_map[node_type][node_id])] = node_stats
     return connection_stats
 
 
+def induced_subgraph(graph, nodes, relabel_nodes=True, store_ids=True, etypes=None):
+    """
+    The subgraph of `graph` induced by `nodes`, as dgl.node_subgraph. graph
+    may also be a graph_store.MappedGraph. With etypes, edges of the other
+    canonical etypes are left out (the subgraph keeps all edge types).
+    """
+    if not isinstance(graph, dgl.DGLGraph):
+        return graph.node_subgraph(nodes, relabel_nodes=relabel_nodes, store_ids=store_ids, etypes=etypes)
+    sub_g = dgl.node_subgraph(graph, nodes, relabel_nodes=relabel_nodes, store_ids=store_ids)
+    if etypes is None or all(etype in etypes for etype in sub_g.canonical_etypes):
+        return sub_g
+    # 不需要的边类型不保留；节点及其原始 ID 不变
+    keep_edges = {etype: torch.arange(sub_g.num_edges(etype)) if etype in etypes
+                  else torch.tensor([], dtype=torch.int64)
+                  for etype in sub_g.canonical_etypes}
+    return dgl.edge_subgraph(sub_g, keep_edges, relabel_nodes=False, store_ids=False)
+
+
+def resolve_seeds(sample_dict, node_map):
+    """
+    Convert the seed names of a query to node IDs.
+    Output:
+        - seed_ids: A dictionary of seed node ID lists per node type.
+        - cur_id_map: The node ID to name mapping of the seeds.
+    None if a seed does not exist.
+    """
+    cur_id_map = {}
+    # 名字转换为 ID 后放入新字典，不修改调用方的 sample_dict（并发请求可能共享它）
+    seed_ids = {}
+    with tracing.span("resolve_seeds") as span:
+        for node_type, node_names in sample_dict.items():
+            for node_name in node_names:
+                if node_name not in node_map[node_type]:
+                    print(f"Node {node_name} does not exist in type {node_type}.")
+                    tracing.event("unknown_seed", ntype=node_type, name=node_name)
+                    return None
+            # convert node names to node IDs
+            seed_ids[node_type] = [node_map[node_type][node_name] for node_name in node_names]
+            cur_id_map[node_type] = {node_map[node_type][node_name]: node_name for node_name in node_names}
+        span.set(seeds=sum(len(v) for v in seed_ids.values()))
+    return seed_ids, cur_id_map
+
+
+def relabel_subgraph(full_g, node_map, id_names=None):
+    """
+    Map the relabeled nodes of a subgraph (created with store_ids=True) back
+    to the original graph.
+    Output:
+        - new2orig: A dictionary of original node ID tensors indexed by new ID.
+        - new_node_map: The node name to new ID mapping of full_g.
+    """
+    # === 构建新 ID 到原始 ID 的映射（直接使用 dgl.NID 张量） ===
+    new2orig = {ntype: full_g.nodes[ntype].data[dgl.NID] for ntype in full_g.ntypes}
+
+    # === 构建 full_g 的新 node_map（名字 -> 新 ID），按原始 ID 向量化取名 ===
+    with tracing.span("relabel"):
+        if id_names is None:
+            id_names = build_id_names(node_map)
+        new_node_map = {}
+        for ntype in full_g.ntypes:
+            names = id_names[ntype][new2orig[ntype].numpy()]
+            new_node_map[ntype] = dict(zip(names.tolist(), range(len(names))))
+    return new2orig, new_node_map
+
 
 def subgraph_by_node(graph, sample_dict, node_map, depth=1,
-                     relabel_nodes=True):
+                     relabel_nodes=True, csr_graph=None, node_budgets=None, max_nodes=None,
+                     id_names=None, allow_etypes=None, deny_etypes=None,
+                     allow_ntypes=None, deny_ntypes=None):
     """
     Get a subgraph centered around a specific node.
     Parameters:
-        - graph: The input DGL graph.
+        - graph: The input DGL graph, or a graph_store.MappedGraph.
         - sample_dict: A dictionary of node names to sample. The keys are node types.
         - node_map: The node name to ID mapping.
         - depth: The depth of the subgraph
+        - csr_graph: The CSRGraph of `graph` (required), on which khop_nodes
+          collects the neighbourhood. load_or_process_graph returns it.
+        - node_budgets: Maximum number of sampled nodes per node type.
+        - max_nodes: Maximum number of sampled nodes in total. Unbounded by
+          default; when a budget is given, connection_stats gets a
+          ("sampling", "budget") entry telling whether it truncated the result.
+        - id_names: The per-type name arrays of `node_map` (see
+          build_id_names). Built on the fly if not given.
+        - allow_etypes, deny_etypes, allow_ntypes, deny_ntypes: Edge types
+          ((src, rel, dst) or relation names) and node types to follow /
+          reach only or never (see csr_graph.traversal_etypes). Filtered
+          edges are neither expanded nor included in the subgraph.
     Output:
         - full_g: The subgraph centered around the node.
+        - new2orig: A dictionary of original node ID tensors indexed by new ID.
+        - new_node_map: The node name to new ID mapping of full_g.
+        - connection_stats: Neighbour counts of the seed nodes.
     """
-    cur_id_map = {}
+    # 采样与过滤都在 CSR 数组上进行；不在每次查询时对全图重新构建
+    if csr_graph is None:
+        raise ValueError("subgraph_by_node needs the CSRGraph of the graph, as returned by load_or_process_graph")
     # print(f"Getting subgraph from: {sample_dict}")
-    for node_type, node_names in sample_dict.items():
-        for node_name in node_names:
-            if node_name not in node_map[node_type]:
-                print(f"Node {node_name} does not exist in type {node_type}.")
-                return
-        # convert node names to node IDs
-        sample_dict[node_type] = [node_map[node_type][node_name] for node_name in node_names]
-        cur_id_map[node_type] = {node_map[node_type][node_name]: node_name for node_name in node_names}
-
-    connection_stats = analyze_connections(graph, sample_dict, cur_id_map)
-
-    # print("Getting out subgraph1...")
-    # out_g, _ = dgl.khop_out_subgraph(graph, sample_dict, k=depth,
-    #                                     relabel_nodes=True, store_ids=True)
-    # print("Getting in subgraph...")
-    # in_g, _ = dgl.khop_in_subgraph(graph, sample_dict, k=depth,
-    #                                 relabel_nodes=True, store_ids=True)
-
-    # TODO: 由于有向图的 khop 采样策略问题，可能导致二阶以上的采样不完整
-    # 例如 A->B<-C 就会导致 C 无法被采样到
-    # 一个临时的解决方案：使用 AddReverse 构造双向图，然后使用其中一个方向进行采样
-    # 但是未来加入边缘src或者类型时可能要考虑修改策略
-    # ====================================================================================================
-    # 构造双向图 （在外部 app.py 构造可能导致统计错误）
-        # 构造双向图
-    graph_undirected = dgl.AddReverse(copy_edata=True, sym_new_etype=False)(graph)
-        
-    # 使用其中一个方向进行采样即可（已经是双向）
-    full_g, _ = dgl.khop_in_subgraph(graph_undirected, sample_dict, k=depth, relabel_nodes=True, store_ids=True)
-    # ====================================================================================================
-
-    # 收集所有节点类型的原始 ID（合并去重）
-    print("收集所有节点类型的原始 ID（合并去重）")
-    all_nodes = {}
-    for ntype in graph.ntypes:
-        # 单向图版
-        # out_nids = out_g.nodes[ntype].data[dgl.NID] if ntype in out_g.ntypes else torch.tensor([], dtype=torch.int64)
-        # in_nids = in_g.nodes[ntype].data[dgl.NID] if ntype in in_g.ntypes else torch.tensor([], dtype=torch.int64)
-        # combined = torch.cat([out_nids, in_nids]).unique()
-
-        # 双向图版
-        combined = full_g.nodes[ntype].data[dgl.NID] if ntype in full_g.ntypes else torch.tensor([], dtype=torch.int64)
-        combined = combined.unique()
+    resolved = resolve_seeds(sample_dict, node_map)
+    if resolved is None:
+        return
+    seed_ids, cur_id_map = resolved
+
+    with tracing.span("analyze_connections"):
+        connection_stats = analyze_connections(graph, seed_ids, cur_id_map, csr_graph=csr_graph)
+
+    etypes = traversal_etypes(graph.canonical_etypes, allow_etypes, deny_etypes, allow_ntypes, deny_ntypes)
+    # 在 CSR 数组上按预算逐跳扩展（出边与入边都会展开），预算用完即停止，不再物化整个 k-hop 子图
+    with tracing.span("khop", depth=depth) as span:
+        sampled, truncated = khop_nodes(csr_graph, seed_ids, depth=depth,
+                                        node_budgets=node_budgets, max_nodes=max_nodes, etypes=etypes)
+        span.set(nodes=sum(len(v) for v in sampled.values()), truncated=truncated)
+    if truncated:
+        tracing.event("budget_reached", nodes=sum(len(v) for v in sampled.values()))
+    if max_nodes is not None or node_budgets:
+        # 预算生效时在统计中注明，调用方可据此提示结果被截断
+        connection_stats[("sampling", "budget")] = {
+            "max_nodes": max_nodes, "node_budgets": node_budgets or {},
+            "sampled_nodes": int(sum(len(v) for v in sampled.values())), "truncated": bool(truncated)}
+    all_nodes = {ntype: torch.from_numpy(sampled[ntype]) for ntype in graph.ntypes}
 
-        all_nodes[ntype] = combined
-    
     # 直接从原始图提取包含这些节点的子图
-    print("直接从原始图提取包含这些节点的子图")
+    # graph 也可以是 graph_store.MappedGraph：诱导子图直接由内存映射的 CSR 数组生成
     if not relabel_nodes:
-        full_g = dgl.node_subgraph(graph, all_nodes, relabel_nodes=False)
+        with tracing.span("node_subgraph") as span:
+            full_g = induced_subgraph(graph, all_nodes, relabel_nodes=False, etypes=etypes)
+            span.set(edges=full_g.num_edges())
         return full_g
     
-    full_g = dgl.node_subgraph(graph, all_nodes, relabel_nodes=True, store_ids=True)
+    with tracing.span("node_subgraph") as span:
+        full_g = induced_subgraph(graph, all_nodes, relabel_nodes=True, store_ids=True, etypes=etypes)
+        span.set(nodes=full_g.num_nodes(), edges=full_g.num_edges())
 
     # TODO: 此处暂时使用 relabel_nodes=True 和 ID 重映射的策略，AI 模型中可以去除，直接使用全节点
-    # === 构建新 ID 到原始 ID 的映射 ===
-    print("构建新 ID 到原始 ID 的映射")
-    new2orig = defaultdict(dict)
-    for ntype in full_g.ntypes:
-        orig_ids = full_g.nodes[ntype].data[dgl.NID].tolist()
-        for new_id, orig_id in enumerate(orig_ids):
-            new2orig[ntype][new_id] = orig_id
-
-    # === 构建 full_g 的新 node_map（名字 -> 新 ID） ===
-    print("构建 full_g 的新 node_map（名字 -> 新 ID）")
-    new_node_map = {}
-    for ntype in full_g.ntypes:
-        # 构建 id -> name 的反向映射
-        relevant_ids = set(full_g.nodes[ntype].data[dgl.NID].tolist())
-        id_to_name = {v: k for k, v in node_map[ntype].items() if v in relevant_ids}
-
-        # id_to_name = {v: k for k, v in node_map[ntype].items()}
-
-        orig_ids = full_g.nodes[ntype].data[dgl.NID].tolist()
-        new_node_map[ntype] = {}
-
-        for new_id, orig_id in enumerate(orig_ids):
-            node_name = id_to_name.get(orig_id)
-            if node_name is not None:
-                new_node_map[ntype][node_name] = new_id
+    new2orig, new_node_map = relabel_subgraph(full_g, node_map, id_names)
 
     # new_node_map = {}
     # for ntype in full_g.ntypes:
@@ -271,60 +750,487 @@ def subgraph_by_node(graph, sample_dict, node_map, depth=1,
     
     return full_g, new2orig, new_node_map, connection_stats
 
-def report_subgraph(graph, id_map, save_root='static'):
-    entities = defaultdict(list)
-    for ntype in graph.ntypes:
-        for nid in graph.nodes(ntype).tolist():
-            entities[ntype].append(id_map[ntype][nid])
-    
-    triplets = []
+def seed_groups(seed_ids):
+    """
+    Split the seeds of a query into the groups to connect: one group per
+    node type, or one group per seed when all seeds have the same type.
+    """
+    groups = [{ntype: list(ids)} for ntype, ids in seed_ids.items() if len(ids)]
+    if len(groups) == 1:
+        (ntype, ids), = groups[0].items()
+        groups = [{ntype: [node_id]} for node_id in dict.fromkeys(ids)]
+    return groups
+
+
+def subgraph_between(graph, sample_dict, node_map, csr_graph, max_length=4, slack=0,
+                     max_nodes=None, id_names=None, allow_etypes=None, deny_etypes=None,
+                     allow_ntypes=None, deny_ntypes=None):
+    """
+    Get the subgraph of the paths connecting the seed groups of a query
+    (see seed_groups), instead of the union of their neighbourhoods.
+    Parameters:
+        - graph: The input DGL graph, or a graph_store.MappedGraph.
+        - sample_dict: A dictionary of node names to connect. The keys are node types.
+        - node_map: The node name to ID mapping.
+        - csr_graph: The CSRGraph of `graph`, searched by connecting_paths.
+        - max_length: Longest shortest path searched for between two groups.
+        - slack: Also keep the paths up to `slack` hops longer than the shortest one.
+        - max_nodes: Maximum number of path nodes per pair of groups.
+        - id_names: The per-type name arrays of `node_map` (see build_id_names).
+        - allow_etypes, deny_etypes, allow_ntypes, deny_ntypes: As in
+          subgraph_by_node; only paths over the remaining edge types are searched.
+    Output:
+        - As subgraph_by_node. The subgraph holds the seeds and the nodes and
+          edges on the paths; connection_stats also lists the shortest path
+          length of every pair of groups (None if not connected).
+    """
+    resolved = resolve_seeds(sample_dict, node_map)
+    if resolved is None:
+        return
+    seed_ids, cur_id_map = resolved
+
+    with tracing.span("analyze_connections"):
+        connection_stats = analyze_connections(graph, seed_ids, cur_id_map, csr_graph=csr_graph)
+
+    etypes = traversal_etypes(graph.canonical_etypes, allow_etypes, deny_etypes, allow_ntypes, deny_ntypes)
+    groups = seed_groups(seed_ids)
+    all_nodes = {ntype: [np.asarray(ids, dtype=np.int64)] for ntype, ids in seed_ids.items()}
+    path_edges = {}
+    for i in range(len(groups)):
+        for j in range(i + 1, len(groups)):
+            with tracing.span("connecting_paths", max_length=max_length, slack=slack) as span:
+                nodes, edges, length = connecting_paths(csr_graph, groups[i], groups[j], max_length=max_length,
+                                                        slack=slack, max_nodes=max_nodes, etypes=etypes)
+                span.set(length=length, nodes=sum(len(v) for v in nodes.values()),
+                         edges=sum(len(v) for v in edges.values()))
+            labels = [", ".join(cur_id_map[ntype][node_id] for ntype, ids in group.items() for node_id in ids)
+                      for group in (groups[i], groups[j])]
+            connection_stats[("shortest_path", f"{labels[0]} <-> {labels[1]}")] = length
+            for ntype, ids in nodes.items():
+                all_nodes.setdefault(ntype, []).append(ids)
+            for etype, eids in edges.items():
+                path_edges.setdefault(etype, []).append(eids)
+    all_nodes = {ntype: torch.from_numpy(np.unique(np.concatenate(all_nodes.get(ntype, [np.empty(0, dtype=np.int64)]))))
+                 for ntype in graph.ntypes}
+
+    # 先取路径节点的诱导子图，再只保留路径上的边（节点及其原始 ID 不变）
+    with tracing.span("node_subgraph") as span:
+        full_g = induced_subgraph(graph, all_nodes, relabel_nodes=True, store_ids=True, etypes=etypes)
+        keep_edges = {}
+        for etype in full_g.canonical_etypes:
+            eids = np.unique(np.concatenate(path_edges.get(etype, [np.empty(0, dtype=np.int64)])))
+            mask = np.isin(full_g.edges[etype].data[dgl.EID].numpy(), eids)
+            keep_edges[etype] = torch.from_numpy(np.flatnonzero(mask))
+        full_g = dgl.edge_subgraph(full_g, keep_edges, relabel_nodes=False, store_ids=False)
+        span.set(nodes=full_g.num_nodes(), edges=full_g.num_edges())
+
+    new2orig, new_node_map = relabel_subgraph(full_g, node_map, id_names)
+    return full_g, new2orig, new_node_map, connection_stats
+
+def subgraph_by_ppr(graph, sample_dict, node_map, adjacency, top_n=50, alpha=0.15, iterations=20,
+                    csr_graph=None, id_names=None, allow_etypes=None, deny_etypes=None,
+                    allow_ntypes=None, deny_ntypes=None, top_k_stats=5):
+    """
+    Get the subgraph of the nodes most relevant to the seeds by personalized
+    PageRank, instead of the whole k-hop neighbourhood.
+    Parameters:
+        - graph: The input DGL graph, or a graph_store.MappedGraph.
+        - sample_dict: A dictionary of seed node names. The keys are node types.
+        - node_map: The node name to ID mapping.
+        - adjacency: The csr_graph.CombinedAdjacency of `graph`, built once
+          at load (see load_or_build_combined_adjacency).
+        - top_n: Number of highest scoring nodes kept per node type (an int
+          or {ntype: int}); the seeds are always kept.
+        - alpha: Restart probability of the random walk.
+        - iterations: Maximum number of PageRank iterations.
+        - csr_graph: The CSRGraph of `graph`, for the seed statistics.
+        - id_names: The per-type name arrays of `node_map` (see build_id_names).
+        - allow_etypes, deny_etypes, allow_ntypes, deny_ntypes: As in
+          subgraph_by_node; the walk only follows the remaining edge types.
+        - top_k_stats: Number of top scoring nodes per type listed in the
+          statistics.
+    Output:
+        - As subgraph_by_node. The scores are stored in
+          full_g.ndata["ppr"]; connection_stats also lists the top_k_stats
+          highest scoring non-seed nodes of every type.
+    """
+    resolved = resolve_seeds(sample_dict, node_map)
+    if resolved is None:
+        return
+    seed_ids, cur_id_map = resolved
+
+    with tracing.span("analyze_connections"):
+        connection_stats = analyze_connections(graph, seed_ids, cur_id_map, csr_graph=csr_graph)
+
+    etypes = traversal_etypes(graph.canonical_etypes, allow_etypes, deny_etypes, allow_ntypes, deny_ntypes)
+    with tracing.span("ppr", alpha=alpha, iterations=iterations) as span:
+        scores = personalized_pagerank(adjacency, seed_ids, alpha=alpha, iterations=iterations, etypes=etypes)
+        if allow_ntypes is not None or deny_ntypes:
+            # 不需要的节点类型不进入结果（种子除外）
+            scores = {ntype: values if (allow_ntypes is None or ntype in allow_ntypes)
+                      and ntype not in (deny_ntypes or []) else np.zeros_like(values)
+                      for ntype, values in scores.items()}
+        nodes = top_nodes_per_type(scores, top_n, seeds=seed_ids)
+        span.set(nodes=sum(len(v) for v in nodes.values()))
+    all_nodes = {ntype: torch.from_numpy(nodes[ntype]) for ntype in graph.ntypes}
+
+    with tracing.span("node_subgraph") as span:
+        full_g = induced_subgraph(graph, all_nodes, relabel_nodes=True, store_ids=True, etypes=etypes)
+        span.set(nodes=full_g.num_nodes(), edges=full_g.num_edges())
+
+    new2orig, new_node_map = relabel_subgraph(full_g, node_map, id_names)
+    for ntype in full_g.ntypes:
+        ntype_scores = scores[ntype][new2orig[ntype].numpy()]
+        full_g.nodes[ntype].data["ppr"] = torch.from_numpy(ntype_scores.astype(np.float32))
+        # 统计中列出每种类型得分最高的非种子节点
+        is_seed = np.isin(new2orig[ntype].numpy(), np.asarray(seed_ids.get(ntype, []), dtype=np.int64))
+        order = [i for i in np.argsort(-ntype_scores, kind='stable').tolist() if not is_seed[i]][:top_k_stats]
+        if order:
+            names = id_names[ntype] if id_names is not None else build_id_names({ntype: node_map[ntype]})[ntype]
+            connection_stats[("ppr_top", ntype)] = {
+                str(names[int(new2orig[ntype][i])]): round(float(ntype_scores[i]), 6) for i in order}
+    return full_g, new2orig, new_node_map, connection_stats
+
+
+def estimate_nbytes(obj):
+    """
+    Rough size in bytes of a query result: tensors, arrays, DGL graphs and
+    the containers and strings holding them.
+    """
+    if isinstance(obj, torch.Tensor):
+        return obj.element_size() * obj.numel()
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, dgl.DGLGraph):
+        size = 2 * 8 * obj.num_edges()
+        for ntype in obj.ntypes:
+            size += sum(estimate_nbytes(v) for v in obj.nodes[ntype].data.values())
+        for etype in obj.canonical_etypes:
+            size += sum(estimate_nbytes(v) for v in obj.edges[etype].data.values())
+        return size
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(estimate_nbytes(k) + estimate_nbytes(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set)):
+        return sys.getsizeof(obj) + sum(estimate_nbytes(v) for v in obj)
+    if isinstance(obj, SubgraphRenderer):
+        return obj.nbytes()
+    return sys.getsizeof(obj)
+
+
+class QueryCache:
+    """
+    Bounded LRU cache of subgraph query results, evicting by entry count and
+    by estimated size. A SubgraphRenderer in a cached value reports its own
+    growth, so its entry is re-sized (and may evict others) after put.
+    Safe to share between concurrent requests.
+    """
+
+    def __init__(self, max_entries=64, max_bytes=1 << 30):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (value, nbytes)
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(sample_dict, depth, **options):
+        """
+        Normalize a query: sorted, de-duplicated seeds per node type, the
+        depth and any other sampling options.
+        """
+        seeds = tuple(sorted((ntype, tuple(sorted(set(names))))
+                             for ntype, names in sample_dict.items() if names))
+        return seeds, depth, tuple(sorted(options.items()))
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key, value):
+        nbytes = estimate_nbytes(value)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._nbytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, nbytes)
+            self._nbytes += nbytes
+            self._evict()
+        # renderer 在首次显示后才生成节点记录、JSON 片段与布局，增长时回调更新条目大小
+        for item in (value if isinstance(value, tuple) else (value,)):
+            if isinstance(item, SubgraphRenderer):
+                item.on_resize = functools.partial(self._resize, key, value)
+
+    def _resize(self, key, value, delta):
+        with self._lock:
+            # 条目已被淘汰或替换时忽略
+            if key not in self._entries or self._entries[key][0] is not value:
+                return
+            self._entries[key] = (value, self._entries[key][1] + delta)
+            self._nbytes += delta
+            self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries or self._nbytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._nbytes -= evicted
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._nbytes,
+                    "hits": self.hits, "misses": self.misses}
+
+
+def subgraph_name_arrays(graph, id_map):
+    """
+    Node names of every node type as object arrays indexed by node ID, so
+    names of many edges can be gathered with one fancy-indexing lookup.
+    """
+    return {ntype: np.array([id_map[ntype][nid] for nid in range(graph.num_nodes(ntype))], dtype=object)
+            for ntype in graph.ntypes}
+
+
+def iter_triple_chunks(graph, id_names, chunk_edges=1 << 18):
+    """
+    Yield the "src\trelation\tdst\n" lines of all edges as text chunks of at
+    most chunk_edges lines, gathering names per etype with array lookups.
+    """
     for etype in graph.canonical_etypes:
         src_type, relation, dst_type = etype
         src_ids, dst_ids = graph.edges(etype=etype)
-        
-        # 将每条边作为三元组加入列表
-        for src, dst in zip(src_ids.tolist(), dst_ids.tolist()):
-            src = id_map[src_type][src]
-            dst = id_map[dst_type][dst]
-            triplets.append((src, relation, dst))
+        src_ids, dst_ids = src_ids.numpy(), dst_ids.numpy()
+        for start in range(0, len(src_ids), chunk_edges):
+            src = id_names[src_type][src_ids[start:start + chunk_edges]]
+            dst = id_names[dst_type][dst_ids[start:start + chunk_edges]]
+            yield "".join((src + f"\t{relation}\t" + dst + "\n").tolist())
 
-    print(f"Total triplets: {len(triplets)}")
+
+def write_triples(graph, id_names, f, chunk_edges=1 << 18):
+    """Stream the triples TSV into the binary file object f."""
+    for chunk in iter_triple_chunks(graph, id_names, chunk_edges):
+        f.write(chunk.encode('utf-8'))
+
+
+def write_binary_export(graph, id_names, open_entry):
+    """
+    Write the subgraph as typed arrays plus name tables, opening every file
+    with open_entry(name) (a writable binary file context manager):
+        - meta.json: node counts, node types and canonical etypes.
+        - {i}_src.npy / {i}_dst.npy: edge endpoint IDs of the i-th etype.
+        - {ntype}.strings / .offsets.npy / .order.npy: node names in the
+          NameTable format, so the folder opens with load_name_tables.
+    """
+    num_nodes = {ntype: graph.num_nodes(ntype) for ntype in graph.ntypes}
+    id_dtype = np.int32 if max(num_nodes.values(), default=0) < 2 ** 31 else np.int64
+    meta = {"ntypes": list(graph.ntypes), "num_nodes": num_nodes,
+            "canonical_etypes": [list(etype) for etype in graph.canonical_etypes]}
+    with open_entry("meta.json") as f:
+        f.write(json.dumps(meta).encode('utf-8'))
+    for i, etype in enumerate(graph.canonical_etypes):
+        src_ids, dst_ids = graph.edges(etype=etype)
+        for name, ids in ((f"{i}_src.npy", src_ids), (f"{i}_dst.npy", dst_ids)):
+            with open_entry(name) as f:
+                np.lib.format.write_array(f, ids.numpy().astype(id_dtype))
+    for ntype in graph.ntypes:
+        strings, offsets = encode_names(id_names[ntype].tolist())
+        order = np.argsort(np.array([name.encode('utf-8') for name in id_names[ntype].tolist()], dtype=object),
+                           kind='stable').astype(np.int64)
+        with open_entry(f"{ntype}.strings") as f:
+            f.write(strings)
+        for name, array in ((f"{ntype}.offsets.npy", offsets), (f"{ntype}.order.npy", order)):
+            with open_entry(name) as f:
+                np.lib.format.write_array(f, array)
+
+
+def export_subgraph_zip(graph, id_map, zip_path, extra_files=None, binary=True, chunk_edges=1 << 18):
+    """
+    Export a subgraph into one zip file without holding all triples in memory.
+    Parameters:
+        - graph: The subgraph to export.
+        - id_map: The ID to node name mapping of the subgraph.
+        - zip_path: Path of the zip file to write.
+        - extra_files: A dictionary of additional {arcname: text} entries.
+        - binary: Also write the typed ID arrays and name tables under binary/
+          (see write_binary_export).
+        - chunk_edges: Number of triples gathered and written at once.
+    Output:
+        - zip_path: Path of the written zip file.
+    """
+    id_names = subgraph_name_arrays(graph, id_map)
+    with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED) as zipf:
+        with zipf.open('triples.txt', 'w', force_zip64=True) as f:
+            write_triples(graph, id_names, f, chunk_edges)
+        zipf.writestr('entities.json', json.dumps({ntype: names.tolist() for ntype, names in id_names.items()}))
+        for arcname, content in (extra_files or {}).items():
+            zipf.writestr(arcname, content)
+        if binary:
+            write_binary_export(graph, id_names,
+                                lambda name: zipf.open(f"binary/{name}", 'w', force_zip64=True))
+    return zip_path
+
+
+def report_subgraph(graph, id_map, save_root='static', return_triplets=True):
+    """
+    List the entities and triples of a subgraph and save them to save_root
+    (entities.json and triples.txt). The triples file is streamed; pass
+    return_triplets=False to skip building the in-memory triplet list.
+    """
+    id_names = subgraph_name_arrays(graph, id_map)
+    entities = defaultdict(list, {ntype: names.tolist() for ntype, names in id_names.items()})
+
+    triplets = None
+    if return_triplets:
+        triplets = []
+        for etype in graph.canonical_etypes:
+            src_type, relation, dst_type = etype
+            src_ids, dst_ids = graph.edges(etype=etype)
+            # 将每条边作为三元组加入列表
+            src = id_names[src_type][src_ids.numpy()].tolist()
+            dst = id_names[dst_type][dst_ids.numpy()].tolist()
+            triplets.extend(zip(src, [relation] * len(src), dst))
+
+    print(f"Total triplets: {graph.num_edges()}")
 
     if save_root:
         os.makedirs(save_root, exist_ok=True)
         with open(os.path.join(save_root, "entities.json"), "w") as f:
             json.dump(entities, f)
-        with open(os.path.join(save_root, "triples.txt"), "w") as f:
-            for triplet in triplets:
-                f.write(f"{triplet[0]}\t{triplet[1]}\t{triplet[2]}\n")
+        with open(os.path.join(save_root, "triples.txt"), "wb") as f:
+            write_triples(graph, id_names, f)
     return entities, triplets
-    
 
 
-def convert_subgraph_to_networkx(sub_g, id_map,
-                                 display_limits, must_show,
-                                 remove_self_loop=True):
-    # 筛选各类型中需要显示的节点
-    displayed_nodes = {}
+def seed_connectivity(sub_g, highlight_nodes, max_hops=8):
+    """
+    Measure how closely every node of the subgraph is tied to the seed nodes,
+    treating edges as undirected.
+    Output (dictionaries of arrays per node type):
+        - hops: Hop distance to the nearest seed (max_hops + 1 if unreachable).
+        - seed_edges: Number of edges to seed nodes.
+        - degrees: Total number of edges.
+    """
+    num_nodes = {ntype: sub_g.number_of_nodes(ntype) for ntype in sub_g.ntypes}
+    is_seed = {ntype: np.zeros(n, dtype=bool) for ntype, n in num_nodes.items()}
+    for ntype, nids in highlight_nodes.items():
+        is_seed[ntype][list(nids)] = True
+    edges = []
+    for src_type, rel, dst_type in sub_g.canonical_etypes:
+        src, dst = sub_g.edges(etype=(src_type, rel, dst_type))
+        edges.append((src_type, dst_type, src.numpy(), dst.numpy()))
+        edges.append((dst_type, src_type, dst.numpy(), src.numpy()))
+
+    seed_edges = {ntype: np.zeros(n, dtype=np.int64) for ntype, n in num_nodes.items()}
+    degrees = {ntype: np.zeros(n, dtype=np.int64) for ntype, n in num_nodes.items()}
+    for from_type, to_type, u, v in edges:
+        degrees[to_type] += np.bincount(v, minlength=num_nodes[to_type])
+        seed_edges[to_type] += np.bincount(v[is_seed[from_type][u]], minlength=num_nodes[to_type])
+
+    # 多源 BFS：每一跳对所有边类型做一次向量化扩展
+    hops = {ntype: np.where(mask, 0, max_hops + 1) for ntype, mask in is_seed.items()}
+    frontier = is_seed
+    for hop in range(1, max_hops + 1):
+        reached = {ntype: np.zeros(n, dtype=bool) for ntype, n in num_nodes.items()}
+        for from_type, to_type, u, v in edges:
+            reached[to_type][v[frontier[from_type][u]]] = True
+        frontier = {ntype: mask & (hops[ntype] > max_hops) for ntype, mask in reached.items()}
+        if not any(mask.any() for mask in frontier.values()):
+            break
+        for ntype, mask in frontier.items():
+            hops[ntype][mask] = hop
+    return hops, seed_edges, degrees
+
+
+def find_must_show_nodes(sub_g, id_map, must_show):
+    """
+    Return the IDs of the must-show nodes (matched by name) per node type.
+    """
     highlight_nodes = {}
     for ntype in sub_g.ntypes:
         num_nodes = sub_g.number_of_nodes(ntype)
-        all_node_ids = list(range(num_nodes))
-        # 先筛选必须显示的节点（通过名称匹配）
-        must_nodes = [nid for nid in all_node_ids 
-                      if id_map.get(ntype, {}).get(nid, None) in must_show.get(ntype, [])]
-        selected = set(must_nodes)
-        highlight_nodes[ntype] = must_nodes
+        must_names = set(must_show.get(ntype, []))
+        highlight_nodes[ntype] = {nid for nid, name in id_map.get(ntype, {}).items()
+                                  if name in must_names and 0 <= nid < num_nodes} if must_names else set()
+    return highlight_nodes
+
+
+def rank_display_nodes(sub_g, highlight_nodes, selection):
+    """
+    Order the nodes of each type for select_display_nodes. Returns None for
+    the "first" selection, i.e. ascending node IDs.
+    """
+    if selection == "first":
+        return None
+    hops, seed_edges, degrees = seed_connectivity(sub_g, highlight_nodes)
+    ranking = {}
+    for ntype in sub_g.ntypes:
+        node_ids = np.arange(sub_g.number_of_nodes(ntype))
+        if selection == "seed_edges":
+            keys = (node_ids, -degrees[ntype], -seed_edges[ntype])
+        else:
+            keys = (node_ids, -degrees[ntype], -seed_edges[ntype], hops[ntype])
+        ranking[ntype] = np.lexsort(keys)
+    return ranking
+
+
+def fill_display_nodes(sub_g, highlight_nodes, display_limits, ranking=None):
+    """
+    Add nodes on top of the must-show nodes, in ranking order, until each
+    type's display limit is reached. Returns sorted node ID lists per type.
+    """
+    displayed_nodes = {}
+    for ntype in sub_g.ntypes:
+        num_nodes = sub_g.number_of_nodes(ntype)
         limit = display_limits.get(ntype, -1)
         # 如果有数量限制，则在必须显示的基础上补足其它节点，直到达到限制
         if limit != -1:
-            for nid in all_node_ids:
+            candidates = ranking[ntype].tolist() if ranking is not None else range(num_nodes)
+            selected = set(highlight_nodes[ntype])
+            for nid in candidates:
                 if len(selected) >= limit:
                     break
                 selected.add(nid)
+            displayed_nodes[ntype] = sorted(selected)
         else:
-            selected = set(all_node_ids)
-        displayed_nodes[ntype] = selected
+            displayed_nodes[ntype] = list(range(num_nodes))
+    return displayed_nodes
+
+
+def select_display_nodes(sub_g, id_map, display_limits, must_show, selection="first"):
+    """
+    Pick the nodes of each type to display.
+    Parameters:
+        - selection: How nodes are added on top of the must-show nodes when a
+          limit is set. "first" takes the lowest node IDs; "seed_edges" takes
+          the nodes with the most edges to the must-show nodes; "hop" takes
+          the nodes closest to the must-show nodes, ties broken by edges to
+          them and then by degree.
+    Output:
+        - displayed_nodes: A dictionary of sorted node ID lists per node type.
+        - highlight_nodes: A dictionary of the must-show node ID sets per node type.
+    """
+    # 先筛选必须显示的节点（通过名称匹配）
+    highlight_nodes = find_must_show_nodes(sub_g, id_map, must_show)
+    ranking = None
+    if any(display_limits.get(ntype, -1) != -1 for ntype in sub_g.ntypes):
+        ranking = rank_display_nodes(sub_g, highlight_nodes, selection)
+    displayed_nodes = fill_display_nodes(sub_g, highlight_nodes, display_limits, ranking)
+    return displayed_nodes, highlight_nodes
+
+
+def convert_subgraph_to_networkx(sub_g, id_map,
+                                 display_limits, must_show,
+                                 remove_self_loop=True, selection="first"):
+    # 筛选各类型中需要显示的节点
+    displayed_nodes, highlight_nodes = select_display_nodes(sub_g, id_map, display_limits, must_show,
+                                                            selection)
+    displayed_sets = {ntype: set(node_ids) for ntype, node_ids in displayed_nodes.items()}
 
     # 构造 NetworkX 图（节点标识符采用 "类型_编号" 格式，确保唯一性）
     G = nx.Graph()
@@ -341,11 +1247,11 @@ def convert_subgraph_to_networkx(sub_g, id_map,
     for canonical_etype in sub_g.canonical_etypes:
         src_type, etype, dst_type = canonical_etype
         # 获取当前边类型的边列表
-        src, dst = sub_g.edges(etype=etype)
+        src, dst = sub_g.edges(etype=canonical_etype)
         src = src.tolist()
         dst = dst.tolist()
         for u, v in zip(src, dst):
-            if u in displayed_nodes[src_type] and v in displayed_nodes[dst_type]:
+            if u in displayed_sets[src_type] and v in displayed_sets[dst_type]:
                 src_node = f"{src_type}_{u}"
                 dst_node = f"{dst_type}_{v}"
                 G.add_edge(src_node, dst_node, title=etype)
@@ -377,106 +1283,109 @@ def repair_smpdb_name(pathway_dict):
 
 
 # === Generate HTML with ECharts ===
-def generate_echarts_html(echarts_data):
-    data = json.loads(echarts_data)
+# 随仓库提供的 ECharts 6.0.0，页面不再依赖 CDN
+ECHARTS_BUNDLE_PATH = "static/vendor/echarts.min.js"
+
 
+@functools.lru_cache(maxsize=8)
+def read_script(script_path):
+    with open(script_path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def generate_echarts_html(echarts_data, script_path="static/echarts_graph.js", bundle_path=ECHARTS_BUNDLE_PATH):
+    """
+    Build a self-contained ECharts page with the graph data and the ECharts
+    bundle inlined. The chart itself is drawn by renderUniBioMapGraph from
+    script_path, the same script used by static/graph_viewer.html.
+    """
     html_code = f"""
     <div id=\"main\" style=\"width:100%;height:100%;\"></div>
-    <script src=\"https://cdn.jsdelivr.net/npm/echarts/dist/echarts.min.js\"></script>
     <script>
-        var chartDom = document.getElementById('main');
-        var myChart = echarts.init(chartDom);
-        var option = {{
-            tooltip: {{
-                formatter: function (params) {{
-                    if (params.data.type == "edge") {{
-                        // 这是边
-                        var source_show = params.data?.source_show;
-                        var target_show = params.data?.target_show;
-                        var source_group = params.data?.source_group;
-                        var target_group = params.data?.target_group;
-                        return `<div style="max-width:400px;">
-                                    <div style="font-weight:bold;">
-                                        <span style="color:#999; font-size:12px;">
-                                            ${{source_group + ' -- ' + target_group}}
-                                        </span>
-                                        <br>
-                                        ${{source_show + ' -- ' + target_show}}
-                                    </div>
-                                </div>`;
-                    }}
-
-                    var color = params.color || '#000';
-                    var name = params.data.tooltip_name || params.data.name;
-                    var desc = params.data.tooltip_desc || params.data.value;
-                    return `<div>
-                                <div style="display:flex;align-items:center;">
-                                    <span style="display:inline-block;width:10px;height:10px;
-                                                border-radius:5px;background:${{color}};margin-right:6px;"></span>
-                                    <span style="font-weight:bold;
-                                        max-width: 350px;
-                                        white-space: nowrap;
-                                        overflow: hidden;
-                                        text-overflow: ellipsis;
-                                        display: inline-block;">
-                                        ${{name}}
-                                    </span>
-                                </div>
-                                <div style="margin-left:16px; max-width:350px;
-                                    white-space:normal; word-wrap:break-word;
-                                    overflow:hidden; text-overflow:ellipsis;
-                                    display:-webkit-box; -webkit-line-clamp:10; -webkit-box-orient:vertical;">
-                                    ${{desc}}
-                                </div>
-                            </div>`;
-                }}
-            }},
-            legend: [{{
-                data: {json.dumps([cat['name'] for cat in data['categories']])},
-
-            }}],
-            series: [{{
-                type: 'graph',
-                layout: 'force',
-                roam: true,
-                label: {{
-                    show: true,
-                    position: 'right',
-                    formatter: function (params) {{
-                        return params.data.value || params.data.name; // 自定义显示字段
-                    }}
-                }},
-                edgeSymbol: ['none', 'none'],
-                data: {json.dumps(data['nodes'])},
-                links: {json.dumps(data['links'])},
-                categories: {json.dumps(data['categories'])},
-                force: {{
-                    repulsion: 800,
-                    edgeLength: 120
-                }},
-                emphasis: {{
-                    focus: 'adjacency',
-                    label: {{ show: true }}
-                }}
-            }}]
-        }};
-        myChart.setOption(option);
-
-        myChart.on('click', function (params) {{
-            if (params.data && params.data.url) {{
-                window.open(params.data.url, '_blank');
-            }}
-        }});
-        // ✅ 添加响应式图表大小
-        window.addEventListener('resize', function () {{
-            myChart.resize();
-            myChart.setOption(option);  // 强制触发重新布局
-        }});
-        
+{read_script(bundle_path)}
+    </script>
+    <script>
+{read_script(script_path)}
+    </script>
+    <script>
+        renderUniBioMapGraph(document.getElementById('main'), {echarts_data});
     </script>
     """
     return html_code
 
+
+def write_render_payload(echarts_data, save_dir, max_files=512, compress=False):
+    """
+    Write the ECharts data of one render to save_dir under a content hash, so
+    identical renders share one file the browser can cache. With compress the
+    file is gzipped (.json.gz) and inflated by the viewer. Only the newest
+    max_files payloads are kept. Returns the path of the payload file.
+    """
+    os.makedirs(save_dir, exist_ok=True)
+    payload = echarts_data.encode('utf-8')
+    suffix = ".json"
+    if compress:
+        # mtime=0 使相同内容得到相同的压缩文件
+        payload = gzip.compress(payload, compresslevel=6, mtime=0)
+        suffix = ".json.gz"
+    path = os.path.join(save_dir, hashlib.sha1(payload).hexdigest() + suffix)
+    if not os.path.exists(path):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+        payloads = []
+        for entry in os.scandir(save_dir):
+            try:
+                if entry.name.endswith((".json", ".json.gz")):
+                    payloads.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                continue
+        for _, old_path in sorted(payloads)[:-max_files]:
+            try:
+                os.remove(old_path)
+            except FileNotFoundError:
+                pass
+    else:
+        os.utime(path)
+    return path
+
+_scratch_lock = threading.Lock()
+_scratch_last_cleanup = [0.0]
+
+
+def cleanup_scratch_dirs(root, ttl_seconds=3600):
+    """
+    Remove the scratch directories under root that were not modified for
+    ttl_seconds.
+    """
+    if not os.path.isdir(root):
+        return
+    cutoff = time.time() - ttl_seconds
+    for entry in os.scandir(root):
+        try:
+            if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        except FileNotFoundError:
+            continue
+
+
+def make_scratch_dir(root, ttl_seconds=3600, cleanup_interval=60):
+    """
+    Create a private scratch directory for one request under root. Expired
+    directories are cleaned up at most once every cleanup_interval seconds.
+    """
+    now = time.time()
+    with _scratch_lock:
+        cleanup = now - _scratch_last_cleanup[0] >= cleanup_interval
+        if cleanup:
+            _scratch_last_cleanup[0] = now
+    if cleanup:
+        cleanup_scratch_dirs(root, ttl_seconds)
+    os.makedirs(root, exist_ok=True)
+    return tempfile.mkdtemp(prefix=time.strftime("%Y%m%d-%H%M%S-"), dir=root)
+
+
 def get_url_by_id(id, group):
     base_url = "https://identifiers.org/"
     if group == "protein":
@@ -504,6 +1413,17 @@ def fetch_compound_img(uci):
     img_url = f"{base_url}/{uci}"
     return img_url
 
+def lookup_descs(desc_source, ntype, ids):
+    """
+    Batched description lookup. Works with the desc_dict of load_desc and
+    with any store offering get_many(ntype, ids), such as desc_store.DescStore.
+    Returns {id: record} for the IDs that exist.
+    """
+    if hasattr(desc_source, "get_many"):
+        return desc_source.get_many(ntype, ids)
+    type_dict = desc_source.get(ntype, {})
+    return {nid: type_dict[nid] for nid in ids if nid in type_dict}
+
 def fetch_desc_info(nid, ntype, desc_dict):
 
     url = get_url_by_id(nid, ntype) if ntype!='other' else None
@@ -552,6 +1472,45 @@ def fetch_desc_info(nid, ntype, desc_dict):
     #     nname = 
 
 
+def _symbol_scale(degrees, base_size=12, max_ratio=2.5):
+    """
+    Return the function mapping a node degree to its ECharts symbol size.
+    """
+    min_deg = min(degrees) or 1
+    max_deg = max(degrees)
+
+    def scale(deg):
+        if max_deg == min_deg:
+            return base_size
+        norm = (deg - min_deg) / (max_deg - min_deg)
+        return base_size + norm * base_size * (max_ratio - 1)
+    return scale
+
+
+def make_echarts_node(label, node_key, group, is_highlight, symbol_size, desc_dict):
+    """
+    Build the ECharts record of one node.
+    """
+    node_desc = fetch_desc_info(label, group, desc_dict)
+    node_desc["type"] = "node"
+    node_desc['name'] = node_key
+    # node_desc['symbolSize'] = scale(deg)
+    node_desc['label'] = {
+        "show": True,
+        "position": "right",
+        "fontWeight": "bold" if is_highlight else "normal",  # 高亮节点加粗
+        "fontSize": 14 if is_highlight else 12,  # 高亮节点增大字体
+        # "backgroundColor": "rgba(242, 191, 203, 0.7)" if is_highlight else None  # 可选：为高亮节点的标签添加背景色
+    }
+    node_desc['symbolSize'] = symbol_size * (1.3 if is_highlight else 1)  # 高亮节点放大
+    # node_desc['itemStyle'] = {"color": "#ff0000"} if is_highlight else None  # 高亮节点颜色
+    return node_desc
+
+
+def make_echarts_categories(color_map):
+    return [{"name": cat, "itemStyle": {"color": color_map.get(cat, '#ccc')}} for cat in color_map]
+
+
 # === Convert NX Graph to ECharts JSON ===
 def nx_to_echarts_json(G, color_map, desc_dict,
                        base_size=12, max_ratio=2.5):
@@ -559,38 +1518,14 @@ def nx_to_echarts_json(G, color_map, desc_dict,
     links = []
 
     degrees = dict(G.degree())
-    min_deg = min(degrees.values()) or 1
-    max_deg = max(degrees.values())
+    scale = _symbol_scale(list(degrees.values()), base_size, max_ratio)
 
-    def scale(deg):
-        if max_deg == min_deg:
-            return base_size
-        norm = (deg - min_deg) / (max_deg - min_deg)
-        return base_size + norm * base_size * (max_ratio - 1)
-    
     for node in G.nodes(data=True):
         label = node[1].get("label", node[0])
-        id = node[0]
         deg = degrees[node[0]]
         group = node[1].get("group", "other")
         is_highlight = node[1].get("highlight", False)  # 获取 highlight 属性
-
-        node_desc = fetch_desc_info(label, group, desc_dict)
-        node_desc["type"] = "node"
-        node_desc['name'] = id
-        # node_desc['symbolSize'] = scale(deg)
-        node_desc['label'] = {
-            "show": True,
-            "position": "right",
-            "fontWeight": "bold" if is_highlight else "normal",  # 高亮节点加粗
-            "fontSize": 14 if is_highlight else 12,  # 高亮节点增大字体
-            # "backgroundColor": "rgba(242, 191, 203, 0.7)" if is_highlight else None  # 可选：为高亮节点的标签添加背景色
-        }
-        node_desc['symbolSize'] = scale(deg) * (1.3 if is_highlight else 1)  # 高亮节点放大
-        # node_desc['itemStyle'] = {"color": "#ff0000"} if is_highlight else None  # 高亮节点颜色
-        nodes.append(node_desc)
-
-        # node[1]['ident'] = node_desc['name']
+        nodes.append(make_echarts_node(label, node[0], group, is_highlight, scale(deg), desc_dict))
 
     for edge in G.edges():
         source_label = edge[0] # use node id
@@ -608,7 +1543,302 @@ def nx_to_echarts_json(G, color_map, desc_dict,
             "source_group": source_group,
             "target_group": target_group,
         })
-        # print(links)
-    categories = [{"name": cat, "itemStyle": {"color": color_map.get(cat, '#ccc')}} for cat in color_map]
+    categories = make_echarts_categories(color_map)
     return json.dumps({"nodes": nodes, "links": links, "categories": categories}, ensure_ascii=False)
 
+
+class SubgraphRenderer:
+    """
+    Render cache of one queried subgraph.
+    Everything that does not depend on the display limits is computed once:
+    the must-show nodes, the node rankings, the de-duplicated undirected edge
+    list in NetworkX iteration order, and the records / JSON fragments of
+    every node and link (built on first display). A display change then only
+    computes the visible mask, the degrees and the JSON of the selected slice,
+    either as ECharts JSON (to_echarts_json) or in the columnar form
+    (to_compact_json). Server-side layouts are cached per visible node set.
+    """
+
+    def __init__(self, sub_g, id_map, must_show, desc_dict, remove_self_loop=True):
+        self.sub_g = sub_g
+        self.desc_dict = desc_dict
+        self.highlight_nodes = find_must_show_nodes(sub_g, id_map, must_show)
+        self._rankings = {}
+        # 首次显示后才生成的缓存（节点记录、JSON 片段、排序、布局）的大小；
+        # on_resize(delta) 由 QueryCache 设置，用于同步缓存中的条目大小
+        self._grown_nbytes = 0
+        self.on_resize = None
+
+        # 全局编号：按节点类型顺序、类型内按编号递增，与显示顺序一致
+        self.offsets = {}
+        self.node_keys, self.labels, self.groups, self.highlights = [], [], [], []
+        offset = 0
+        for ntype in sub_g.ntypes:
+            num_nodes = sub_g.number_of_nodes(ntype)
+            self.offsets[ntype] = offset
+            offset += num_nodes
+            type_names = id_map.get(ntype, {})
+            highlight = self.highlight_nodes[ntype]
+            for nid in range(num_nodes):
+                self.node_keys.append(f"{ntype}_{nid}")
+                self.labels.append(type_names.get(nid, f"{ntype}_{nid}"))
+                self.groups.append(ntype)
+                self.highlights.append(nid in highlight)
+        self.num_nodes = offset
+
+        src_parts, dst_parts = [], []
+        for src_type, rel, dst_type in sub_g.canonical_etypes:
+            src, dst = sub_g.edges(etype=(src_type, rel, dst_type))
+            src_parts.append(src.numpy() + self.offsets[src_type])
+            dst_parts.append(dst.numpy() + self.offsets[dst_type])
+        src_idx = np.concatenate(src_parts) if src_parts else np.empty(0, dtype=np.int64)
+        dst_idx = np.concatenate(dst_parts) if dst_parts else np.empty(0, dtype=np.int64)
+
+        # 无向去重：保留每对节点第一次出现的边，并按 (较早节点, 首次出现顺序) 排序，
+        # 即 NetworkX 遍历边的顺序；任意显示子集上的顺序都与之一致
+        lo = np.minimum(src_idx, dst_idx)
+        hi = np.maximum(src_idx, dst_idx)
+        _, first = np.unique(lo * max(self.num_nodes, 1) + hi, return_index=True)
+        first = np.sort(first)
+        lo, hi = lo[first], hi[first]
+        if remove_self_loop:
+            keep = lo != hi
+            lo, hi = lo[keep], hi[keep]
+        order = np.lexsort((np.arange(len(lo)), lo))
+        self.edge_lo, self.edge_hi = lo[order], hi[order]
+
+        self._node_records = [None] * self.num_nodes
+        self._node_fragments = [None] * self.num_nodes
+        self._link_fragments = [None] * len(self.edge_lo)
+        self._layouts = OrderedDict()  # 可见节点集合的哈希 -> 坐标
+        # renderer 随查询缓存在多个会话间共享，上面这些按需填充的缓存都在此锁下写入
+        self._lock = threading.Lock()
+
+    def __deepcopy__(self, memo):
+        # 共享对象：gr.State 等深拷贝时不复制子图、缓存和锁
+        return self
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["on_resize"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def nbytes(self):
+        return (estimate_nbytes(self.node_keys) + estimate_nbytes(self.labels)
+                + self.edge_lo.nbytes + self.edge_hi.nbytes + self._grown_nbytes)
+
+    def _grew(self, delta):
+        # 回调在锁外执行，避免与 QueryCache 的锁嵌套
+        if delta:
+            with self._lock:
+                self._grown_nbytes += delta
+            if self.on_resize is not None:
+                self.on_resize(delta)
+
+    def ranking(self, selection):
+        ranking = self._rankings.get(selection)
+        if ranking is None and selection not in self._rankings:
+            ranking = rank_display_nodes(self.sub_g, self.highlight_nodes, selection)
+            with self._lock:
+                if selection in self._rankings:
+                    return self._rankings[selection]
+                self._rankings[selection] = ranking
+            self._grew(estimate_nbytes(ranking))
+        return ranking
+
+    def visible_mask(self, display_limits, selection="first"):
+        ranking = None
+        if any(display_limits.get(ntype, -1) != -1 for ntype in self.sub_g.ntypes):
+            ranking = self.ranking(selection)
+        displayed_nodes = fill_display_nodes(self.sub_g, self.highlight_nodes, display_limits, ranking)
+        visible = np.zeros(self.num_nodes, dtype=bool)
+        for ntype, node_ids in displayed_nodes.items():
+            visible[np.asarray(node_ids, dtype=np.int64) + self.offsets[ntype]] = True
+        return visible
+
+    def _build_node_records(self, indices):
+        # 除 symbolSize 外的节点记录，描述信息按类型批量查询
+        by_type = defaultdict(list)
+        for i in indices:
+            if self._node_records[i] is None:
+                by_type[self.groups[i]].append(i)
+        for ntype, type_indices in by_type.items():
+            # 描述查询在锁外进行；并发请求可能重复构建同一记录，只保留先写入的一份
+            descs = {ntype: lookup_descs(self.desc_dict, ntype, [self.labels[i] for i in type_indices])}
+            records = {}
+            for i in type_indices:
+                record = make_echarts_node(self.labels[i], self.node_keys[i], self.groups[i],
+                                           self.highlights[i], 0, descs)
+                del record['symbolSize']
+                records[i] = record
+            delta = 0
+            with self._lock:
+                for i, record in records.items():
+                    if self._node_records[i] is None:
+                        self._node_records[i] = record
+                        delta += estimate_nbytes(record)
+            self._grew(delta)
+
+    def _node_fragments_of(self, indices):
+        # 节点 JSON 去掉结尾的 "}" 以便追加 symbolSize
+        delta = 0
+        with self._lock:
+            for i in indices:
+                if self._node_fragments[i] is None:
+                    self._node_fragments[i] = json.dumps(self._node_records[i], ensure_ascii=False)[:-1]
+                    delta += sys.getsizeof(self._node_fragments[i])
+            fragments = [self._node_fragments[i] for i in indices]
+        self._grew(delta)
+        return fragments
+
+    def _link_fragments_of(self, edges):
+        delta = 0
+        with self._lock:
+            for k in edges:
+                if self._link_fragments[k] is None:
+                    u, v = int(self.edge_lo[k]), int(self.edge_hi[k])
+                    self._link_fragments[k] = json.dumps({
+                        "type": "edge",
+                        "source": self.node_keys[u],
+                        "target": self.node_keys[v],
+                        "source_show": self.labels[u],
+                        "target_show": self.labels[v],
+                        "source_group": self.groups[u],
+                        "target_group": self.groups[v],
+                    }, ensure_ascii=False)
+                    delta += sys.getsizeof(self._link_fragments[k])
+            fragments = [self._link_fragments[k] for k in edges]
+        self._grew(delta)
+        return fragments
+
+    def _visible_slice(self, display_limits, selection, base_size, max_ratio):
+        # 可见节点、可见边与节点大小
+        visible = self.visible_mask(display_limits, selection)
+        nodes = np.flatnonzero(visible)
+        edges = np.flatnonzero(visible[self.edge_lo] & visible[self.edge_hi])
+
+        degrees = (np.bincount(self.edge_lo[edges], minlength=self.num_nodes)
+                   + np.bincount(self.edge_hi[edges], minlength=self.num_nodes))[nodes].tolist()
+        scale = _symbol_scale(degrees, base_size, max_ratio)
+        sizes = [scale(deg) * (1.3 if self.highlights[i] else 1)
+                 for i, deg in zip(nodes.tolist(), degrees)]
+        self._build_node_records(nodes.tolist())
+        return nodes, edges, sizes
+
+    def layout_positions(self, nodes, edges, max_layouts=8):
+        """
+        Server-side layout of the visible nodes, an (len(nodes), 2) array of
+        coordinates in [0, 1000]. Layouts are cached per visible node set.
+        """
+        key = hashlib.sha1(np.ascontiguousarray(nodes).tobytes()).hexdigest()
+        with self._lock:
+            if key in self._layouts:
+                self._layouts.move_to_end(key)
+                return self._layouts[key]
+        with tracing.span("layout", nodes=len(nodes), edges=len(edges)):
+            position = np.full(self.num_nodes, -1, dtype=np.int64)
+            position[nodes] = np.arange(len(nodes))
+            positions = force_layout(len(nodes), position[self.edge_lo[edges]], position[self.edge_hi[edges]])
+            positions = np.round(positions * 1000, 1)
+        with self._lock:
+            delta = positions.nbytes - (self._layouts[key].nbytes if key in self._layouts else 0)
+            self._layouts[key] = positions
+            while len(self._layouts) > max_layouts:
+                delta -= self._layouts.popitem(last=False)[1].nbytes
+        self._grew(delta)
+        return positions
+
+    @staticmethod
+    def use_fixed_layout(layout, num_visible, auto_layout_nodes=1000):
+        """
+        layout: "force" (browser force simulation), "fixed" (server-side
+        coordinates) or "auto" (fixed above auto_layout_nodes visible nodes).
+        """
+        if layout == "auto":
+            return num_visible > auto_layout_nodes
+        return layout == "fixed"
+
+    def to_echarts_json(self, display_limits, color_map, selection="first",
+                        base_size=12, max_ratio=2.5, layout="force", auto_layout_nodes=1000):
+        nodes, edges, sizes = self._visible_slice(display_limits, selection, base_size, max_ratio)
+        fixed = self.use_fixed_layout(layout, len(nodes), auto_layout_nodes)
+        fragments = self._node_fragments_of(nodes.tolist())
+        if fixed:
+            positions = self.layout_positions(nodes, edges).tolist()
+            node_json = [
+                f"{fragment}, \"symbolSize\": {json.dumps(size)}, "
+                f"\"x\": {json.dumps(x)}, \"y\": {json.dumps(y)}}}"
+                for fragment, size, (x, y) in zip(fragments, sizes, positions)
+            ]
+        else:
+            node_json = [
+                f"{fragment}, \"symbolSize\": {json.dumps(size)}}}"
+                for fragment, size in zip(fragments, sizes)
+            ]
+        link_json = self._link_fragments_of(edges.tolist())
+        categories = json.dumps(make_echarts_categories(color_map), ensure_ascii=False)
+        layout_json = ', "layout": "none"' if fixed else ""
+        return (f'{{"nodes": [{", ".join(node_json)}], '
+                f'"links": [{", ".join(link_json)}], '
+                f'"categories": {categories}{layout_json}}}')
+
+    def to_compact_json(self, display_limits, color_map, selection="first",
+                        base_size=12, max_ratio=2.5, layout="force", auto_layout_nodes=1000):
+        """
+        Columnar form of to_echarts_json, expanded in the browser by
+        expandGraphPayload (static/echarts_graph.js):
+            - strings: de-duplicated string table.
+            - nodes: one column per node field; string fields hold indices
+              into the string table (-1 for null), `nid` is the node ID
+              within its type and `show` the displayed label. With a fixed
+              layout the columns `x` / `y` hold the node coordinates.
+            - links: `source` / `target` index arrays into the node columns.
+        Edge labels and groups are not repeated per link; they are looked up
+        from the node columns on the client.
+        """
+        nodes, edges, sizes = self._visible_slice(display_limits, selection, base_size, max_ratio)
+        strings = {}
+
+        def intern(value):
+            if value is None:
+                return -1
+            return strings.setdefault(value, len(strings))
+
+        fields = ("value", "url", "tooltip_name", "tooltip_desc")
+        columns = {field: [] for field in fields + ("group", "nid", "show", "highlight")}
+        for i in nodes.tolist():
+            record = self._node_records[i]
+            for field in fields:
+                columns[field].append(intern(record[field]))
+            columns["group"].append(intern(self.groups[i]))
+            columns["nid"].append(i - self.offsets[self.groups[i]])
+            columns["show"].append(intern(self.labels[i]))
+            columns["highlight"].append(int(self.highlights[i]))
+        columns["symbolSize"] = [round(size, 3) for size in sizes]
+        fixed = self.use_fixed_layout(layout, len(nodes), auto_layout_nodes)
+        if fixed:
+            positions = self.layout_positions(nodes, edges)
+            columns["x"] = positions[:, 0].tolist()
+            columns["y"] = positions[:, 1].tolist()
+
+        # 边端点换算为可见节点中的位置
+        position = np.full(self.num_nodes, -1, dtype=np.int64)
+        position[nodes] = np.arange(len(nodes))
+        payload = {
+            "format": "columnar",
+            "version": 1,
+            "strings": list(strings),
+            "nodes": columns,
+            "links": {"source": position[self.edge_lo[edges]].tolist(),
+                      "target": position[self.edge_hi[edges]].tolist()},
+            "categories": make_echarts_categories(color_map),
+        }
+        if fixed:
+            payload["layout"] = "none"
+        return json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+